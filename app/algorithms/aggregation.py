@@ -70,12 +70,13 @@ from typing import List, Dict, Any, Optional, Tuple
 
 # In algorithms/aggregation.py
 
-def get_top_vendors(records: list[dict], mode: str = 'spend', limit: int = 10, amount_field: str = 'amount') -> list:
+def get_top_vendors(records: list[dict] | pd.DataFrame, mode: str = 'spend', limit: int = 10,
+                    amount_field: str = 'amount') -> list:
     """
-    Aggregates records to find top vendors by total spend or frequency.
+    Aggregates records (dicts or a DataFrame) to find top vendors by total spend or frequency.
     Now accepts a dynamic amount_field for currency conversion.
     """
-    if not records:
+    if len(records) == 0:
         return []
 
     df = pd.DataFrame(records)
@@ -93,11 +94,12 @@ def get_top_vendors(records: list[dict], mode: str = 'spend', limit: int = 10, a
 
 
 
-def get_top_categories(records: list[dict], mode: str = 'spend', limit: int = 10, amount_field: str = 'amount') -> list:
+def get_top_categories(records: list[dict] | pd.DataFrame, mode: str = 'spend', limit: int = 10,
+                       amount_field: str = 'amount') -> list:
     """
-    Aggregates records to find top categories by total spend or frequency.
+    Aggregates records (dicts or a DataFrame) to find top categories by total spend or frequency.
     """
-    if not records:
+    if len(records) == 0:
         return []
 
     # Use a DataFrame for efficient grouping
@@ -115,4 +117,108 @@ def get_top_categories(records: list[dict], mode: str = 'spend', limit: int = 10
         # Group by category and count occurrences, then get the top 'limit'
         top_items = df['category'].value_counts().nlargest(limit)
 
-    return list(top_items.items())
\ No newline at end of file
+    return list(top_items.items())
+
+
+
+DASHBOARD_BUCKETS = {'D': 'day', 'W': 'week', 'M': 'month'}
+
+def _rank_by(df: pd.DataFrame, key: str, amount_field: str, limit: int, count_field: str | None = None) -> dict:
+    """Top and bottom `limit` values of key by total spend and by frequency."""
+    if count_field:
+        grouped = (df.dropna(subset=[key]).groupby(key)[[amount_field, count_field]].sum()
+                   .rename(columns={amount_field: 'sum', count_field: 'count'}))
+    else:
+        grouped = df.dropna(subset=[key]).groupby(key)[amount_field].agg(['sum', 'count'])
+
+    def as_items(series, cast):
+        return [{key: name, "value": cast(value)} for name, value in series.items()]
+
+    spend = grouped['sum'].round(2)
+    frequency = grouped['count']
+    return {
+        "spend": {
+            "top": as_items(spend.nlargest(limit), float),
+            "bottom": as_items(spend.nsmallest(limit), float),
+        },
+        "frequency": {
+            "top": as_items(frequency.nlargest(limit), int),
+            "bottom": as_items(frequency.nsmallest(limit), int),
+        },
+    }
+
+def build_dashboard(records: list[dict], currency: str, limit: int = 10, bucket: str = 'D',
+                    amount_field: str = 'amount_in_base', count_field: str | None = None,
+                    median: float | None = None) -> dict:
+    """
+    Computes every dashboard insight from a single DataFrame of converted records:
+    statistics, top/bottom vendors and categories by spend and frequency, and
+    spend/count per time bucket, vendor and category.
+
+    Args:
+        records: Filtered records (dicts or a DataFrame) that already carry
+                 amount_field in the base currency.
+        currency: The base currency the amounts are in.
+        limit: How many entries each top/bottom list holds.
+        bucket: Time-series bucket, one of DASHBOARD_BUCKETS ('D', 'W', 'M').
+        count_field: For pre-aggregated records (e.g. daily rollups), the field
+                     holding how many receipts each one stands for; amount_field
+                     is then their total.
+        median: Median receipt amount, required with count_field since it
+                can't be derived from totals.
+    """
+    if bucket not in DASHBOARD_BUCKETS:
+        raise ValueError(f"Bucket must be one of {', '.join(DASHBOARD_BUCKETS)}")
+    if count_field and median is None:
+        raise ValueError("median is required for pre-aggregated records")
+
+    def empty_ranking():
+        return {mode: {"top": [], "bottom": []} for mode in ('spend', 'frequency')}
+
+    dashboard = {
+        "statistics": {"total": 0, "mean": 0, "median": 0, "currency": currency, "record_count": 0},
+        "vendors": empty_ranking(),
+        "categories": empty_ranking(),
+        "time_series": [],
+        "bucket": DASHBOARD_BUCKETS[bucket],
+    }
+
+    df = pd.DataFrame(records)
+    if df.empty:
+        return dashboard
+    df = df.dropna(subset=[amount_field])
+    if df.empty:
+        return dashboard
+
+    amounts = df[amount_field]
+    counts = df[count_field] if count_field else pd.Series(1, index=df.index)
+    total, record_count = float(amounts.sum()), int(counts.sum())
+    dashboard["statistics"] = {
+        "total": round(total, 2),
+        "mean": round(total / record_count, 2),
+        "median": round(float(amounts.median() if median is None else median), 2),
+        "currency": currency,
+        "record_count": record_count,
+    }
+    dashboard["vendors"] = _rank_by(df, 'vendor', amount_field, limit, count_field)
+    dashboard["categories"] = _rank_by(df, 'category', amount_field, limit, count_field)
+
+    dates = pd.to_datetime(df['transaction_date'])
+    df = df.assign(date=dates.dt.to_period(bucket).dt.start_time.dt.strftime('%Y-%m-%d'))
+    df = df.assign(transactions=counts)
+    series = (
+        df.groupby(['date', 'vendor', 'category'], dropna=False)
+        .agg(spend=(amount_field, 'sum'), transactions=('transactions', 'sum'))
+        .reset_index()
+    )
+    dashboard["time_series"] = [
+        {
+            "date": row.date,
+            "vendor": row.vendor,
+            "category": None if pd.isna(row.category) else row.category,
+            "spend": round(float(row.spend), 2),
+            "count": int(row.transactions),
+        }
+        for row in series.itertuples(index=False)
+    ]
+    return dashboard
@@ -0,0 +1,108 @@
+"""
+Trigram index over the distinct values of a field, for fuzzy search.
+
+There are far fewer distinct vendors and categories than receipts, so a fuzzy
+query is resolved against the values once and the matching values are then
+looked up exactly (vendor IN (...)) instead of scoring every record.
+"""
+
+import re
+import threading
+from collections import defaultdict
+from typing import Iterable, List
+
+from thefuzz import fuzz
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Lowercase trigrams of each word in text, padded like PostgreSQL's pg_trgm
+    ('  s', ' st', 'sta', ..., 'ks ') so short words and word starts count too.
+    """
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FuzzyIndex:
+    """
+    Distinct values with a trigram inverted index.
+
+    search() scores the values sharing at least one trigram with the query
+    first, using the same fuzz.partial_ratio as fuzzy_search_records(), and
+    every other value only if none of those reaches the cutoff. Queries
+    without a word of 3+ characters only have padded trigrams, which a value
+    containing them mid-word ('ab' in 'xaby') lacks, so they are scored
+    against every value straight away.
+
+    This is not the same as scoring every value: once a candidate matches,
+    values sharing no trigram are left out even if they would reach the
+    cutoff, e.g. 'tele' finds "Telecom" but not "Jewellery Store" (75). Those
+    are loose matches of a misspelled or very short query; a query that
+    matches nothing through its trigrams still gets the full scan.
+    """
+
+    def __init__(self, values: Iterable[str] = ()):
+        self._values: List[str] = []
+        self._ids = {}
+        self._postings = defaultdict(set)  # trigram -> ids of values containing it
+        self._lock = threading.Lock()
+        self.add_all(values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._ids
+
+    def add(self, value: str) -> bool:
+        """Adds a value; returns False if it was already indexed."""
+        with self._lock:
+            if value in self._ids:
+                return False
+            value_id = len(self._values)
+            self._values.append(value)
+            self._ids[value] = value_id
+            for gram in trigrams(value):
+                self._postings[gram].add(value_id)
+            return True
+
+    def add_all(self, values: Iterable[str]) -> int:
+        """Adds values; returns how many were new."""
+        return sum(self.add(value) for value in values if isinstance(value, str))
+
+    def candidates(self, query: str) -> List[str]:
+        """Values sharing at least one trigram with query, or every value if no word of it is 3+ characters."""
+        with self._lock:
+            if not any(len(word) >= 3 for word in _WORD.findall(query)):
+                return list(self._values)
+            ids = set()
+            for gram in trigrams(query):
+                ids.update(self._postings.get(gram, ()))
+            return [self._values[i] for i in sorted(ids)]
+
+    def search(self, query: str, score_cutoff: int = 75) -> List[str]:
+        """
+        Values whose partial_ratio with query is at least score_cutoff, among
+        those sharing a trigram with it, or among all values if none of those do.
+        """
+        query = query.lower()
+        candidates = self.candidates(query)
+        matches = [value for value in candidates if fuzz.partial_ratio(query, value.lower()) >= score_cutoff]
+        if matches or len(candidates) == len(self):
+            return matches
+        scored = set(candidates)
+        with self._lock:
+            others = [value for value in self._values if value not in scored]
+        return [value for value in others if fuzz.partial_ratio(query, value.lower()) >= score_cutoff]
+
+    def search_any(self, queries: Iterable[str], score_cutoff: int = 75) -> List[str]:
+        """Values matching ANY of the queries, in index order."""
+        matches = set()
+        for query in queries:
+            matches.update(self.search(query, score_cutoff))
+        return [value for value in self._values if value in matches]
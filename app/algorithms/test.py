@@ -4,6 +4,7 @@ from datetime import date
 # TODO: Make sure to import your actual functions from their file.
 # Assuming your functions are in a file named 'algorithms.py'
 from .search import search_by_keywords_concise
+from .fuzzy_index import FuzzyIndex, trigrams
 from .sort import sort_records
 from .aggregation import calculate_total_spend, get_top_vendors
 
@@ -58,6 +59,34 @@ class TestCoreAlgorithms(unittest.TestCase):
         results = search_by_keywords_concise('120', 'amount', self.records)
         self.assertEqual(len(results), 0)
 
+    # -- Fuzzy Index Tests --
+    def test_trigrams_are_padded_per_word(self):
+        self.assertEqual(trigrams('Ab-c'), {'  a', ' ab', 'ab ', '  c', ' c '})
+
+    def test_fuzzy_index_matches_partial_ratio(self):
+        index = FuzzyIndex(r['vendor'] for r in self.records)
+        self.assertEqual(len(index), 4)  # Distinct values only
+        self.assertEqual(index.search('starbuks'), ['Starbucks'])
+        self.assertEqual(index.search('grocery'), ['Grocery Mart'])
+        self.assertEqual(index.search('xyz'), [])
+
+    def test_fuzzy_index_short_queries_scan_every_value(self):
+        index = FuzzyIndex(['xaby', 'Starbucks', 'Shell'])
+        self.assertEqual(index.candidates('ab'), ['xaby', 'Starbucks', 'Shell'])
+        self.assertEqual(index.search('ab'), ['xaby'])
+        self.assertEqual(index.candidates('bucks'), ['Starbucks'])
+
+    def test_fuzzy_index_scans_everything_only_without_a_trigram_match(self):
+        # 'tele' vs 'Jewellery Store' scores 75 but shares no trigram with it
+        self.assertEqual(FuzzyIndex(['Jewellery Store', 'Telecom']).search('tele'), ['Telecom'])
+        self.assertEqual(FuzzyIndex(['Jewellery Store', 'Amazon']).search('tele'), ['Jewellery Store'])
+
+    def test_fuzzy_index_any_keyword(self):
+        index = FuzzyIndex(['Starbucks', 'Grocery Mart', 'Amazon'])
+        self.assertTrue(index.add('Shell'))
+        self.assertFalse(index.add('Shell'))
+        self.assertEqual(index.search_any(['shel', 'amazn']), ['Amazon', 'Shell'])
+
     # -- Aggregation Tests --
     def test_calculate_total_spend(self):
         total = calculate_total_spend(self.records)
@@ -1,22 +1,37 @@
 import base64
-import statistics
+import json
+import numpy as np
+import threading
+import time
 import traceback
+from itertools import islice
 import pandas as pd
 from datetime import date, datetime
 from typing import Optional
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from pydantic import ValidationError
 
 # Assuming your project structure is now modular
 # --- IMPORT THE NEW AGGREGATION FUNCTION ---
-from algorithms.aggregation import get_top_vendors, get_top_categories
-from algorithms.search import fuzzy_search_records, search_by_keywords_concise, search_by_range
-from algorithms.sort import sort_records
-from database.database import get_all_receipts, save_receipt
+from algorithms.aggregation import DASHBOARD_BUCKETS, build_dashboard, get_top_vendors, get_top_categories
+from algorithms.fuzzy_index import FuzzyIndex
+from algorithms.search import fuzzy_search_records
+from database.blob_store import get_blob_store
+from database.database import (RECEIPT_LIST_COLUMNS, ReceiptBatchError, aggregate_amounts_in_base, decode_cursor,
+                               discard_blobs, encode_cursor, get_distinct_values, get_pool_stats, get_receipt_file,
+                               get_receipt_raw_text, get_values_version,
+                               iter_receipts, median_amount_in_base, query_amounts_in_base, query_daily_rollups,
+                               query_receipts, save_receipt, save_receipts, validate_receipts)
 from models.receipt import ReceiptData
+from services.batch import BatchTooLargeError, expand_uploads, process_batch
+from services.jobs import QueueFullError, get_job_queue, get_job_stats
+from services.ocr_strategy import get_ocr_stats
+from services.parse_cache import get_parse_cache_stats
 from services.parsers import parse_and_extract_data
-from services.currency_converter import convert_to_base_currency
+from services.currency_converter import (MATERIALIZED_BASE_CURRENCIES, amounts_in_base_for_receipt,
+                                        amounts_in_base_for_receipts, convert_amounts,
+                                        fill_amounts_in_base)
 
 from flask_cors import CORS 
 # DO NOT USE THIS IN PROD (Hopefully) ~ IAteNoodles
@@ -24,13 +39,15 @@ from flask_cors import CORS
 app = Flask(__name__)
 
 # --- Standardized Response Helpers ---
-def success_response(data=None, message="Success", status_code=200):
+def success_response(data=None, message="Success", status_code=200, meta=None):
     """Create a standardized success response."""
     response = {
         "success": True,
         "message": message,
         "data": data
     }
+    if meta is not None:
+        response["meta"] = meta
     return jsonify(response), status_code
 
 def error_response(message="An error occurred", details=None, status_code=400):
@@ -48,30 +65,221 @@ def is_allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # --- Helper Function for Dynamic Filtering ---
-def get_filtered_receipts(args):
-    records = get_all_receipts()
-    range_feature = args.get('range_feature')
-    start_range = args.get('start')
-    end_range = args.get('end')
-    if range_feature and start_range and end_range:
-        records = search_by_range(records, range_feature, start_range, end_range)
+# Columns the insight endpoints aggregate over
+INSIGHT_COLUMNS = ('vendor', 'transaction_date', 'amount', 'currency', 'category')
+
+def _parse_limit(args) -> Optional[int]:
+    limit = args.get('limit')
+    if limit in (None, ''):
+        return None
+    try:
+        return int(limit)
+    except ValueError:
+        raise ValueError(f"Invalid limit '{limit}'")
+
+def _fuzzy_filter(records, queries: list[str], feature: str, batch_size: int = 500):
+    """Lazily keeps the records of a stream that fuzzy_search_records matches with ANY query."""
+    def matching(batch):
+        matched = set()
+        for query in queries:
+            matched.update(id(record) for record in fuzzy_search_records(query, feature, batch))
+        return [record for record in batch if id(record) in matched]
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield from matching(batch)
+            batch = []
+    if batch:
+        yield from matching(batch)
+
+# Fuzzy search on these features scores the keywords against an index of
+# their distinct values, then selects the matching values with an IN lookup
+FUZZY_INDEXED_FEATURES = ('vendor', 'category')
+_fuzzy_indexes = {}  # feature -> (FuzzyIndex, highest receipt id indexed, values version indexed)
+_fuzzy_indexes_lock = threading.Lock()
+
+def _fuzzy_values(keywords: list[str], feature: str) -> list[str]:
+    """
+    Stored values of feature matching ANY keyword. Values of new receipts are
+    added to the index first; an update or delete of existing receipts (a
+    new values version) rebuilds it.
+    """
+    with _fuzzy_indexes_lock:
+        # Read before the values, so a change made in between shows up next time
+        version = get_values_version()
+        index, last_id, indexed_version = _fuzzy_indexes.get(feature, (None, 0, None))
+        if version != indexed_version:
+            last_id = 0
+        values, new_last_id = get_distinct_values(feature, after_id=last_id)
+        if index is None or last_id == 0 or new_last_id < last_id:
+            index = FuzzyIndex()
+        index.add_all(values)
+        _fuzzy_indexes[feature] = (index, new_last_id, version)
+    return index.search_any(keywords)
+
+def _receipt_filters(args, columns=RECEIPT_LIST_COLUMNS) -> tuple[dict, Optional[list]]:
+    """
+    Turns the filter params of a request into build_receipt_query() arguments.
+
+    Returns (filters, fuzzy_keywords). Fuzzy search on vendor or category
+    resolves to matching values in SQL. On other features it has no SQL
+    equivalent, so fuzzy_keywords holds the keywords and filters leave out
+    the keyword filter and limit, which the caller then has to apply in Python.
+    """
+    filters = {
+        'columns': columns,
+        'range_feature': args.get('range_feature'),
+        'start': args.get('start') or None,
+        'end': args.get('end') or None,
+        'sort_by': args.get('sort_by'),
+        'order': args.get('order', 'asc'),
+    }
+    if args.get('cursor'):
+        filters['after'] = decode_cursor(args.get('cursor'))
+
+    keywords = []
     search_keyword = args.get('search_keyword')
     search_feature = args.get('search_feature')
     if search_keyword and search_feature:
         # Split the comma-separated string from the UI into a list
-        keywords = [k.strip() for k in search_keyword.split(',')]
-        
-        # The fuzzy search logic would also need to be updated to handle lists,
-        # but for the default exact search, this works perfectly.
-        search_mode = args.get('search_mode', 'exact')
-        if search_mode == 'fuzzy':
-            # For now, fuzzy search will only use the first keyword
-            records = fuzzy_search_records(keywords[0], search_feature, records)
-        else:
-            records = search_by_keywords_concise(keywords, search_feature, records)
-    # --- End of modification ---
+        keywords = [k.strip() for k in search_keyword.split(',') if k.strip()]
+
+    if keywords and args.get('search_mode', 'exact') == 'fuzzy':
+        if search_feature in FUZZY_INDEXED_FEATURES:
+            filters.update(search_feature=search_feature, search_values=_fuzzy_values(keywords, search_feature),
+                           limit=_parse_limit(args))
+            return filters, None
+        if search_feature not in columns:
+            filters['columns'] = tuple(columns) + (search_feature,)
+        return filters, keywords
+
+    filters.update(keywords=keywords, search_feature=search_feature, limit=_parse_limit(args))
+    return filters, None
 
-    return records
+def get_filtered_receipts(args, columns=RECEIPT_LIST_COLUMNS, stream=False):
+    """
+    Runs the filters in the request args as a single SQL query.
+
+    Range, keyword, sort, cursor and limit are pushed down into SQLite; only
+    fuzzy search on features without a fuzzy index still filters in Python.
+    With stream=True a generator is returned instead of a list.
+    """
+    filters, fuzzy_keywords = _receipt_filters(args, columns)
+    if fuzzy_keywords is not None:
+        limit = _parse_limit(args)
+        records = _fuzzy_filter(iter_receipts(**filters), fuzzy_keywords, args.get('search_feature'))
+        records = islice(records, limit) if limit is not None else records
+        return records if stream else list(records)
+
+    fetch = iter_receipts if stream else query_receipts
+    return fetch(**filters)
+
+def _uses_stored_amounts(fuzzy_keywords, base_currency: str) -> bool:
+    """Whether converted amounts can come from receipt_amounts instead of converting per request."""
+    return fuzzy_keywords is None and base_currency in MATERIALIZED_BASE_CURRENCIES
+
+def get_receipts_in_base(args, base_currency: str, columns=INSIGHT_COLUMNS) -> pd.DataFrame:
+    """
+    Filtered receipts as a DataFrame with an 'amount_in_base' column.
+
+    For the materialized base currencies the stored amounts are used and only
+    receipts without one are converted; otherwise the amount, currency and
+    date columns are converted as a whole with convert_amounts().
+    """
+    filters, fuzzy_keywords = _receipt_filters(args, columns)
+    if _uses_stored_amounts(fuzzy_keywords, base_currency):
+        return pd.DataFrame(fill_amounts_in_base(query_amounts_in_base(base_currency, **filters), base_currency))
+    df = pd.DataFrame(get_filtered_receipts(args, columns=columns))
+    if not df.empty:
+        df['amount_in_base'] = convert_amounts(df['amount'], df['currency'], df['transaction_date'], base_currency)
+    return df
+
+def _top_by_stored_spend(args, base_currency: str, key: str, limit: int = 10) -> Optional[list]:
+    """
+    Top `limit` vendors or categories by spend, summed in SQL from the stored
+    converted amounts. None when that isn't possible (fuzzy search on a
+    feature without a fuzzy index, a base currency that isn't materialized,
+    or receipts without a stored amount).
+    """
+    filters, fuzzy_keywords = _receipt_filters(args, INSIGHT_COLUMNS)
+    if not _uses_stored_amounts(fuzzy_keywords, base_currency):
+        return None
+    groups = aggregate_amounts_in_base(base_currency, group_by=key, **filters)
+    if any(g['converted_count'] != g['record_count'] for g in groups):
+        return None
+    groups = sorted((g for g in groups if g[key] is not None), key=lambda g: (-g['total'], g[key]))
+    return [(g[key], g['total']) for g in groups[:limit]]
+
+def _rollup_filters(filters: dict, fuzzy_keywords) -> Optional[dict]:
+    """
+    query_daily_rollups() arguments for filters from _receipt_filters(), or
+    None when they need the receipts themselves (an amount range, keyword
+    search, a limit or a cursor). Fuzzy search on vendor or category has
+    already been resolved to values, so it can use the rollups.
+    """
+    if (fuzzy_keywords is not None or filters.get('keywords') or filters.get('limit') is not None
+            or filters.get('after') is not None):
+        return None
+    rollup_filters = {}
+    if filters.get('range_feature') and filters.get('start') is not None and filters.get('end') is not None:
+        if filters['range_feature'] != 'transaction_date':
+            return None
+        rollup_filters.update(start=filters['start'], end=filters['end'])
+    if filters.get('search_values') is not None:
+        rollup_filters.update(search_feature=filters['search_feature'], search_values=filters['search_values'])
+    return rollup_filters
+
+def _rollups_in_base(rollup_filters: dict, base_currency: str, group_by=()) -> list[dict]:
+    """Daily rollups per group_by key, with each row's amount_sum converted to 'amount_in_base'."""
+    rows = query_daily_rollups(group_by=tuple(group_by) + ('day', 'currency'), **rollup_filters)
+    if rows:
+        converted = convert_amounts([row['amount_sum'] for row in rows], [row['currency'] for row in rows],
+                                    [row['day'] for row in rows], base_currency)
+        for row, amount_in_base in zip(rows, converted.tolist()):
+            row['amount_in_base'] = amount_in_base
+    return rows
+
+def _top_from_rollups(args, base_currency: str, key: str, mode: str, limit: int = 10) -> Optional[list]:
+    """
+    Top `limit` vendors or categories by spend or frequency, summed from the
+    daily rollups. None when the filters can't be answered from them.
+    """
+    filters, fuzzy_keywords = _receipt_filters(args, INSIGHT_COLUMNS)
+    rollup_filters = _rollup_filters(filters, fuzzy_keywords)
+    if rollup_filters is None:
+        return None
+    if mode == 'spend':
+        rows, value = _rollups_in_base(rollup_filters, base_currency, (key,)), 'amount_in_base'
+    else:
+        rows, value = query_daily_rollups(group_by=(key,), **rollup_filters), 'receipt_count'
+    totals = {}
+    for row in rows:
+        if row[key] is not None:
+            totals[row[key]] = totals.get(row[key], 0) + row[value]
+    return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+def _dashboard_from_rollups(args, base_currency: str, limit: int, bucket: str) -> Optional[dict]:
+    """
+    The dashboard built from the daily rollups, with the median taken from the
+    stored converted amounts. None when the filters can't be answered from the
+    rollups or some receipts have no stored amount to take the median of.
+    """
+    filters, fuzzy_keywords = _receipt_filters(args, INSIGHT_COLUMNS)
+    rollup_filters = _rollup_filters(filters, fuzzy_keywords)
+    if rollup_filters is None or not _uses_stored_amounts(fuzzy_keywords, base_currency):
+        return None
+    summary = aggregate_amounts_in_base(base_currency, **filters)[0]
+    if summary['converted_count'] != summary['record_count']:
+        return None
+    if not summary['record_count']:
+        return build_dashboard([], currency=base_currency, limit=limit, bucket=bucket)
+    rows = _rollups_in_base(rollup_filters, base_currency, ('vendor', 'category'))
+    for row in rows:
+        row['transaction_date'] = row.pop('day')
+    return build_dashboard(rows, currency=base_currency, limit=limit, bucket=bucket,
+                           count_field='receipt_count', median=median_amount_in_base(base_currency, **filters))
 
 # --- Core API Endpoints (Unchanged) ---
 @app.route('/process-receipt', methods=['POST'])
@@ -87,6 +295,18 @@ def process_receipt_file():
         file_bytes = file.read()
         file_extension = file.filename.rsplit('.', 1)[1].lower()
         use_ai = request.form.get('use_ai', 'false').lower() == 'true'
+        run_async = (request.form.get('async') or request.args.get('async', 'false')).lower() == 'true'
+        
+        if run_async:
+            # Queue the OCR and return straight away; poll GET /jobs/<id> for the result
+            job_id = get_job_queue().submit(parse_and_extract_data, file_bytes, file_extension, use_ai=use_ai)
+            response = success_response(
+                data={"job_id": job_id, "status": "queued"},
+                message="File queued for processing",
+                status_code=202
+            )
+            response[0].headers['Location'] = f"/jobs/{job_id}"
+            return response
         
         extracted_data = parse_and_extract_data(file_bytes, file_extension, use_ai=use_ai)
         
@@ -94,22 +314,150 @@ def process_receipt_file():
             data=extracted_data,
             message="File processed successfully"
         )
+    except QueueFullError as e:
+        return error_response(str(e), status_code=503)
     except Exception as e:
         return error_response(f"File processing failed: {str(e)}", status_code=500)
 
+def _receipt_from_parse(result: dict, item: dict) -> ReceiptData:
+    """Validates a parse result as a receipt, as /save-receipt would."""
+    return ReceiptData(
+        vendor=result.get('vendor'),
+        transaction_date=result.get('transaction_date'),
+        amount=result.get('amount'),
+        currency=result.get('currency') or 'INR',
+        category=result.get('category'),
+        raw_text=result.get('raw_text') or '',
+        raw_data=item['bytes'],
+        raw_data_extension=item['extension'],
+    )
+
+@app.route('/process-receipts', methods=['POST'])
+def process_receipt_batch():
+    """
+    Processes many files (repeat the `files` field, or upload zip archives).
+
+    Streams one NDJSON line per file as it finishes, then a summary line.
+    Identical files are parsed once. With `auto_save=true` every result that
+    validates as a ReceiptData is saved in a single transaction after the
+    last file, and the summary lists the new receipt ids.
+    """
+    uploads = [(f.filename, f.read()) for f in request.files.getlist('files') + request.files.getlist('file')
+               if f.filename]
+    if not uploads:
+        return error_response("No files provided", status_code=400)
+    try:
+        items, skipped = expand_uploads(uploads, ALLOWED_EXTENSIONS)
+    except BatchTooLargeError as e:
+        return error_response(str(e), status_code=413)
+
+    use_ai = request.form.get('use_ai', 'false').lower() == 'true'
+    auto_save = request.form.get('auto_save', 'false').lower() == 'true'
+
+    def generate():
+        start = time.perf_counter()
+        for entry in skipped:
+            yield json.dumps({"type": "result", "file": entry["name"], "status": "skipped",
+                              "error": entry["reason"]}) + "\n"
+
+        counts = {"processed": 0, "duplicates": 0, "failed": 0, "invalid": 0}
+        to_save = []
+        for item, result, duplicate_of in process_batch(items, use_ai=use_ai):
+            line = {"type": "result", "file": item["name"], "sha256": item["sha256"], "data": result}
+            if duplicate_of:
+                line.update(status="duplicate", duplicate_of=duplicate_of)
+                counts["duplicates"] += 1
+            elif "error" in result:
+                line["status"] = "failed"
+                counts["failed"] += 1
+            else:
+                line["status"] = "processed"
+                counts["processed"] += 1
+                if auto_save:
+                    try:
+                        to_save.append((item, _receipt_from_parse(result, item)))
+                        line["valid"] = True
+                    except ValidationError as e:
+                        line.update(valid=False, validation_errors=json.loads(e.json(include_url=False, include_input=False)))
+                        counts["invalid"] += 1
+            yield json.dumps(line, default=str) + "\n"
+
+        summary = {"type": "summary", "files": len(items) + len(skipped), "skipped": len(skipped), **counts}
+        if auto_save:
+            try:
+                receipts = [receipt for _, receipt in to_save]
+                receipt_ids = save_receipts(receipts, amounts_in_base=_amounts_in_base_for_receipts(receipts))
+                summary["saved"] = dict(zip((item["name"] for item, _ in to_save), receipt_ids))
+            except Exception as e:
+                traceback.print_exc()
+                summary["saved"] = {}
+                summary["save_error"] = f"Failed to save receipts: {str(e)}"
+        summary["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+        yield json.dumps(summary) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status, per-stage timings (seconds) and, once done, the result of a queued job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return error_response(f"Job '{job_id}' not found", status_code=404)
+    return success_response(data=job, message=f"Job is {job['status']}")
+
+# Receipt fields accepted as form fields by the multipart form of /save-receipt
+SAVE_RECEIPT_FORM_FIELDS = ('vendor', 'transaction_date', 'amount', 'currency', 'category', 'raw_text',
+                            'raw_data_extension', 'upload_timestamp')
+
+def _receipt_from_form(form, files) -> tuple[dict, Optional[object]]:
+    """
+    Receipt fields of a multipart /save-receipt and its uploaded file (or
+    None). The file is streamed into the blob store only once the fields
+    have validated, see save_corrected_receipt().
+    """
+    data = {field: form[field] for field in SAVE_RECEIPT_FORM_FIELDS if form.get(field) not in (None, '')}
+    file = files.get('file')
+    if file is None or not file.filename:
+        return data, None
+    data.setdefault('raw_data_extension', file.filename.rsplit('.', 1)[-1].lower())
+    return data, file
+
 @app.route('/save-receipt', methods=['POST'])
 def save_corrected_receipt():
+    """
+    Saves a reviewed receipt.
+
+    Accepts either JSON with the file base64-encoded in raw_data, or
+    multipart/form-data with the receipt fields as form fields and the
+    original upload as `file` (no base64 overhead).
+    """
     try:
-        data = request.get_json()
-        if not data:
-            return error_response("No JSON data provided", status_code=400)
-        
-        # Decode base64 raw_data if it's a string
-        if isinstance(data.get('raw_data'), str):
-            data['raw_data'] = base64.b64decode(data['raw_data'])
+        upload = None
+        if request.mimetype == 'multipart/form-data':
+            data, upload = _receipt_from_form(request.form, request.files)
+        else:
+            data = request.get_json()
+            if not data:
+                return error_response("No JSON data provided", status_code=400)
+            
+            # Decode base64 raw_data if it's a string
+            if isinstance(data.get('raw_data'), str):
+                data['raw_data'] = base64.b64decode(data['raw_data'])
         
         receipt = ReceiptData(**data)
-        receipt_id = save_receipt(receipt)
+        amounts_in_base = amounts_in_base_for_receipt(receipt.amount, receipt.currency, receipt.transaction_date)
+        new_blobs = []
+        try:
+            if upload is not None:
+                # Copied chunk by chunk, so only the hash is kept
+                blob_hash, _, added = get_blob_store().add_stream(upload.stream)
+                receipt = receipt.model_copy(update={'blob_hash': blob_hash})
+                if added:
+                    new_blobs.append(blob_hash)
+            receipt_id = save_receipt(receipt, amounts_in_base=amounts_in_base)
+        except Exception:
+            discard_blobs(new_blobs)
+            raise
         
         return success_response(
             data={"receipt_id": receipt_id},
@@ -122,22 +470,133 @@ def save_corrected_receipt():
             details=e.errors(),
             status_code=422
         )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f"Failed to save receipt: {str(e)}", status_code=500)
 
+@app.route('/receipts/<int:receipt_id>/raw-text', methods=['GET'])
+def get_receipt_text(receipt_id):
+    """OCR text of one receipt; list endpoints leave it out."""
+    try:
+        raw_text = get_receipt_raw_text(receipt_id)
+        if raw_text is None:
+            return error_response(f"Receipt {receipt_id} not found", status_code=404)
+        return success_response(
+            data={"receipt_id": receipt_id, "raw_text": raw_text},
+            message="Raw text retrieved"
+        )
+    except Exception as e:
+        return error_response(f"Failed to load raw text: {str(e)}", status_code=500)
+
+@app.route('/receipts/<int:receipt_id>/file', methods=['GET'])
+def get_receipt_original_file(receipt_id):
+    """Downloads the file a receipt was uploaded from, e.g. to process it again."""
+    stored = get_receipt_file(receipt_id)
+    if stored is None:
+        return error_response(f"No stored file for receipt {receipt_id}", status_code=404)
+    blob_hash, extension = stored
+    try:
+        return send_file(get_blob_store().path(blob_hash), as_attachment=True,
+                         download_name=f"receipt-{receipt_id}.{extension or 'bin'}", etag=blob_hash)
+    except FileNotFoundError:
+        return error_response(f"File of receipt {receipt_id} is missing from the blob store", status_code=404)
+
+def _amounts_in_base_for_receipts(receipts: list[ReceiptData]) -> list[dict]:
+    """
+    Converted amounts of receipts about to be saved by save_receipts().
+    Computed before the save, since fetching a missing rate stores it and
+    that write can't happen inside the save's transaction.
+    """
+    return amounts_in_base_for_receipts([r.amount for r in receipts], [r.currency for r in receipts],
+                                        [r.transaction_date for r in receipts])
+
+def _decode_raw_data(row: dict) -> dict:
+    # Decode base64 raw_data if it's a string, as /save-receipt does
+    if isinstance(row, dict) and isinstance(row.get('raw_data'), str):
+        row['raw_data'] = base64.b64decode(row['raw_data'])
+    return row
+
+@app.route('/save-receipts', methods=['POST'])
+def save_receipt_batch():
+    """
+    Saves many receipts in one transaction.
+
+    The body is a JSON array (or {"receipts": [...]}) of /save-receipt
+    payloads, or NDJSON with one payload per line. Every receipt is
+    validated and its amounts converted before the transaction opens; if
+    any receipt fails validation nothing is saved and the response lists
+    the failing indexes.
+    """
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            rows = (_decode_raw_data(json.loads(line)) for line in request.stream if line.strip())
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                data = data.get('receipts')
+            if not isinstance(data, list):
+                return error_response("Expected a JSON array of receipts", status_code=400)
+            rows = (_decode_raw_data(row) for row in data)
+
+        receipts = validate_receipts(rows)
+        stats = {}
+        receipt_ids = save_receipts(receipts, amounts_in_base=_amounts_in_base_for_receipts(receipts), stats=stats)
+
+        return success_response(
+            data={"receipt_ids": receipt_ids},
+            message=f"Saved {len(receipt_ids)} receipt(s)",
+            status_code=201,
+            meta=stats
+        )
+    except ReceiptBatchError as e:
+        return error_response(
+            f"Validation failed: {str(e)}, nothing was saved",
+            details=e.errors,
+            status_code=422
+        )
+    except (ValueError, TypeError) as e:
+        # Malformed NDJSON lines, base64 or non-object rows
+        return error_response(f"Invalid request body: {str(e)}", status_code=400)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Failed to save receipts: {str(e)}", status_code=500)
+
 @app.route('/receipts', methods=['GET'])
 def get_receipts():
+    """
+    Lists receipts matching the filters.
+
+    Pagination: pass `limit` (and `cursor` from the previous page's
+    meta.next_cursor); pages are keyed on (transaction_date, id).
+    With `format=ndjson` rows are streamed one JSON object per line.
+    """
     try:
+        if request.args.get('format') == 'ndjson':
+            records = get_filtered_receipts(request.args, stream=True)
+
+            def generate():
+                for record in records:
+                    yield json.dumps(record, default=str) + "\n"
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
         records = get_filtered_receipts(request.args)
-        sort_by = request.args.get('sort_by')
-        if sort_by:
-            order = request.args.get('order', 'asc')
-            records = sort_records(records, sort_by=sort_by, reverse=(order.lower() == 'desc'))
+
+        meta = None
+        limit = _parse_limit(request.args)
+        if limit is not None and request.args.get('sort_by') in (None, '', 'transaction_date'):
+            # A full page means there may be more; the client asks again with this cursor
+            next_cursor = encode_cursor(records[-1]) if records and len(records) == limit else None
+            meta = {"next_cursor": next_cursor, "limit": limit}
         
         return success_response(
             data=records,
-            message=f"Retrieved {len(records)} receipt(s)"
+            message=f"Retrieved {len(records)} receipt(s)",
+            meta=meta
         )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f"Failed to retrieve receipts: {str(e)}", status_code=500)
 
@@ -146,28 +605,47 @@ def get_receipts():
 @app.route('/insights/statistics', methods=['GET'])
 def get_expenditure_stats():
     try:
-        records = get_filtered_receipts(request.args)
         base_currency = request.args.get('base_currency', 'INR')
-        
-        if not records:
-            return success_response(
-                data={"total": 0, "mean": 0, "median": 0, "currency": base_currency},
-                message="No records found"
-            )
-        
-        records = convert_to_base_currency(records, base_currency)
-        amounts = [r['amount_in_base'] for r in records if r.get('amount_in_base') is not None]
-        
-        if not amounts:
-            return success_response(
-                data={"total": 0, "mean": 0, "median": 0, "currency": base_currency},
-                message="No valid amounts found"
+        empty_stats = {"total": 0, "mean": 0, "median": 0, "currency": base_currency}
+
+        filters, fuzzy_keywords = _receipt_filters(request.args, INSIGHT_COLUMNS)
+        if _uses_stored_amounts(fuzzy_keywords, base_currency):
+            summary = aggregate_amounts_in_base(base_currency, **filters)[0]
+            if not summary['record_count']:
+                return success_response(data=empty_stats, message="No records found")
+            if summary['converted_count'] == summary['record_count']:
+                # Every amount is stored, so SQL does all of the work
+                stats = {
+                    "total": round(summary['total'], 2),
+                    "mean": round(summary['mean'], 2),
+                    "median": round(median_amount_in_base(base_currency, **filters), 2),
+                    "currency": base_currency,
+                    "record_count": summary['record_count']
+                }
+                return success_response(
+                    data=stats,
+                    message=f"Statistics calculated for {summary['record_count']} record(s)"
+                )
+
+        if _uses_stored_amounts(fuzzy_keywords, base_currency):
+            records = fill_amounts_in_base(query_amounts_in_base(base_currency, **filters), base_currency)
+            amounts = np.array([r['amount_in_base'] for r in records], dtype=float)
+        else:
+            records = get_filtered_receipts(request.args, columns=INSIGHT_COLUMNS)
+            # Only the converted amounts are needed, so convert the columns directly
+            amounts = convert_amounts(
+                [r['amount'] for r in records],
+                [r.get('currency', 'INR') for r in records],
+                [r['transaction_date'] for r in records],
+                base_currency,
             )
-        
+        if not len(amounts):
+            return success_response(data=empty_stats, message="No records found")
+
         stats = {
-            "total": round(sum(amounts), 2),
-            "mean": round(statistics.mean(amounts), 2),
-            "median": round(statistics.median(amounts), 2),
+            "total": round(float(amounts.sum()), 2),
+            "mean": round(float(amounts.mean()), 2),
+            "median": round(float(np.median(amounts)), 2),
             "currency": base_currency,
             "record_count": len(amounts)
         }
@@ -176,6 +654,8 @@ def get_expenditure_stats():
             data=stats,
             message=f"Statistics calculated for {len(amounts)} record(s)"
         )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         traceback.print_exc()
         return error_response(f"Failed to calculate statistics: {str(e)}", status_code=500)
@@ -183,26 +663,33 @@ def get_expenditure_stats():
 @app.route('/insights/top-vendors', methods=['GET'])
 def get_vendor_summary():
     try:
-        records = get_filtered_receipts(request.args)
         mode = request.args.get('mode', 'spend')
+        base_currency = request.args.get('base_currency', 'INR')
         
-        if not records:
+        top_vendors_data = _top_from_rollups(request.args, base_currency, 'vendor', mode)
+        if top_vendors_data is None and mode == 'spend':
+            top_vendors_data = _top_by_stored_spend(request.args, base_currency, 'vendor')
+        if top_vendors_data is None:
+            if mode == 'spend':
+                records = get_receipts_in_base(request.args, base_currency)
+            else:
+                records = get_filtered_receipts(request.args, columns=INSIGHT_COLUMNS)
+            top_vendors_data = get_top_vendors(records, mode=mode, amount_field='amount_in_base')
+        
+        if not top_vendors_data:
             return success_response(
                 data=[],
                 message="No records found"
             )
         
-        if mode == 'spend':
-            base_currency = request.args.get('base_currency', 'INR')
-            records = convert_to_base_currency(records, base_currency)
-        
-        top_vendors_data = get_top_vendors(records, mode=mode, amount_field='amount_in_base')
         results = [{"vendor": vendor, "value": value} for vendor, value in top_vendors_data]
         
         return success_response(
             data=results,
             message=f"Top vendors by {mode} ({len(results)} vendor(s))"
         )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f"Failed to get vendor summary: {str(e)}", status_code=500)
 
@@ -212,22 +699,35 @@ def get_vendor_summary():
 
 @app.route('/insights/spending-over-time', methods=['GET'])
 def get_spending_trend():
-    """Provides time-series data based on different modes (total, mean, by vendor, by category)."""
+    """
+    Provides time-series data based on different modes (total, mean, by vendor, by category).
+
+    Read from the daily rollups when the filters allow it, so a year of data
+    costs at most 365 rows per group instead of one row per receipt.
+    """
     try:
-        records = get_filtered_receipts(request.args)
         mode = request.args.get('mode', 'total spend').lower()
         base_currency = request.args.get('base_currency', 'INR')
+        filters, fuzzy_keywords = _receipt_filters(request.args, INSIGHT_COLUMNS)
+        rollup_filters = _rollup_filters(filters, fuzzy_keywords)
+        if rollup_filters is not None:
+            group_by = {'by vendor': ('vendor',), 'by category': ('category',)}.get(mode, ())
+            records = _rollups_in_base(rollup_filters, base_currency, group_by)
+            for record in records:
+                record['transaction_date'] = record.pop('day')
+        else:
+            records = get_receipts_in_base(request.args, base_currency)
         
-        if not records:
+        if len(records) == 0:
             return success_response(
                 data=[],
                 message="No records found for time-series analysis"
             )
         
-        records = convert_to_base_currency(records, base_currency)
-        
         df = pd.DataFrame(records)
         df['transaction_date'] = pd.to_datetime(df['transaction_date'])
+        if 'receipt_count' not in df:
+            df['receipt_count'] = 1  # One row per receipt rather than per rollup
         
         # Resample daily to ensure all dates are present
         df = df.set_index('transaction_date')
@@ -239,8 +739,9 @@ def get_spending_trend():
             # Group by date and category, sum amounts, then pivot categories into columns
             result_df = df.groupby([pd.Grouper(freq='D'), 'category'])['amount_in_base'].sum().unstack(level='category').fillna(0)
         elif mode == 'mean spend':
-            # Group by date and calculate the mean spend per day
-            result_df = df.resample('D')['amount_in_base'].mean().fillna(0).to_frame(name="Mean Spend")
+            # Total spend over receipt count per day (days without receipts are 0)
+            daily = df.resample('D')[['amount_in_base', 'receipt_count']].sum()
+            result_df = (daily['amount_in_base'] / daily['receipt_count']).fillna(0).to_frame(name="Mean Spend")
         else: # Default to 'total spend'
             # Group by date and calculate the total spend per day
             result_df = df.resample('D')['amount_in_base'].sum().fillna(0).to_frame(name="Total Spend")
@@ -251,6 +752,8 @@ def get_spending_trend():
             data=result,
             message=f"Time-series data generated for {mode} ({len(result)} data points)"
         )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         traceback.print_exc()
         return error_response(f"Failed to generate spending trend: {str(e)}", status_code=500)
@@ -262,32 +765,91 @@ def get_spending_trend():
 def get_category_summary():
     """Provides top category data based on the filtered dataset."""
     try:
-        records = get_filtered_receipts(request.args)
         mode = request.args.get('mode', 'spend')
+        base_currency = request.args.get('base_currency', 'INR')
+        
+        top_categories_data = _top_from_rollups(request.args, base_currency, 'category', mode)
+        if top_categories_data is None and mode == 'spend':
+            top_categories_data = _top_by_stored_spend(request.args, base_currency, 'category')
+        if top_categories_data is None:
+            if mode == 'spend':
+                records = get_receipts_in_base(request.args, base_currency)
+            else:
+                records = get_filtered_receipts(request.args, columns=INSIGHT_COLUMNS)
+            top_categories_data = get_top_categories(records, mode=mode, amount_field='amount_in_base')
         
-        if not records:
+        if not top_categories_data:
             return success_response(
                 data=[],
                 message="No records found"
             )
         
-        if mode == 'spend':
-            base_currency = request.args.get('base_currency', 'INR')
-            records = convert_to_base_currency(records, base_currency)
-        
-        top_categories_data = get_top_categories(records, mode=mode, amount_field='amount_in_base')
         results = [{"category": category, "value": value} for category, value in top_categories_data]
         
         return success_response(
             data=results,
             message=f"Top categories by {mode} ({len(results)} category(ies))"
         )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f"Failed to get category summary: {str(e)}", status_code=500)
 
 
 
 
+@app.route('/insights/dashboard', methods=['GET'])
+def get_dashboard():
+    """
+    Everything the dashboard shows - statistics, top/bottom vendors and
+    categories by spend and frequency, and time-series buckets - computed from
+    one filtered, converted dataset instead of one request per widget. When
+    the filters allow it, that dataset is the daily rollups rather than the
+    receipts themselves.
+
+    Takes the same filter params as the other insight endpoints, plus
+    `top_n` (entries per top/bottom list) and `bucket` (D, W or M).
+    """
+    try:
+        base_currency = request.args.get('base_currency', 'INR')
+        bucket = request.args.get('bucket', 'D').upper()
+        if bucket not in DASHBOARD_BUCKETS:
+            raise ValueError(f"Bucket must be one of {', '.join(DASHBOARD_BUCKETS)}")
+        try:
+            top_n = int(request.args.get('top_n', 10))
+        except ValueError:
+            raise ValueError(f"Invalid top_n '{request.args.get('top_n')}'")
+
+        dashboard = _dashboard_from_rollups(request.args, base_currency, top_n, bucket)
+        if dashboard is None:
+            records = get_receipts_in_base(request.args, base_currency)
+            dashboard = build_dashboard(records, currency=base_currency, limit=top_n, bucket=bucket)
+
+        return success_response(
+            data=dashboard,
+            message=f"Dashboard calculated for {dashboard['statistics']['record_count']} record(s)"
+        )
+    except ValueError as e:
+        return error_response(str(e), status_code=400)
+    except Exception as e:
+        traceback.print_exc()
+        return error_response(f"Failed to build dashboard: {str(e)}", status_code=500)
+
+
+# --- Monitoring ---
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Runtime counters for monitoring (database connection pool, OCR configs, parse cache, job queue)."""
+    try:
+        return success_response(
+            data={"database": get_pool_stats(), "ocr": get_ocr_stats(), "parse_cache": get_parse_cache_stats(),
+                  "jobs": get_job_stats()},
+            message="Metrics collected"
+        )
+    except Exception as e:
+        return error_response(f"Failed to collect metrics: {str(e)}", status_code=500)
+
+
 #Security Hazard (Prolly)
 #DO NOT USE IN PROD(UNLESS...)
 CORS(app)
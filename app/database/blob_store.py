@@ -0,0 +1,133 @@
+"""
+Content-addressed store for the original uploaded files.
+
+Each file is stored once under its SHA-256, sharded by the first two byte
+pairs of the hash (blobs/ab/cd/abcd...), so uploading the same receipt again
+costs no extra space. Streams are hashed while they are copied to a temporary
+file in the same directory tree and then atomically renamed into place, so a
+file is never held in memory in full and a reader never sees a partial blob.
+"""
+
+import hashlib
+import os
+import tempfile
+
+# Configuration - can be overridden by environment variables
+BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', 'blobs')
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+
+def is_blob_hash(value) -> bool:
+    """True for a lowercase hex SHA-256 digest."""
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+class BlobStore:
+    """Directory of immutable blobs named by their SHA-256."""
+
+    def __init__(self, root: str = BLOB_STORE_PATH):
+        # Absolute, so paths handed out (e.g. to Flask's send_file) don't depend on who resolves them
+        self.root = os.path.abspath(root)
+
+    def path(self, blob_hash: str) -> str:
+        if not is_blob_hash(blob_hash):
+            raise ValueError(f"Invalid blob hash '{blob_hash}'")
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+    def exists(self, blob_hash: str) -> bool:
+        return os.path.exists(self.path(blob_hash))
+
+    def open(self, blob_hash: str):
+        """Opens a stored blob for binary reading; raises FileNotFoundError if absent."""
+        return open(self.path(blob_hash), 'rb')
+
+    def put_bytes(self, data: bytes) -> str:
+        """Stores data (if not already present) and returns its hash."""
+        return self.add_bytes(data)[0]
+
+    def add_bytes(self, data: bytes) -> tuple[str, bool]:
+        """
+        Stores data if not already present.
+
+        Returns:
+            (blob_hash, whether this call added the blob)
+        """
+        blob_hash = hashlib.sha256(data).hexdigest()
+        if self.exists(blob_hash):
+            return blob_hash, False
+        self._write(blob_hash, lambda f: f.write(data))
+        return blob_hash, True
+
+    def delete(self, blob_hash: str):
+        """Removes a blob if present."""
+        try:
+            os.remove(self.path(blob_hash))
+        except FileNotFoundError:
+            pass
+
+    def put_stream(self, stream) -> tuple[str, int]:
+        """
+        Copies a binary file object into the store chunk by chunk.
+
+        Returns:
+            (blob_hash, size in bytes)
+        """
+        blob_hash, size, _ = self.add_stream(stream)
+        return blob_hash, size
+
+    def add_stream(self, stream) -> tuple[str, int, bool]:
+        """
+        Like put_stream().
+
+        Returns:
+            (blob_hash, size in bytes, whether this call added the blob)
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(BLOB_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            blob_hash = digest.hexdigest()
+            added = self._move_into_place(tmp_path, blob_hash)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return blob_hash, size, added
+
+    def _write(self, blob_hash: str, write):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            self._move_into_place(tmp_path, blob_hash)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _move_into_place(self, tmp_path: str, blob_hash: str) -> bool:
+        target = self.path(blob_hash)
+        if os.path.exists(target):
+            return False  # Same content already stored; the temp file is removed by the caller
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+        return True
+
+
+_blob_store = None
+
+
+def get_blob_store() -> BlobStore:
+    """Returns the store at BLOB_STORE_PATH (recreated if the setting changes)."""
+    global _blob_store
+    if _blob_store is None or _blob_store.root != os.path.abspath(BLOB_STORE_PATH):
+        _blob_store = BlobStore(BLOB_STORE_PATH)
+    return _blob_store
@@ -1,126 +1,1017 @@
+import base64
+import json
+import re
 import sqlite3
 import os
 import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
+from pydantic import ValidationError
+
 # Add the app directory to the Python path
 app_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(app_dir))
 
 from models.receipt import ReceiptData
+from database.blob_store import get_blob_store
+from database.text_codec import compress_text, decompress_text
+from database.pool import ConnectionPool, configure_connection
 
 # Configuration - can be overridden by environment variable
 DATABASE_FILE = os.getenv('DATABASE_PATH', 'receipts.db')
+# Rows validated and inserted per executemany call by save_receipts()
+SAVE_CHUNK_SIZE = int(os.getenv('DATABASE_SAVE_CHUNK_SIZE', '1000'))
+
+# Columns returned by list and aggregate queries. raw_text is not a column of
+# receipts at all: it dominates row size and is never shown in list views, so
+# it lives compressed in receipt_texts and is loaded on demand.
+RECEIPT_LIST_COLUMNS = ('id', 'vendor', 'transaction_date', 'amount', 'currency',
+                        'category', 'upload_timestamp', 'created_at')
+
+# Whitelists for everything that ends up as an identifier in generated SQL.
+# Values are always bound as parameters; identifiers can't be, so they are
+# checked against these instead.
+RECEIPT_COLUMNS = RECEIPT_LIST_COLUMNS + ('blob_hash', 'raw_data_extension')
+RANGE_FEATURES = {'transaction_date': 'date', 'amount': 'number'}
+SEARCH_FEATURES = ('vendor', 'category', 'currency')
+# Columns of the receipts_fts full-text index
+FTS_FEATURES = ('vendor', 'category', 'raw_text')
+# Features whose keyword search is a MATCH on receipts_fts; 'all' searches
+# every indexed column at once. Vendor and category keep their substring
+# LIKE match, so 'bucks' still finds "Starbucks".
+FTS_SEARCH_FEATURES = ('raw_text', 'all')
+KEYWORD_SEARCH_FEATURES = SEARCH_FEATURES + ('raw_text', 'all')
+# Key columns of daily_rollups, in primary key order
+ROLLUP_GROUPS = ('day', 'vendor', 'category', 'currency')
+
+# In debug mode every generated query is run through EXPLAIN QUERY PLAN first
+# and the plan is kept in QUERY_PLANS, so index use can be checked against a
+# realistic database without attaching a profiler.
+DATABASE_DEBUG = os.getenv('DATABASE_DEBUG', '').lower() in ('1', 'true', 'yes')
+QUERY_PLANS = deque(maxlen=int(os.getenv('DATABASE_QUERY_PLAN_HISTORY', '200')))
+
+def _move_raw_text_to_side_table(cursor, batch_size: int = 5000):
+    """Migration 5: compresses every receipts.raw_text into receipt_texts."""
+    last_id = 0
+    while True:
+        rows = cursor.execute(
+            "SELECT id, raw_text FROM receipts WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        cursor.executemany(INSERT_TEXT_SQL, [_text_row(receipt_id, raw_text or '') for receipt_id, raw_text in rows])
+        last_id = rows[-1][0]
+
+def _text_row(receipt_id: int, raw_text: str) -> tuple:
+    codec, data = compress_text(raw_text)
+    return receipt_id, codec, len(raw_text), data
+
+def _index_receipt_texts(cursor, batch_size: int = 5000):
+    """Migration 6: adds every receipt, with its decompressed text, to receipts_fts."""
+    last_id = 0
+    while True:
+        rows = cursor.execute("""
+            SELECT r.id, r.vendor, r.category, t.codec, t.data
+            FROM receipts r LEFT JOIN receipt_texts t ON t.receipt_id = r.id
+            WHERE r.id > ? ORDER BY r.id LIMIT ?
+        """, (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "INSERT INTO receipts_fts (rowid, vendor, category, raw_text) VALUES (?, ?, ?, ?)",
+            [(receipt_id, vendor, category, decompress_text(codec, data) if data is not None else None)
+             for receipt_id, vendor, category, codec, data in rows],
+        )
+        last_id = rows[-1][0]
+
+# daily_rollups keys: NULL category or currency is stored as '' because
+# primary key columns can't be NULL; queries turn it back into NULL.
+_ROLLUP_KEY = ("{row}.transaction_date, {row}.vendor, COALESCE({row}.category, ''), "
+               "COALESCE({row}.currency, '')")
+_ROLLUP_MATCH = ("day = {row}.transaction_date AND vendor = {row}.vendor AND "
+                 "category = COALESCE({row}.category, '') AND currency = COALESCE({row}.currency, '')")
+_ROLLUP_ADD = f"""
+            INSERT INTO daily_rollups (day, vendor, category, currency, receipt_count, amount_sum)
+            VALUES ({_ROLLUP_KEY.format(row='new')}, 1, new.amount)
+            ON CONFLICT (day, vendor, category, currency) DO UPDATE
+            SET receipt_count = receipt_count + 1, amount_sum = amount_sum + excluded.amount_sum;"""
+_ROLLUP_REMOVE = f"""
+            UPDATE daily_rollups SET receipt_count = receipt_count - 1, amount_sum = amount_sum - old.amount
+            WHERE {_ROLLUP_MATCH.format(row='old')};
+            DELETE FROM daily_rollups WHERE {_ROLLUP_MATCH.format(row='old')} AND receipt_count <= 0;"""
+REBUILD_ROLLUPS_SQL = [
+    "DELETE FROM daily_rollups",
+    f"""
+    INSERT INTO daily_rollups (day, vendor, category, currency, receipt_count, amount_sum)
+    SELECT {_ROLLUP_KEY.format(row='r')}, COUNT(*), SUM(r.amount)
+    FROM receipts r GROUP BY 1, 2, 3, 4
+    """,
+]
+
+# Versioned schema changes, applied in order by migrate_database() and tracked
+# in PRAGMA user_version. Each step is an SQL statement or a callable taking a
+# cursor. Append new versions; never edit one that has shipped.
+SCHEMA_MIGRATIONS = [
+    (1, "secondary indexes for date, vendor, category, currency and amount filters", [
+        "CREATE INDEX IF NOT EXISTS idx_receipts_transaction_date ON receipts(transaction_date)",
+        "CREATE INDEX IF NOT EXISTS idx_receipts_vendor_date ON receipts(vendor, transaction_date)",
+        "CREATE INDEX IF NOT EXISTS idx_receipts_category_date ON receipts(category, transaction_date)",
+        "CREATE INDEX IF NOT EXISTS idx_receipts_currency ON receipts(currency)",
+        "CREATE INDEX IF NOT EXISTS idx_receipts_amount ON receipts(amount)",
+    ]),
+    (2, "exchange rate store shared by every worker process", [
+        """
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            rate_date TEXT NOT NULL,
+            from_currency TEXT NOT NULL,
+            to_currency TEXT NOT NULL,
+            rate REAL NOT NULL,
+            fetched_at TEXT NOT NULL,
+            PRIMARY KEY (from_currency, to_currency, rate_date)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (3, "amounts converted to the common base currencies, kept per receipt", [
+        """
+        CREATE TABLE IF NOT EXISTS receipt_amounts (
+            receipt_id INTEGER NOT NULL,
+            base_currency TEXT NOT NULL,
+            amount_in_base REAL NOT NULL,
+            PRIMARY KEY (receipt_id, base_currency)
+        ) WITHOUT ROWID
+        """,
+        # Converted amounts go stale when the receipt they came from changes
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_amounts_delete AFTER DELETE ON receipts
+        BEGIN
+            DELETE FROM receipt_amounts WHERE receipt_id = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_amounts_update
+        AFTER UPDATE OF amount, currency, transaction_date ON receipts
+        BEGIN
+            DELETE FROM receipt_amounts WHERE receipt_id = old.id;
+        END
+        """,
+    ]),
+    (4, "original uploads kept in the content-addressed blob store", [
+        "ALTER TABLE receipts ADD COLUMN blob_hash TEXT",
+        "ALTER TABLE receipts ADD COLUMN raw_data_extension TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_receipts_blob_hash ON receipts(blob_hash)",
+    ]),
+    (5, "raw text moved to the compressed receipt_texts side table", [
+        """
+        CREATE TABLE IF NOT EXISTS receipt_texts (
+            receipt_id INTEGER PRIMARY KEY,
+            codec TEXT NOT NULL,
+            text_size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_texts_delete AFTER DELETE ON receipts
+        BEGIN
+            DELETE FROM receipt_texts WHERE receipt_id = old.id;
+        END
+        """,
+        _move_raw_text_to_side_table,
+        # Rewrites receipts without the text; run VACUUM afterwards to shrink the file
+        "ALTER TABLE receipts DROP COLUMN raw_text",
+    ]),
+    (6, "FTS5 full-text index over vendor, category and raw text", [
+        # Keeps its own copy of the text: receipt_texts only holds it compressed
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS receipts_fts USING fts5(
+            vendor, category, raw_text,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """,
+        # rowid is the receipt id. The text is only known to the save path,
+        # which fills it in with INDEX_TEXT_SQL in the same transaction.
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_fts_insert AFTER INSERT ON receipts
+        BEGIN
+            INSERT INTO receipts_fts (rowid, vendor, category) VALUES (new.id, new.vendor, new.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_fts_update AFTER UPDATE OF vendor, category ON receipts
+        BEGIN
+            UPDATE receipts_fts SET vendor = new.vendor, category = new.category WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_fts_delete AFTER DELETE ON receipts
+        BEGIN
+            DELETE FROM receipts_fts WHERE rowid = old.id;
+        END
+        """,
+        _index_receipt_texts,
+    ]),
+    (7, "daily rollups of receipt count and amount per vendor, category and currency", [
+        """
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day TEXT NOT NULL,
+            vendor TEXT NOT NULL,
+            category TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            receipt_count INTEGER NOT NULL,
+            amount_sum REAL NOT NULL,
+            PRIMARY KEY (day, vendor, category, currency)
+        ) WITHOUT ROWID
+        """,
+        # Maintained in the transaction that writes the receipt, whichever path it takes
+        f"CREATE TRIGGER IF NOT EXISTS receipts_rollup_insert AFTER INSERT ON receipts BEGIN {_ROLLUP_ADD} END",
+        f"CREATE TRIGGER IF NOT EXISTS receipts_rollup_delete AFTER DELETE ON receipts BEGIN {_ROLLUP_REMOVE} END",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS receipts_rollup_update
+        AFTER UPDATE OF transaction_date, vendor, category, currency, amount ON receipts
+        BEGIN {_ROLLUP_REMOVE} {_ROLLUP_ADD} END
+        """,
+        *REBUILD_ROLLUPS_SQL,
+    ]),
+    (8, "version counter of changes to the vendor, category or currency of existing receipts", [
+        """
+        CREATE TABLE IF NOT EXISTS receipt_values_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO receipt_values_version (id, version) VALUES (1, 0)",
+        # New receipts are found by id, so only updates and deletes count
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_values_update AFTER UPDATE OF vendor, category, currency ON receipts
+        WHEN old.vendor IS NOT new.vendor OR old.category IS NOT new.category OR old.currency IS NOT new.currency
+        BEGIN
+            UPDATE receipt_values_version SET version = version + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS receipts_values_delete AFTER DELETE ON receipts
+        BEGIN
+            UPDATE receipt_values_version SET version = version + 1 WHERE id = 1;
+        END
+        """,
+    ]),
+]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Returns the connection pool for DATABASE_FILE, replacing it if the path changed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.database_file != DATABASE_FILE:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DATABASE_FILE)
+        return _pool
+
+def get_pool_stats() -> dict:
+    """Connection pool counters (checkouts, write wait time, lock retries) for monitoring."""
+    return get_pool().stats()
 
 def get_db_connection():
-    """Establishes a connection to the SQLite database."""
+    """
+    Opens a standalone connection with the pool's PRAGMAs applied.
+
+    Meant for scripts and one-off maintenance; request handlers should use
+    get_pool().read() / get_pool().write() instead.
+    """
     conn = sqlite3.connect(DATABASE_FILE)
     # This allows us to access columns by name
-    conn.row_factory = sqlite3.Row
-    return conn
+    return configure_connection(conn)
 
-def check_schema_version():
-    """Check if the database schema needs to be updated."""
-    conn = get_db_connection()
+def check_schema_version(conn) -> bool:
+    """Check if the receipts table already has the currency column."""
     cursor = conn.cursor()
-    
-    # Check if currency column exists
     cursor.execute("PRAGMA table_info(receipts)")
     columns = [column[1] for column in cursor.fetchall()]
-    conn.close()
-    
     return 'currency' in columns
 
+def get_schema_version(conn) -> int:
+    """Returns the last applied entry of SCHEMA_MIGRATIONS (0 if none)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
 def migrate_database():
-    """Migrate database schema to include missing fields."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    """Migrate database schema to include missing fields and apply pending versioned migrations."""
+    pool = get_pool()
     try:
-        # Add currency column if it doesn't exist
-        if not check_schema_version():
-            print("Adding currency column to database...")
-            cursor.execute("ALTER TABLE receipts ADD COLUMN currency TEXT DEFAULT 'INR'")
-            print("Database migration completed successfully.")
-        else:
+        with pool.write() as conn:
+            # Add currency column if it doesn't exist
+            if not check_schema_version(conn):
+                print("Adding currency column to database...")
+                conn.execute("ALTER TABLE receipts ADD COLUMN currency TEXT DEFAULT 'INR'")
+                print("Database migration completed successfully.")
+            current_version = get_schema_version(conn)
+
+        pending = [m for m in SCHEMA_MIGRATIONS if m[0] > current_version]
+        if not pending:
             print("Database schema is up to date.")
-            
-        conn.commit()
+
+        for version, description, steps in pending:
+            print(f"Applying migration {version}: {description}...")
+            # Each version is applied atomically, so a failure leaves the
+            # database at the previous version rather than half-migrated.
+            with pool.write() as conn:
+                cursor = conn.cursor()
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                # PRAGMA values can't be bound as parameters
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
     except sqlite3.Error as e:
         print(f"Database migration error: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
 
 def create_table():
     """Creates the receipts table if it doesn't already exist."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS receipts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            vendor TEXT NOT NULL,
-            transaction_date TEXT NOT NULL,
-            amount REAL NOT NULL CHECK(amount > 0),
-            currency TEXT NOT NULL DEFAULT 'INR',
-            category TEXT,
-            raw_text TEXT NOT NULL,
-            upload_timestamp TEXT NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
-    conn.commit()
-    conn.close()
-
-def save_receipt(receipt: ReceiptData) -> int:
+    with get_pool().write() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS receipts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                vendor TEXT NOT NULL,
+                transaction_date TEXT NOT NULL,
+                amount REAL NOT NULL CHECK(amount > 0),
+                currency TEXT NOT NULL DEFAULT 'INR',
+                category TEXT,
+                raw_text TEXT NOT NULL,
+                upload_timestamp TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+INSERT_RECEIPT_SQL = """
+    INSERT INTO receipts (vendor, transaction_date, amount, currency, category, upload_timestamp,
+                          blob_hash, raw_data_extension)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_TEXT_SQL = "INSERT OR REPLACE INTO receipt_texts (receipt_id, codec, text_size, data) VALUES (?, ?, ?, ?)"
+INDEX_TEXT_SQL = "UPDATE receipts_fts SET raw_text = ? WHERE rowid = ?"
+
+def _receipt_row(receipt: ReceiptData, new_blobs: list[str]) -> tuple:
+    """
+    Insert parameters for a receipt. Uploaded bytes are written to the blob
+    store first (once per distinct file), so only their hash reaches the row;
+    hashes of blobs this call added are appended to new_blobs, so a failed
+    save can remove them with discard_blobs().
+
+    Raises:
+        ValueError: If the receipt refers to a blob_hash the store doesn't have.
+    """
+    blob_hash = receipt.blob_hash
+    if receipt.raw_data:
+        blob_hash, added = get_blob_store().add_bytes(receipt.raw_data)
+        if added:
+            new_blobs.append(blob_hash)
+    elif blob_hash is not None and not get_blob_store().exists(blob_hash):
+        raise ValueError(_missing_blob_message(blob_hash))
+    return (
+        receipt.vendor,
+        receipt.transaction_date.isoformat(),
+        receipt.amount,
+        receipt.currency,
+        receipt.category,
+        receipt.upload_timestamp.isoformat(),
+        blob_hash,
+        receipt.raw_data_extension.lower(),
+    )
+
+def _missing_blob_message(blob_hash: str) -> str:
+    return f"No stored file with blob_hash '{blob_hash}'"
+
+def discard_blobs(blob_hashes: list[str]):
+    """
+    Removes blobs stored for a save that failed, unless a row references
+    them (another upload of the same file may have been saved meanwhile).
+    """
+    if not blob_hashes:
+        return
+    store = get_blob_store()
+    with get_pool().read() as conn:
+        for blob_hash in set(blob_hashes):
+            if conn.execute("SELECT 1 FROM receipts WHERE blob_hash = ? LIMIT 1", (blob_hash,)).fetchone() is None:
+                store.delete(blob_hash)
+
+def save_receipt(receipt: ReceiptData, amounts_in_base: dict[str, float] | None = None) -> int:
     """
     Saves a validated receipt record to the database.
 
     Args:
         receipt: A validated ReceiptData object.
+        amounts_in_base: Optional {base_currency: converted amount} stored in
+                         receipt_amounts in the same transaction.
 
     Returns:
         The ID of the newly inserted record.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    new_blobs = []
     try:
-        cursor.execute("""
-            INSERT INTO receipts (vendor, transaction_date, amount, currency, category, raw_text, upload_timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            receipt.vendor,
-            receipt.transaction_date.isoformat(),
-            receipt.amount,
-            receipt.currency,
-            receipt.category,
-            receipt.raw_text,
-            receipt.upload_timestamp.isoformat()
-        ))
-        conn.commit()
-        last_id = cursor.lastrowid
-        return last_id
-    except sqlite3.Error as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+        row = _receipt_row(receipt, new_blobs)
+        text_row = _text_row(None, receipt.raw_text)[1:]
+        with get_pool().write() as conn:
+            cursor = conn.execute(INSERT_RECEIPT_SQL, row)
+            receipt_id = cursor.lastrowid
+            conn.execute(INSERT_TEXT_SQL, (receipt_id, *text_row))
+            conn.execute(INDEX_TEXT_SQL, (receipt.raw_text, receipt_id))
+            if amounts_in_base:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO receipt_amounts (receipt_id, base_currency, amount_in_base) VALUES (?, ?, ?)",
+                    [(receipt_id, currency, amount) for currency, amount in amounts_in_base.items()],
+                )
+            return receipt_id
+    except Exception:
+        discard_blobs(new_blobs)
+        raise
+
+class ReceiptBatchError(ValueError):
+    """Raised by save_receipts() when rows fail validation; nothing is saved."""
+
+    def __init__(self, errors: list[dict]):
+        self.errors = errors  # [{"index": row index, "errors": pydantic errors}, ...]
+        super().__init__(f"{len(errors)} receipt(s) failed validation")
+
+
+def _validate_chunk(rows: list, offset: int) -> tuple[list[ReceiptData], list[dict]]:
+    receipts, errors = [], []
+    for index, row in enumerate(rows, start=offset):
+        try:
+            receipt = row if isinstance(row, ReceiptData) else ReceiptData(**row)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": json.loads(e.json(include_url=False, include_input=False))})
+            continue
+        if not receipt.raw_data and receipt.blob_hash is not None and not get_blob_store().exists(receipt.blob_hash):
+            errors.append({"index": index, "errors": [
+                {"type": "missing_blob", "loc": ["blob_hash"], "msg": _missing_blob_message(receipt.blob_hash)}
+            ]})
+            continue
+        receipts.append(receipt)
+    return receipts, errors
+
+
+def validate_receipts(rows) -> list[ReceiptData]:
+    """
+    Validates rows (ReceiptData objects or dicts of their fields) ahead of
+    save_receipts(), e.g. to convert their amounts first.
+
+    Raises:
+        ReceiptBatchError: Listing every row that fails validation.
+    """
+    receipts, errors = _validate_chunk(list(rows), 0)
+    if errors:
+        raise ReceiptBatchError(errors)
+    return receipts
+
+
+def _prepare_chunk(validated: list[ReceiptData], chunk_amounts, new_blobs: list[str]) -> tuple[list, list, list, list]:
+    """
+    Insert parameters of a validated chunk, keyed by position in the chunk
+    (ids are only known once the rows are inserted). Uploaded files are
+    stored and texts compressed here, so none of it runs inside the write
+    transaction.
+    """
+    receipt_rows = [_receipt_row(receipt, new_blobs) for receipt in validated]
+    text_rows = [_text_row(None, receipt.raw_text)[1:] for receipt in validated]
+    texts = [receipt.raw_text for receipt in validated]
+    amount_rows = [(position, currency, amount)
+                   for position, amounts in enumerate(chunk_amounts or ()) if amounts
+                   for currency, amount in amounts.items()]
+    return receipt_rows, text_rows, texts, amount_rows
+
+
+def save_receipts(receipts, amounts_in_base: list[dict[str, float]] | None = None,
+                  chunk_size: int = SAVE_CHUNK_SIZE, stats: dict | None = None) -> list[int]:
+    """
+    Saves many receipts in a single transaction: either all of them are
+    stored or, on error, none are.
+
+    Rows are validated, their files stored and their texts compressed
+    chunk_size at a time, before the write transaction is opened; the
+    transaction only runs the executemany inserts, so other writers wait
+    for the inserts alone.
+
+    Args:
+        receipts: Iterable of ReceiptData objects or dicts of their fields.
+        amounts_in_base: Optional per-receipt {base_currency: converted amount},
+                         a list aligned with receipts (see validate_receipts()).
+        chunk_size: Rows validated and inserted per executemany call.
+        stats: If given, filled with 'rows', 'seconds' and 'rows_per_second'.
+
+    Returns:
+        The IDs of the inserted records, in input order.
+
+    Raises:
+        ReceiptBatchError: If any row of a chunk fails validation.
+    """
+    start = time.perf_counter()
+    new_blobs = []
+    try:
+        chunks = []
+        offset = 0
+        rows = iter(receipts)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            validated, errors = _validate_chunk(chunk, offset)
+            if errors:
+                raise ReceiptBatchError(errors)
+            chunk_amounts = amounts_in_base[offset:offset + len(validated)] if amounts_in_base else None
+            chunks.append(_prepare_chunk(validated, chunk_amounts, new_blobs))
+            offset += len(validated)
+
+        receipt_ids = []
+        with get_pool().write() as conn:
+            for receipt_rows, text_rows, texts, amount_rows in chunks:
+                conn.executemany(INSERT_RECEIPT_SQL, receipt_rows)
+                # This connection is the only writer and the statement inserted the
+                # chunk without explicit ids, so they are consecutive up to the last one
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                chunk_ids = list(range(last_id - len(receipt_rows) + 1, last_id + 1))
+                receipt_ids.extend(chunk_ids)
+                conn.executemany(INSERT_TEXT_SQL, [(receipt_id, *text_row)
+                                                   for receipt_id, text_row in zip(chunk_ids, text_rows)])
+                conn.executemany(INDEX_TEXT_SQL, list(zip(texts, chunk_ids)))
+                if amount_rows:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO receipt_amounts (receipt_id, base_currency, amount_in_base) VALUES (?, ?, ?)",
+                        [(chunk_ids[position], currency, amount) for position, currency, amount in amount_rows],
+                    )
+    except Exception:
+        # Files stored for rows that were never committed
+        discard_blobs(new_blobs)
+        raise
+
+    seconds = time.perf_counter() - start
+    rows_per_second = len(receipt_ids) / seconds if seconds > 0 else 0.0
+    print(f"Saved {len(receipt_ids)} receipt(s) in {seconds:.3f}s ({rows_per_second:,.0f} rows/s)")
+    if stats is not None:
+        stats.update(rows=len(receipt_ids), seconds=round(seconds, 6), rows_per_second=round(rows_per_second, 1))
+    return receipt_ids
 
 def get_all_receipts() -> list[dict]:
     """Retrieves all receipts from the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("SELECT * FROM receipts ORDER BY transaction_date DESC")
-        receipts = [dict(row) for row in cursor.fetchall()]
-        return receipts
+        with get_pool().read() as conn:
+            cursor = conn.execute("SELECT * FROM receipts ORDER BY transaction_date DESC")
+            return [dict(row) for row in cursor.fetchall()]
     except sqlite3.Error as e:
         print(f"Database query error: {e}")
         return []
-    finally:
-        conn.close()
+
+def get_receipt_raw_text(receipt_id: int) -> str | None:
+    """The OCR text of a receipt, decompressed, or None if the receipt does not exist."""
+    with get_pool().read() as conn:
+        row = conn.execute("SELECT codec, data FROM receipt_texts WHERE receipt_id = ?", (receipt_id,)).fetchone()
+    if row is None:
+        return None
+    return decompress_text(row['codec'], row['data'])
+
+def get_distinct_values(feature: str, after_id: int = 0) -> tuple[list[str], int]:
+    """
+    Distinct non-null values of feature (vendor, category or currency) among
+    receipts with id > after_id, and the highest receipt id they cover.
+    Pass that id back as after_id to fetch only values added since. A returned
+    id below after_id means every value was returned again.
+    """
+    if feature not in SEARCH_FEATURES:
+        raise ValueError(f"Cannot list values of '{feature}'")
+    with get_pool().read() as conn:
+        # Ids only grow, so bounding the scan by last_id leaves rows committed
+        # in between for the next call instead of skipping them
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM receipts").fetchone()[0]
+        if last_id == after_id:
+            return [], last_id
+        if last_id < after_id:
+            after_id = 0  # The table was emptied or replaced; the caller should start over
+        cursor = conn.execute(
+            f"SELECT DISTINCT {feature} FROM receipts WHERE id > ? AND id <= ? AND {feature} IS NOT NULL",
+            (after_id, last_id),
+        )
+        return [row[0] for row in cursor.fetchall()], last_id
+
+def get_values_version() -> int:
+    """
+    Counter the database bumps whenever the vendor, category or currency of
+    an existing receipt changes or a receipt is deleted. Values collected
+    with get_distinct_values() under an older version may be stale.
+    """
+    with get_pool().read() as conn:
+        return conn.execute("SELECT version FROM receipt_values_version WHERE id = 1").fetchone()[0]
+
+def get_receipt_file(receipt_id: int) -> tuple[str, str] | None:
+    """(blob_hash, raw_data_extension) of a receipt's stored upload, or None if it has none."""
+    with get_pool().read() as conn:
+        row = conn.execute("SELECT blob_hash, raw_data_extension FROM receipts WHERE id = ?",
+                           (receipt_id,)).fetchone()
+    if row is None or row['blob_hash'] is None:
+        return None
+    return row['blob_hash'], row['raw_data_extension']
+
+def _escape_like(value: str) -> str:
+    """Escapes LIKE wildcards so keywords are matched literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_fts_query(keywords, feature: str = 'all') -> str | None:
+    """
+    Turns keywords into an FTS5 MATCH expression that matches rows containing
+    ANY of them in feature ('all' for every indexed column).
+
+    Each keyword becomes a phrase of prefix terms, so 'star' finds "Starbucks"
+    and 'grocery ma' finds "Grocery Mart". Terms are split on the characters
+    the tokenizer splits on and quoted, so FTS5 operators in user input are
+    matched literally. Returns None if no keyword has a searchable term.
+    """
+    phrases = []
+    for keyword in keywords:
+        terms = re.findall(r'[^\W_]+', keyword)
+        if terms:
+            phrases.append(' + '.join(f'"{term}"*' for term in terms))
+    if not phrases:
+        return None
+    columns = ' '.join(FTS_FEATURES) if feature == 'all' else feature
+    return f"{{{columns}}}: (" + " OR ".join(phrases) + ")"
+
+def _parse_range_bound(kind: str, value):
+    """Converts a range bound to the type stored in the column."""
+    try:
+        if kind == 'date':
+            return datetime.strptime(str(value), '%Y-%m-%d').date().isoformat()
+        return float(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid range value '{value}' for a {kind} range")
+
+def encode_cursor(record: dict) -> str:
+    """Opaque pagination cursor for the page following record."""
+    key = json.dumps([record['transaction_date'], record['id']])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Turns a cursor from encode_cursor() back into its (transaction_date, id) key."""
+    try:
+        transaction_date, receipt_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(transaction_date, str) or not isinstance(receipt_id, int):
+            raise ValueError
+        return transaction_date, receipt_id
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+def build_receipt_query(columns=RECEIPT_LIST_COLUMNS, range_feature=None, start=None, end=None,
+                        keywords=None, search_feature=None, search_values=None, sort_by=None,
+                        order='asc', after=None, limit=None) -> tuple[str, list]:
+    """
+    Builds a parameterized SELECT over the receipts table.
+
+    Args:
+        columns: Columns to select, must be receipts columns.
+        range_feature: 'transaction_date' or 'amount'. Applied only when both
+                       start and end are given (inclusive on both ends).
+        keywords: A row matches if search_feature contains ANY of them. For
+                  raw_text and 'all' they are prefix terms looked up in the
+                  receipts_fts index (see build_fts_query); for vendor,
+                  category and currency, case-insensitive substrings.
+        search_feature: Column the keywords are matched against, 'raw_text'
+                        for the OCR text or 'all' for every indexed column.
+        search_values: Exact values of search_feature (vendor, category or
+                       currency); a row matches if it equals ANY of them.
+                       Used for fuzzy search once the keywords have been
+                       resolved to stored values. An empty list matches nothing.
+        sort_by: Column to order by, or 'relevance' for the FTS5 rank of a
+                 keyword search. Defaults to transaction_date descending.
+        order: 'asc' or 'desc'.
+        after: (transaction_date, id) keyset of the last row of the previous
+               page; only rows after it in the sort order are returned.
+               Requires sorting by transaction_date.
+        limit: Maximum number of rows to return.
+
+    Returns:
+        A (sql, params) tuple ready for cursor.execute().
+
+    Raises:
+        ValueError: If a column, order, range bound or limit is invalid.
+    """
+    invalid = [c for c in columns if c not in RECEIPT_COLUMNS]
+    if invalid:
+        raise ValueError(f"Unknown column(s): {', '.join(invalid)}")
+
+    clauses = []
+    params = []
+    join, join_params = "", []
+
+    if range_feature and start is not None and end is not None:
+        if range_feature not in RANGE_FEATURES:
+            raise ValueError(f"Cannot filter by range on '{range_feature}'")
+        kind = RANGE_FEATURES[range_feature]
+        clauses.append(f"{range_feature} BETWEEN ? AND ?")
+        params.extend([_parse_range_bound(kind, start), _parse_range_bound(kind, end)])
+
+    keywords = [k for k in (keywords or []) if k]
+    if keywords and search_feature:
+        if search_feature not in KEYWORD_SEARCH_FEATURES:
+            raise ValueError(f"Cannot search in '{search_feature}'")
+        if search_feature in FTS_SEARCH_FEATURES:
+            match = build_fts_query(keywords, search_feature)
+            if match is None:
+                clauses.append("0")  # Only punctuation: nothing can match
+            else:
+                # A derived table keeps the FTS column names (vendor, category)
+                # from clashing with those of receipts
+                join = (" JOIN (SELECT rowid AS fts_id, rank AS fts_rank FROM receipts_fts "
+                        "WHERE receipts_fts MATCH ?) fts ON fts.fts_id = receipts.id")
+                join_params.append(match)
+        else:
+            like_clauses = []
+            for keyword in keywords:
+                like_clauses.append(f"{search_feature} LIKE ? ESCAPE '\\'")
+                params.append(f"%{_escape_like(keyword)}%")
+            clauses.append("(" + " OR ".join(like_clauses) + ")")
+
+    if search_values is not None:
+        if search_feature not in SEARCH_FEATURES:
+            raise ValueError(f"Cannot match values of '{search_feature}'")
+        if search_values:
+            clauses.append(f"{search_feature} IN ({', '.join('?' * len(search_values))})")
+            params.extend(search_values)
+        else:
+            clauses.append("0")
+
+    if sort_by == 'relevance':
+        if not join:
+            raise ValueError("Sorting by relevance requires a keyword search of raw_text or all")
+        # bm25 scores are lower for better matches
+        sort_by, direction = 'fts.fts_rank', 'asc'
+    elif sort_by:
+        if sort_by not in RECEIPT_LIST_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort_by}'")
+        direction = (order or 'asc').lower()
+        if direction not in ('asc', 'desc'):
+            raise ValueError(f"Invalid sort order '{order}'")
+    else:
+        sort_by, direction = 'transaction_date', 'desc'
+
+    if after is not None:
+        if sort_by != 'transaction_date':
+            raise ValueError("Cursor pagination requires sorting by transaction_date")
+        # Row-value comparison matches the ORDER BY below and can walk the
+        # transaction_date index, so deep pages cost the same as the first.
+        clauses.append(f"(transaction_date, id) {'<' if direction == 'desc' else '>'} (?, ?)")
+        params.extend(after)
+
+    sql = f"SELECT {', '.join(columns)} FROM receipts{join}"
+    params = join_params + params
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    # id breaks ties so pages of equal dates/amounts come back in a stable order
+    sql += f" ORDER BY {sort_by} {direction.upper()}, id {direction.upper()}"
+
+    if limit is not None:
+        limit = int(limit)
+        if limit < 0:
+            raise ValueError("Limit must not be negative")
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    return sql, params
+
+def explain_query(conn, sql: str, params=()) -> list[str]:
+    """
+    Returns the EXPLAIN QUERY PLAN steps for a query, e.g.
+    ['SEARCH receipts USING INDEX idx_receipts_transaction_date (transaction_date>? AND transaction_date<?)'].
+    """
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    # Columns are (id, parent, notused, detail)
+    return [row[3] for row in rows]
+
+def _record_query_plan(conn, sql: str, params):
+    """Stores the plan of a generated query when DATABASE_DEBUG is enabled."""
+    if not DATABASE_DEBUG:
+        return
+    try:
+        plan = explain_query(conn, sql, params)
+    except sqlite3.Error as e:
+        print(f"Could not explain query: {e}")
+        return
+    QUERY_PLANS.append({"sql": sql, "plan": plan, "timestamp": datetime.now().isoformat()})
+    print(f"Query plan for {sql}: {' | '.join(plan)}")
+
+def query_receipts(**filters) -> list[dict]:
+    """
+    Retrieves receipts matching the given filters.
+
+    Accepts the same keyword arguments as build_receipt_query().
+    """
+    sql, params = build_receipt_query(**filters)
+    try:
+        with get_pool().read() as conn:
+            _record_query_plan(conn, sql, params)
+            cursor = conn.execute(sql, params)
+            return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database query error: {e}")
+        return []
+
+def iter_receipts(batch_size: int = 500, **filters):
+    """
+    Streams receipts matching the given filters without materializing them.
+
+    Accepts the same keyword arguments as build_receipt_query(). The query is
+    built (and validated) immediately; rows are then fetched from the
+    server-side cursor batch_size at a time as the returned generator is consumed.
+    """
+    sql, params = build_receipt_query(**filters)
+
+    def generate():
+        with get_pool().read() as conn:
+            _record_query_plan(conn, sql, params)
+            cursor = conn.execute(sql, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+            finally:
+                cursor.close()
+
+    return generate()
+
+def get_exchange_rates(from_currency: str, to_currency: str, start: str, end: str) -> dict[str, float]:
+    """Returns the stored {rate_date: rate} for a currency pair between start and end (inclusive)."""
+    try:
+        with get_pool().read() as conn:
+            cursor = conn.execute(
+                "SELECT rate_date, rate FROM exchange_rates "
+                "WHERE from_currency = ? AND to_currency = ? AND rate_date BETWEEN ? AND ?",
+                (from_currency, to_currency, start, end),
+            )
+            return {row['rate_date']: row['rate'] for row in cursor.fetchall()}
+    except sqlite3.Error as e:
+        print(f"Could not read exchange rates: {e}")
+        return {}
+
+def save_exchange_rates(from_currency: str, to_currency: str, rates: dict[str, float]) -> int:
+    """Stores {rate_date: rate} for a currency pair, replacing existing values. Returns the row count."""
+    if not rates:
+        return 0
+    fetched_at = datetime.now().isoformat()
+    rows = [(rate_date, from_currency, to_currency, rate, fetched_at) for rate_date, rate in rates.items()]
+    try:
+        with get_pool().write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO exchange_rates "
+                "(rate_date, from_currency, to_currency, rate, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+    except sqlite3.Error as e:
+        print(f"Could not store exchange rates: {e}")
+        return 0
+
+def save_amounts_in_base(rows) -> int:
+    """Stores (receipt_id, base_currency, amount_in_base) rows, replacing existing values."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    try:
+        with get_pool().write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO receipt_amounts (receipt_id, base_currency, amount_in_base) VALUES (?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+    except sqlite3.Error as e:
+        print(f"Could not store converted amounts: {e}")
+        return 0
+
+def get_receipts_missing_amount_in_base(base_currency: str, after_id: int = 0, limit: int = 5000) -> list[dict]:
+    """Returns receipts with id > after_id that have no converted amount for base_currency, in id order."""
+    with get_pool().read() as conn:
+        cursor = conn.execute("""
+            SELECT id, amount, currency, transaction_date FROM receipts r
+            WHERE id > ? AND NOT EXISTS (
+                SELECT 1 FROM receipt_amounts ra WHERE ra.receipt_id = r.id AND ra.base_currency = ?
+            )
+            ORDER BY id LIMIT ?
+        """, (after_id, base_currency, limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+def _amounts_in_base_source(base_currency: str, filters: dict, columns=()) -> tuple[str, list]:
+    """Filtered receipts (as a subquery) joined to their converted amounts for base_currency."""
+    filters = dict(filters)
+    columns = tuple(filters.pop('columns', ())) + tuple(columns)
+    columns = tuple(dict.fromkeys(('id', 'amount', 'currency', 'transaction_date') + columns))
+    sql, params = build_receipt_query(columns=columns, **filters)
+    source = (f"({sql}) r LEFT JOIN receipt_amounts ra "
+              "ON ra.receipt_id = r.id AND ra.base_currency = ?")
+    return source, params + [base_currency]
+
+def query_amounts_in_base(base_currency: str, **filters) -> list[dict]:
+    """
+    Like query_receipts(), with each record's stored 'amount_in_base' for
+    base_currency added (None where it hasn't been converted yet).
+    """
+    source, params = _amounts_in_base_source(base_currency, filters)
+    sql = f"SELECT r.*, ra.amount_in_base FROM {source}"
+    try:
+        with get_pool().read() as conn:
+            _record_query_plan(conn, sql, params)
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+    except sqlite3.Error as e:
+        print(f"Database query error: {e}")
+        return []
+
+def aggregate_amounts_in_base(base_currency: str, group_by: str | None = None, **filters) -> list[dict]:
+    """
+    Sums and averages the stored converted amounts of the filtered receipts in SQL.
+
+    Returns one row per group_by value (vendor, category or currency), or a
+    single row without it, with record_count, converted_count, total and mean.
+    total and mean only cover converted receipts; they describe the whole
+    selection only when converted_count equals record_count.
+    """
+    if group_by is not None and group_by not in SEARCH_FEATURES:
+        raise ValueError(f"Cannot group by '{group_by}'")
+    source, params = _amounts_in_base_source(base_currency, filters, (group_by,) if group_by else ())
+    sql = ("SELECT " + (f"r.{group_by} AS {group_by}, " if group_by else "") +
+           "COUNT(*) AS record_count, COUNT(ra.amount_in_base) AS converted_count, "
+           "COALESCE(SUM(ra.amount_in_base), 0) AS total, AVG(ra.amount_in_base) AS mean "
+           f"FROM {source}" + (f" GROUP BY r.{group_by}" if group_by else ""))
+    with get_pool().read() as conn:
+        _record_query_plan(conn, sql, params)
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+def median_amount_in_base(base_currency: str, **filters) -> float | None:
+    """Median of the stored converted amounts of the filtered receipts, computed in SQL."""
+    source, params = _amounts_in_base_source(base_currency, filters)
+    values = f"SELECT ra.amount_in_base AS value FROM {source} WHERE ra.amount_in_base IS NOT NULL"
+    sql = (f"WITH v AS ({values}), n AS (SELECT COUNT(*) AS c FROM v) "
+           "SELECT AVG(value) FROM (SELECT value FROM v ORDER BY value "
+           "LIMIT 2 - (SELECT c FROM n) % 2 OFFSET ((SELECT c FROM n) - 1) / 2)")
+    with get_pool().read() as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+def rebuild_daily_rollups() -> int:
+    """Recomputes daily_rollups from the receipts table. Returns the number of rollup rows."""
+    with get_pool().write() as conn:
+        for sql in REBUILD_ROLLUPS_SQL:
+            conn.execute(sql)
+        count = conn.execute("SELECT COUNT(*) FROM daily_rollups").fetchone()[0]
+    print(f"Rebuilt daily rollups: {count} row(s)")
+    return count
+
+def query_daily_rollups(group_by=ROLLUP_GROUPS, start=None, end=None,
+                        search_feature=None, search_values=None) -> list[dict]:
+    """
+    Receipt counts and amount sums from daily_rollups, summed over the
+    group_by keys (any of ROLLUP_GROUPS), so the cost depends on the number
+    of days and groups rather than receipts.
+
+    Args:
+        group_by: Keys to keep; every other key is summed over.
+        start, end: Inclusive day range, applied only when both are given.
+        search_feature, search_values: Keep only rows whose vendor, category
+                                       or currency is one of search_values.
+
+    Returns:
+        Dicts with the group_by keys, 'receipt_count' and 'amount_sum' (in
+        the row's currency, so keep 'currency' in group_by to convert it).
+    """
+    invalid = [g for g in group_by if g not in ROLLUP_GROUPS]
+    if invalid:
+        raise ValueError(f"Cannot group rollups by {', '.join(invalid)}")
+
+    clauses, params = [], []
+    if start is not None and end is not None:
+        clauses.append("day BETWEEN ? AND ?")
+        params.extend([_parse_range_bound('date', start), _parse_range_bound('date', end)])
+    if search_values is not None:
+        if search_feature not in SEARCH_FEATURES:
+            raise ValueError(f"Cannot match values of '{search_feature}'")
+        stored = ['' if value is None else value for value in search_values]
+        clauses.append(f"{search_feature} IN ({', '.join('?' * len(stored))})" if stored else "0")
+        params.extend(stored)
+
+    keys = [g if g == 'day' else f"NULLIF({g}, '') AS {g}" for g in group_by]
+    totals = ['SUM(receipt_count) AS receipt_count', 'SUM(amount_sum) AS amount_sum']
+    sql = f"SELECT {', '.join(keys + totals)} FROM daily_rollups"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if group_by:
+        sql += f" GROUP BY {', '.join(str(i) for i in range(1, len(group_by) + 1))}"
+    with get_pool().read() as conn:
+        _record_query_plan(conn, sql, params)
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
 
 def initialize_database():
     """Initialize database with proper schema and migrations."""
@@ -135,4 +1026,6 @@ initialize_database()
 if __name__ == '__main__':
     print("Running database initialization...")
     initialize_database()
+    if '--rebuild-rollups' in sys.argv[1:]:
+        rebuild_daily_rollups()
     print("Database setup completed successfully.")
\ No newline at end of file
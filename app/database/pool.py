@@ -0,0 +1,177 @@
+"""
+SQLite connection pool shared across Flask requests.
+
+Every thread gets its own long-lived read connection, and all writes go
+through a single writer connection guarded by a lock. The database runs in WAL
+mode, so readers never block on the writer and the writer never waits for
+readers; only writers from other processes can make BEGIN IMMEDIATE wait,
+which is retried with backoff and counted in the pool stats.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Tuning - can be overridden by environment variables
+BUSY_TIMEOUT_MS = int(os.getenv('DATABASE_BUSY_TIMEOUT_MS', '5000'))
+# Negative cache_size is in KiB rather than pages
+CACHE_SIZE_KIB = int(os.getenv('DATABASE_CACHE_SIZE_KIB', '65536'))
+MMAP_SIZE_BYTES = int(os.getenv('DATABASE_MMAP_SIZE', str(256 * 1024 * 1024)))
+LOCK_RETRIES = int(os.getenv('DATABASE_LOCK_RETRIES', '5'))
+LOCK_RETRY_BACKOFF_SECONDS = 0.05
+
+
+def configure_connection(conn: sqlite3.Connection, read_only: bool = False) -> sqlite3.Connection:
+    """Applies the pool's PRAGMAs to a connection and enables access by column name."""
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection that can be weakly referenced."""
+
+
+def _is_lock_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class ConnectionPool:
+    """Per-thread read connections plus one serialized writer for a database file."""
+
+    def __init__(self, database_file: str):
+        self.database_file = database_file
+        self._local = threading.local()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Weak, so read connections of finished request threads can be freed
+        self._readers = weakref.WeakSet()
+        self._closed = False
+        self._stats = {
+            "read_checkouts": 0,
+            "write_checkouts": 0,
+            "write_wait_seconds": 0.0,
+            "max_write_wait_seconds": 0.0,
+            "lock_retries": 0,
+            "lock_failures": 0,
+        }
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        # The writer is shared between threads (serialized by _writer_lock) and
+        # manages its own transactions, hence autocommit mode.
+        conn = sqlite3.connect(
+            self.database_file,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=read_only,
+            isolation_level='' if read_only else None,
+            factory=_PooledConnection,
+        )
+        if not read_only:
+            conn.execute("PRAGMA journal_mode = WAL")
+        return configure_connection(conn, read_only=read_only)
+
+    def _bump(self, key: str, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    @contextmanager
+    def read(self):
+        """Yields this thread's read-only connection."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Make sure the file is in WAL mode before the first reader opens it
+            if self._writer is None:
+                with self._writer_lock:
+                    self._get_writer()
+            conn = self._connect(read_only=True)
+            self._local.conn = conn
+            with self._stats_lock:
+                self._readers.add(conn)
+        self._bump("read_checkouts")
+        yield conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect(read_only=False)
+        return self._writer
+
+    def _begin_immediate(self, conn: sqlite3.Connection):
+        """Takes the database write lock, retrying while another process holds it."""
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_lock_error(e) or attempt == LOCK_RETRIES:
+                    if _is_lock_error(e):
+                        self._bump("lock_failures")
+                    raise
+                self._bump("lock_retries")
+                print(f"Database is locked, retrying write ({attempt + 1}/{LOCK_RETRIES})")
+                time.sleep(LOCK_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+    @contextmanager
+    def write(self):
+        """
+        Yields the writer connection inside a transaction.
+
+        The transaction is committed when the block exits normally and rolled
+        back if it raises.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        wait_start = time.perf_counter()
+        with self._writer_lock:
+            waited = time.perf_counter() - wait_start
+            with self._stats_lock:
+                self._stats["write_checkouts"] += 1
+                self._stats["write_wait_seconds"] += waited
+                self._stats["max_write_wait_seconds"] = max(self._stats["max_write_wait_seconds"], waited)
+
+            conn = self._get_writer()
+            self._begin_immediate(conn)
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the pool counters for monitoring."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["open_read_connections"] = len(self._readers)
+        stats["write_wait_seconds"] = round(stats["write_wait_seconds"], 6)
+        stats["max_write_wait_seconds"] = round(stats["max_write_wait_seconds"], 6)
+        stats["database_file"] = self.database_file
+        return stats
+
+    def close(self):
+        """Closes every connection the pool has opened."""
+        self._closed = True
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._stats_lock:
+            readers, self._readers = list(self._readers), weakref.WeakSet()
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Connections created in other threads can only be closed
+                # there; they are released when their thread exits.
+                pass
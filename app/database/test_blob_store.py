@@ -0,0 +1,46 @@
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+
+from blob_store import BlobStore, is_blob_hash
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stored_files(self):
+        return [os.path.join(d, f) for d, _, files in os.walk(self.tmp.name) for f in files]
+
+    def test_identical_content_is_stored_once(self):
+        data = b"%PDF-1.4 receipt" * 1000
+        blob_hash = self.store.put_bytes(data)
+        self.assertEqual(blob_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.store.put_stream(io.BytesIO(data)), (blob_hash, len(data)))
+        self.assertEqual(self.store.add_stream(io.BytesIO(data)), (blob_hash, len(data), False))
+        self.assertTrue(self.store.add_stream(io.BytesIO(b"new"))[2])
+        self.store.delete(hashlib.sha256(b"new").hexdigest())
+        self.assertEqual(self.stored_files(), [self.store.path(blob_hash)])
+        with self.store.open(blob_hash) as f:
+            self.assertEqual(f.read(), data)
+
+    def test_sharded_layout(self):
+        blob_hash = self.store.put_bytes(b"a")
+        self.assertEqual(self.store.path(blob_hash),
+                         os.path.join(self.tmp.name, blob_hash[:2], blob_hash[2:4], blob_hash))
+
+    def test_rejects_non_hashes(self):
+        self.assertFalse(is_blob_hash('../../etc/passwd'))
+        with self.assertRaises(ValueError):
+            self.store.path('../../etc/passwd')
+
+
+if __name__ == '__main__':
+    unittest.main()
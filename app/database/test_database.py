@@ -0,0 +1,436 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date
+from pathlib import Path
+
+# Point the module at a throwaway database before it initializes itself on import
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_PATH', os.path.join(_tmp_dir, 'test_receipts.db'))
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from database import blob_store, database
+from models.receipt import ReceiptData
+
+
+def make_receipt(vendor, transaction_date, amount, category=None, currency='INR'):
+    return ReceiptData(
+        vendor=vendor,
+        transaction_date=transaction_date,
+        amount=amount,
+        category=category,
+        currency=currency,
+        raw_text=f"{vendor} total {amount}",
+        raw_data=b"",
+        raw_data_extension="txt",
+    )
+
+
+class TestReceiptQueries(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        for receipt in [
+            make_receipt('Starbucks', date(2025, 7, 19), 7.50, 'Coffee', 'USD'),
+            make_receipt('Grocery Mart', date(2025, 7, 18), 120.00, 'Groceries'),
+            make_receipt('Starbucks', date(2025, 7, 20), 12.50, 'Coffee', 'USD'),
+            make_receipt('Amazon', date(2025, 7, 15), 45.50),
+            make_receipt('Grocery Mart', date(2025, 7, 20), 75.00, 'Groceries'),
+            make_receipt('Shell 100%', date(2025, 7, 17), 65.00, 'Gas'),
+        ]:
+            database.save_receipt(receipt)
+
+    def test_default_order_is_newest_first(self):
+        records = database.query_receipts()
+        self.assertEqual(len(records), 6)
+        dates = [r['transaction_date'] for r in records]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_list_columns_exclude_raw_text(self):
+        records = database.query_receipts()
+        self.assertNotIn('raw_text', records[0])
+        self.assertEqual(set(records[0]), set(database.RECEIPT_LIST_COLUMNS))
+
+    def test_date_range_is_inclusive(self):
+        records = database.query_receipts(range_feature='transaction_date',
+                                          start='2025-07-18', end='2025-07-19')
+        self.assertEqual({r['vendor'] for r in records}, {'Starbucks', 'Grocery Mart'})
+
+    def test_amount_range(self):
+        records = database.query_receipts(range_feature='amount', start='50', end='100')
+        self.assertEqual(sorted(r['amount'] for r in records), [65.00, 75.00])
+
+    def test_keywords_match_any_case_insensitive(self):
+        records = database.query_receipts(keywords=['star', 'AMAZ'], search_feature='vendor')
+        self.assertEqual(len(records), 3)
+
+    def test_keyword_wildcards_are_literal(self):
+        records = database.query_receipts(keywords=['100%'], search_feature='vendor')
+        self.assertEqual([r['vendor'] for r in records], ['Shell 100%'])
+        self.assertEqual(database.query_receipts(keywords=['_'], search_feature='vendor'), [])
+
+    def test_sort_and_limit(self):
+        records = database.query_receipts(sort_by='amount', order='desc', limit=2)
+        self.assertEqual([r['amount'] for r in records], [120.00, 75.00])
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen = []
+        after = None
+        while True:
+            page = database.query_receipts(after=after, limit=4)
+            seen.extend(r['id'] for r in page)
+            if len(page) < 4:
+                break
+            after = database.decode_cursor(database.encode_cursor(page[-1]))
+        self.assertEqual(seen, [r['id'] for r in database.query_receipts()])
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_cursor_requires_date_order(self):
+        with self.assertRaises(ValueError):
+            database.build_receipt_query(sort_by='amount', after=('2025-07-20', 3))
+        with self.assertRaises(ValueError):
+            database.decode_cursor('not-a-cursor')
+
+    def test_iter_receipts_streams_same_rows(self):
+        streamed = list(database.iter_receipts(batch_size=2, sort_by='amount'))
+        self.assertEqual(streamed, database.query_receipts(sort_by='amount'))
+
+    def test_invalid_identifiers_are_rejected(self):
+        with self.assertRaises(ValueError):
+            database.build_receipt_query(sort_by='amount; DROP TABLE receipts')
+        with self.assertRaises(ValueError):
+            database.build_receipt_query(keywords=['x'], search_feature='blob_hash')
+        with self.assertRaises(ValueError):
+            database.build_receipt_query(range_feature='amount', start='cheap', end='10')
+
+
+class TestIndexes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+
+    def test_migrations_are_recorded(self):
+        conn = database.get_db_connection()
+        try:
+            self.assertEqual(database.get_schema_version(conn), database.SCHEMA_MIGRATIONS[-1][0])
+            indexes = {row[1] for row in conn.execute("PRAGMA index_list(receipts)")}
+        finally:
+            conn.close()
+        self.assertIn('idx_receipts_transaction_date', indexes)
+        self.assertIn('idx_receipts_vendor_date', indexes)
+
+    def test_date_range_uses_index(self):
+        sql, params = database.build_receipt_query(range_feature='transaction_date',
+                                                   start='2025-01-01', end='2025-01-31')
+        conn = database.get_db_connection()
+        try:
+            plan = ' '.join(database.explain_query(conn, sql, params))
+        finally:
+            conn.close()
+        self.assertIn('idx_receipts_transaction_date', plan)
+
+    def test_debug_mode_records_plans(self):
+        database.DATABASE_DEBUG = True
+        try:
+            database.QUERY_PLANS.clear()
+            database.query_receipts(keywords=['x'], search_feature='vendor')
+        finally:
+            database.DATABASE_DEBUG = False
+        self.assertEqual(len(database.QUERY_PLANS), 1)
+        self.assertTrue(database.QUERY_PLANS[0]['plan'])
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+
+    def test_wal_mode(self):
+        with database.get_pool().read() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+
+    def test_read_connections_are_read_only(self):
+        with database.get_pool().read() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM receipts")
+
+    def test_failed_write_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with database.get_pool().write() as conn:
+                conn.execute("INSERT INTO receipts (vendor, transaction_date, amount, upload_timestamp) "
+                             "VALUES ('Temp', '2025-01-01', 1, '')")
+                raise RuntimeError("boom")
+        self.assertEqual(database.query_receipts(), [])
+
+    def test_concurrent_reads_and_writes(self):
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(20):
+                    database.save_receipt(make_receipt(f"Vendor {n}", date(2025, 1, 1 + i), 10 + i))
+                    database.query_receipts(keywords=[f"Vendor {n}"], search_feature='vendor')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(database.query_receipts()), 160)
+        stats = database.get_pool_stats()
+        self.assertGreaterEqual(stats['write_checkouts'], 160)
+        self.assertGreaterEqual(stats['read_checkouts'], 160)
+        self.assertEqual(stats['lock_failures'], 0)
+
+
+class TestBulkSave(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+
+    def test_ids_match_rows_across_chunks(self):
+        database.save_receipt(make_receipt('Existing', date(2025, 1, 1), 1))
+        rows = (make_receipt(f"Vendor {i}", date(2025, 1, 2), 10 + i) for i in range(25))
+        stats = {}
+        ids = database.save_receipts(rows, amounts_in_base=[{'USD': (10 + i) / 80} for i in range(25)],
+                                     chunk_size=10, stats=stats)
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(stats['rows'], 25)
+        vendors = {r['id']: r['vendor'] for r in database.query_receipts()}
+        self.assertEqual([vendors[i] for i in ids], [f"Vendor {i}" for i in range(25)])
+        stored = {r['id']: r['amount_in_base'] for r in database.query_amounts_in_base('USD')}
+        self.assertAlmostEqual(stored[ids[-1]], 34 / 80)
+
+    def test_validate_receipts_lists_every_invalid_row(self):
+        good = dict(make_receipt('Good', date(2025, 1, 2), 10))
+        with self.assertRaises(database.ReceiptBatchError) as raised:
+            database.validate_receipts([dict(good, vendor='12345'), good, dict(good, amount=-1)])
+        self.assertEqual([e['index'] for e in raised.exception.errors], [0, 2])
+        self.assertEqual(len(database.validate_receipts([good, make_receipt('Other', date(2025, 1, 2), 5)])), 2)
+
+    def test_invalid_row_saves_nothing(self):
+        good = dict(make_receipt('Good', date(2025, 1, 2), 10))
+        bad = dict(good, vendor='12345')
+        with self.assertRaises(database.ReceiptBatchError) as raised:
+            database.save_receipts([good] * 5 + [bad], chunk_size=4)
+        self.assertEqual([e['index'] for e in raised.exception.errors], [5])
+        self.assertEqual(database.query_receipts(), [])
+
+
+class TestStoredFiles(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        self.blob_root = tempfile.mkdtemp()
+        self._blob_path = blob_store.BLOB_STORE_PATH
+        blob_store.BLOB_STORE_PATH = self.blob_root
+
+    def tearDown(self):
+        blob_store.BLOB_STORE_PATH = self._blob_path
+
+    def test_uploads_are_stored_once_by_hash(self):
+        receipt = make_receipt('DMart', date(2025, 1, 2), 10).model_copy(
+            update={'raw_data': b'scan', 'raw_data_extension': 'PNG'})
+        first = database.save_receipt(receipt)
+        second = database.save_receipts([receipt])[0]
+        blob_hash, extension = database.get_receipt_file(first)
+        self.assertEqual(database.get_receipt_file(second), (blob_hash, 'png'))
+        with blob_store.get_blob_store().open(blob_hash) as f:
+            self.assertEqual(f.read(), b'scan')
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.blob_root)), 1)
+
+    def test_failed_save_removes_the_files_it_stored(self):
+        kept = make_receipt('DMart', date(2025, 1, 2), 10).model_copy(update={'raw_data': b'kept'})
+        database.save_receipt(kept)
+        rows = [kept.model_copy(update={'raw_data': data}) for data in (b'kept', b'new')]
+        with self.assertRaises(database.ReceiptBatchError):
+            database.save_receipts(rows + [dict(rows[0], vendor='12345')], chunk_size=2)
+        stored = [f for _, _, files in os.walk(self.blob_root) for f in files]
+        self.assertEqual(stored, [blob_store.get_blob_store().add_bytes(b'kept')[0]])
+
+    def test_receipt_without_file(self):
+        receipt_id = database.save_receipt(make_receipt('DMart', date(2025, 1, 2), 10))
+        self.assertIsNone(database.get_receipt_file(receipt_id))
+
+
+class TestRawText(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+
+    def test_text_is_stored_compressed_and_loaded_on_demand(self):
+        database.initialize_database()
+        receipt_id = database.save_receipt(make_receipt('DMart', date(2025, 1, 2), 10))
+        bulk_id, = database.save_receipts([make_receipt('Jio', date(2025, 1, 3), 20)])
+        self.assertEqual(database.get_receipt_raw_text(receipt_id), "DMart total 10")
+        self.assertEqual(database.get_receipt_raw_text(bulk_id), "Jio total 20")
+        self.assertNotIn('raw_text', database.get_all_receipts()[0])
+
+        with database.get_pool().write() as conn:
+            conn.execute("DELETE FROM receipts WHERE id = ?", (receipt_id,))
+        self.assertIsNone(database.get_receipt_raw_text(receipt_id))
+
+    def test_migration_moves_existing_text(self):
+        # A database as it was before migration 5
+        database.create_table()
+        with database.get_pool().write() as conn:
+            for version, _, steps in database.SCHEMA_MIGRATIONS[:4]:
+                for step in steps:
+                    conn.execute(step)
+            conn.execute("PRAGMA user_version = 4")
+            conn.execute("INSERT INTO receipts (vendor, transaction_date, amount, raw_text, upload_timestamp) "
+                         "VALUES ('Legacy', '2024-01-01', 5, 'legacy text', '')")
+        database.migrate_database()
+
+        with database.get_pool().read() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(receipts)")}
+        self.assertNotIn('raw_text', columns)
+        self.assertEqual(database.get_receipt_raw_text(1), 'legacy text')
+        self.assertEqual(len(database.query_receipts(keywords=['legacy'], search_feature='raw_text')), 1)
+
+
+class TestFullTextSearch(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        self.ids = database.save_receipts([
+            make_receipt('Grocery Mart', date(2025, 7, 18), 120.00, 'Groceries'),
+            make_receipt('Starbucks', date(2025, 7, 19), 7.50, 'Coffee'),
+        ])
+        self.ids.append(database.save_receipt(make_receipt('Café Mart', date(2025, 7, 20), 30.00, 'Coffee')))
+
+    def search(self, keywords, feature='vendor', **filters):
+        return [r['id'] for r in database.query_receipts(keywords=keywords, search_feature=feature, **filters)]
+
+    def test_prefix_phrases(self):
+        grocery, starbucks, cafe = self.ids
+        self.assertEqual(self.search(['mar'], 'all'), [cafe, grocery])
+        self.assertEqual(self.search(['grocery ma'], 'all'), [grocery])
+        self.assertEqual(self.search(['cafe'], 'all'), [cafe])  # Diacritics are folded
+        self.assertEqual(self.search(['bucks'], 'all'), [])  # Terms match from their start
+        self.assertEqual(self.search(['"OR*'], 'all'), [])  # Query syntax is matched literally
+
+    def test_vendor_and_category_match_substrings(self):
+        grocery, starbucks, cafe = self.ids
+        self.assertEqual(self.search(['bucks']), [starbucks])
+        self.assertEqual(self.search(['ART', 'xyz']), [cafe, grocery])
+        self.assertEqual(self.search(['ffe'], 'category'), [cafe, starbucks])
+        self.assertEqual(self.search(['100%']), [])  # LIKE wildcards are matched literally
+        with self.assertRaises(ValueError):
+            database.build_receipt_query(keywords=['star'], search_feature='vendor', sort_by='relevance')
+
+    def test_raw_text_and_all_columns(self):
+        grocery, starbucks, cafe = self.ids
+        self.assertEqual(self.search(['total 7'], 'raw_text'), [starbucks])
+        self.assertEqual(self.search(['coffee'], 'all'), [cafe, starbucks])
+        self.assertEqual(self.search(['coffee'], 'vendor'), [])
+
+    def test_relevance_order(self):
+        grocery, starbucks, cafe = self.ids
+        # Newest first by default; Grocery Mart matches both keywords, in three columns
+        self.assertEqual(self.search(['mart', 'groc'], 'all'), [cafe, grocery])
+        self.assertEqual(self.search(['mart', 'groc'], 'all', sort_by='relevance'), [grocery, cafe])
+        with self.assertRaises(ValueError):
+            database.build_receipt_query(sort_by='relevance')
+
+    def test_distinct_values_and_value_lookup(self):
+        grocery, starbucks, cafe = self.ids
+        values, last_id = database.get_distinct_values('category')
+        self.assertEqual((sorted(values), last_id), (['Coffee', 'Groceries'], cafe))
+        self.assertEqual(database.get_distinct_values('category', after_id=last_id), ([], last_id))
+        self.assertEqual(self.search([], 'category', search_values=['Coffee']), [cafe, starbucks])
+        self.assertEqual(self.search([], 'category', search_values=[]), [])
+
+    def test_values_version_counts_updates_and_deletes(self):
+        grocery, starbucks, cafe = self.ids
+        version = database.get_values_version()
+        database.save_receipt(make_receipt('Jio', date(2025, 7, 21), 5))
+        with database.get_pool().write() as conn:
+            conn.execute("UPDATE receipts SET amount = 8 WHERE id = ?", (starbucks,))
+        self.assertEqual(database.get_values_version(), version)
+        with database.get_pool().write() as conn:
+            conn.execute("UPDATE receipts SET category = 'Cafe' WHERE id = ?", (starbucks,))
+            conn.execute("DELETE FROM receipts WHERE id = ?", (grocery,))
+        self.assertEqual(database.get_values_version(), version + 2)
+
+    def test_index_follows_updates_and_deletes(self):
+        grocery, starbucks, cafe = self.ids
+        with database.get_pool().write() as conn:
+            conn.execute("UPDATE receipts SET vendor = 'Blue Tokai' WHERE id = ?", (cafe,))
+            conn.execute("DELETE FROM receipts WHERE id = ?", (grocery,))
+        self.assertEqual(self.search(['mart']), [])
+        self.assertEqual(self.search(['tokai']), [cafe])
+        self.assertEqual(self.search(['groceries'], 'category'), [])
+
+
+
+class TestDailyRollups(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        database.save_receipt(make_receipt('DMart', date(2025, 1, 2), 10, 'Groceries'))
+        database.save_receipts([
+            make_receipt('DMart', date(2025, 1, 2), 15, 'Groceries'),
+            make_receipt('DMart', date(2025, 1, 2), 5, 'Groceries', 'USD'),
+            make_receipt('Jio', date(2025, 1, 3), 20),
+        ])
+
+    def rollups(self):
+        return database.query_daily_rollups()
+
+    def test_maintained_on_save(self):
+        self.assertEqual(self.rollups(), [
+            {'day': '2025-01-02', 'vendor': 'DMart', 'category': 'Groceries', 'currency': 'INR',
+             'receipt_count': 2, 'amount_sum': 25.0},
+            {'day': '2025-01-02', 'vendor': 'DMart', 'category': 'Groceries', 'currency': 'USD',
+             'receipt_count': 1, 'amount_sum': 5.0},
+            {'day': '2025-01-03', 'vendor': 'Jio', 'category': None, 'currency': 'INR',
+             'receipt_count': 1, 'amount_sum': 20.0},
+        ])
+
+    def test_grouping_and_filters(self):
+        self.assertEqual(database.query_daily_rollups(group_by=('vendor',)), [
+            {'vendor': 'DMart', 'receipt_count': 3, 'amount_sum': 30.0},
+            {'vendor': 'Jio', 'receipt_count': 1, 'amount_sum': 20.0},
+        ])
+        rows = database.query_daily_rollups(group_by=('day',), start='2025-01-03', end='2025-01-31',
+                                            search_feature='vendor', search_values=['Jio', 'DMart'])
+        self.assertEqual(rows, [{'day': '2025-01-03', 'receipt_count': 1, 'amount_sum': 20.0}])
+        with self.assertRaises(ValueError):
+            database.query_daily_rollups(group_by=('amount',))
+
+    def test_follows_updates_and_deletes_and_rebuilds(self):
+        with database.get_pool().write() as conn:
+            conn.execute("UPDATE receipts SET amount = 50, category = 'Telecom' WHERE vendor = 'Jio'")
+            conn.execute("DELETE FROM receipts WHERE currency = 'USD'")
+        expected = [
+            {'day': '2025-01-02', 'vendor': 'DMart', 'category': 'Groceries', 'currency': 'INR',
+             'receipt_count': 2, 'amount_sum': 25.0},
+            {'day': '2025-01-03', 'vendor': 'Jio', 'category': 'Telecom', 'currency': 'INR',
+             'receipt_count': 1, 'amount_sum': 50.0},
+        ]
+        self.assertEqual(self.rollups(), expected)
+        self.assertEqual(database.rebuild_daily_rollups(), 2)
+        self.assertEqual(self.rollups(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
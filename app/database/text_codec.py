@@ -0,0 +1,45 @@
+"""
+Compression of receipt raw text for the receipt_texts side table.
+
+zstd is used when the optional `zstandard` package is installed, zlib
+otherwise. Every stored value records its codec, so a database written with
+one codec stays readable after switching (zstd rows do need the package).
+"""
+
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Configuration - can be overridden by environment variables
+# 'zstd', 'zlib' or unset for zstd when available
+TEXT_CODEC = os.getenv('RAW_TEXT_CODEC') or ('zstd' if zstandard is not None else 'zlib')
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+def compress_text(text: str, codec: str = None) -> tuple[str, bytes]:
+    """Returns (codec, compressed UTF-8 bytes) for text."""
+    codec = codec or TEXT_CODEC
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("RAW_TEXT_CODEC is 'zstd' but the zstandard package is not installed")
+        return codec, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == 'zlib':
+        return codec, zlib.compress(data, ZLIB_LEVEL)
+    raise ValueError(f"Unknown raw text codec '{codec}'")
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    """Inverse of compress_text()."""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Raw text is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    raise ValueError(f"Unknown raw text codec '{codec}'")
@@ -19,8 +19,13 @@ class ReceiptData(BaseModel):
     amount: float = Field(gt=0, description="Total value of the transaction")
     category: Optional[str] = Field(None, description="Optional categories")
     raw_text: str = Field(..., description="Raw Extracted text")
-    raw_data: bytes = Field(..., description="Raw Data of uploaded file")
+    raw_data: bytes = Field(
+        default=b"", description="Raw Data of uploaded file (empty if already stored, see blob_hash)"
+    )
     raw_data_extension: str = Field(..., description="Extension of the file uploaded")
+    blob_hash: Optional[str] = Field(
+        None, description="SHA-256 of the uploaded file in the blob store"
+    )
     upload_timestamp: datetime = Field(
         default_factory=datetime.now,
         description="Timestamp when the receipt was updated",
@@ -43,6 +48,16 @@ class ReceiptData(BaseModel):
 
         return v
 
+    @field_validator("blob_hash")
+    @classmethod
+    def blob_hash_must_be_sha256(cls, v: Optional[str]) -> Optional[str]:
+        """
+        Must be a lowercase hex SHA-256 digest
+        """
+        if v is not None and (len(v) != 64 or any(c not in "0123456789abcdef" for c in v)):
+            raise ValueError("blob_hash must be a lowercase hex SHA-256 digest")
+        return v
+
     @field_validator("vendor")
     @classmethod
     def vender_must_not_be_a_number(cls, v: str) -> str:
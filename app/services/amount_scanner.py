@@ -0,0 +1,174 @@
+"""
+Single-pass tokenizer behind find_currency_and_amount().
+
+find_currency_and_amount() used to run its regexes line by line, rescanning
+each line near an amount keyword or separator up to five times, and scored
+every amount keyword against each of the bottom lines with thefuzz. The
+scanner walks the text once with one precompiled pattern and emits typed
+tokens with their line index:
+
+    number     an amount, with the currency of an adjacent symbol if any
+    currency   the currency the line's symbols or codes stand for
+    separator  a line like '-----' or '====='
+    blank      an empty line
+    keyword    the best amount keyword match of one of the bottom lines
+
+Candidate scoring then only reads the token stream. Numbers are matched
+exactly as the old patterns matched them, and keyword scores are the same
+rounded partial_ratio, computed for all bottom lines in one rapidfuzz cdist
+call with a score cutoff so hopeless keywords stop early.
+"""
+
+import re
+from typing import NamedTuple
+
+import numpy as np
+from rapidfuzz import fuzz as rf_fuzz
+from rapidfuzz import process as rf_process
+
+AMOUNT_KEYWORDS = ("total", "grand total", "amount", "to pay", "amount to be paid", "balance",
+                   "net amount", "final amount", "payable", "due", "subtotal", "bill amount",
+                   "invoice amount", "payment due", "amount due", "total due", "total payable",
+                   "total amount", "sum total", "net total", "gross amount", "charge", "fee",
+                   "price", "cost", "payment", "outstanding", "balance due", "to be paid")
+
+# Bonus added to a keyword's match score (higher = more specific/important)
+KEYWORD_PRIORITIES = {
+    "amount to be paid": 100,
+    "total amount": 95,
+    "grand total": 95,
+    "total": 90,
+    "amount due": 85,
+    "total due": 85,
+    "net amount": 80,
+    "balance": 75,
+    "due": 70,
+    "amount": 65,
+    "payable": 60,
+    "payment": 55,
+    "cost": 50,
+    "price": 50,
+    "fee": 45,
+    "charge": 45
+}
+DEFAULT_KEYWORD_PRIORITY = 50
+_PRIORITY_BONUS = np.array([KEYWORD_PRIORITIES.get(k, DEFAULT_KEYWORD_PRIORITY) for k in AMOUNT_KEYWORDS],
+                           dtype=np.float64)
+
+# A keyword counts from a (thefuzz, i.e. rounded) score of 80; round(79.5) == 80
+KEYWORD_MIN_SCORE = 80
+_KEYWORD_CUTOFF = 79.5
+
+# Only this many lines from the bottom are scored for keywords
+KEYWORD_WINDOW = 25
+
+CURRENCY_SYMBOLS = {'₹': 'INR', '¥': 'INR', '$': 'USD', '€': 'EUR', '£': 'GBP'}
+
+_NUMBER = r'\d+(?:,\d{3})*(?:\.\d{2})?'
+_TOKEN_RE = re.compile(rf"""
+    (?P<newline>\n)
+  | (?:(?P<symbol>[₹¥$€£])[^\S\n]*)?(?P<number>{_NUMBER})
+  | (?P<code>[₹¥$€£]|[rR][sS]|[iI][nN][rR])
+""", re.VERBOSE)
+_SYMBOL_AMOUNT_RE = re.compile(rf'([₹¥$€£])[^\S\n]*({_NUMBER})')
+_SEPARATOR_RE = re.compile(r'[-=_*.]{3,}')
+
+
+class AmountToken(NamedTuple):
+    kind: str
+    line: int
+    value: float | None = None  # The amount of a number, the score of a keyword
+    currency: str | None = None
+    keyword: str | None = None
+
+
+def line_currency(codes: set[str]) -> str:
+    """
+    Currency of a line from the symbols and codes on it: any of ₹, ¥, rs or
+    inr means INR; otherwise $, € and £, in that order; INR when there are none.
+    """
+    if codes & {'₹', '¥', 'rs', 'inr'}:
+        return 'INR'
+    for symbol in ('$', '€', '£'):
+        if symbol in codes:
+            return CURRENCY_SYMBOLS[symbol]
+    return 'INR'
+
+
+def best_keywords(lines_lower: list[str]) -> list[tuple[int, str]]:
+    """
+    (score + priority bonus, keyword) of the best amount keyword for each
+    line, (0, '') where none scores 80. Ties go to the earlier keyword.
+    """
+    if not lines_lower:
+        return []
+    # One call scores every keyword against every line (keywords x lines)
+    scores = rf_process.cdist(AMOUNT_KEYWORDS, lines_lower, scorer=rf_fuzz.partial_ratio,
+                              score_cutoff=_KEYWORD_CUTOFF, dtype=np.float64)
+    adjusted = np.where(scores > 0, np.round(scores) + _PRIORITY_BONUS[:, None], 0)
+    best = adjusted.argmax(axis=0)
+    return [(int(adjusted[k, i]), AMOUNT_KEYWORDS[k] if adjusted[k, i] else "") for i, k in enumerate(best)]
+
+
+def tokenize_amounts(text: str, keyword_window: int = KEYWORD_WINDOW) -> list[AmountToken]:
+    """
+    Tokens of text in line order.
+
+    find_currency_and_amount() only looks closely at the bottom of a bill: the
+    last keyword_window - 1 lines (never the first line), the two lines above
+    them, and the last 10 lines. Those are tokenized fully; from the lines
+    above, only numbers with a currency symbol next to them are emitted.
+    Keyword tokens are only produced for the bottom lines.
+    """
+    tokens = []
+    line_count = text.count('\n') + 1
+    detail_from = max(0, line_count - keyword_window - 1)
+    detail_start = 0
+    if detail_from:
+        detail_start = len(text)
+        for _ in range(line_count - detail_from):
+            detail_start = text.rfind('\n', 0, detail_start)
+        detail_start += 1
+
+    line, counted_to = 0, 0
+    for match in _SYMBOL_AMOUNT_RE.finditer(text, 0, detail_start):
+        line += text.count('\n', counted_to, match.start())
+        counted_to = match.start()
+        symbol, number = match.groups()
+        tokens.append(AmountToken('number', line, float(number.replace(',', '')), CURRENCY_SYMBOLS[symbol]))
+
+    line, line_start = detail_from, detail_start
+    codes = set()
+    lines = {}
+
+    def end_line(end: int):
+        stripped = text[line_start:end].strip()
+        if not stripped:
+            tokens.append(AmountToken('blank', line))
+        elif _SEPARATOR_RE.fullmatch(stripped):
+            tokens.append(AmountToken('separator', line))
+        if codes:
+            tokens.append(AmountToken('currency', line, currency=line_currency(codes)))
+        lines[line] = stripped
+
+    for match in _TOKEN_RE.finditer(text, detail_start):
+        kind = match.lastgroup
+        if kind == 'newline':
+            end_line(match.start())
+            line, line_start = line + 1, match.end()
+            codes = set()
+        elif kind == 'number':
+            symbol = match.group('symbol')
+            if symbol:
+                codes.add(symbol)
+            tokens.append(AmountToken('number', line, float(match.group('number').replace(',', '')),
+                                      CURRENCY_SYMBOLS.get(symbol)))
+        else:
+            codes.add(match.group('code').lower())
+    end_line(len(text))
+
+    window = [i for i in range(max(1, line_count - keyword_window + 1), line_count) if lines[i]]
+    for i, (score, keyword) in zip(window, best_keywords([lines[i].lower() for i in window])):
+        if score >= KEYWORD_MIN_SCORE:
+            tokens.append(AmountToken('keyword', i, score, keyword=keyword))
+    return tokens
@@ -0,0 +1,134 @@
+"""
+Batch processing of many uploaded receipts (POST /process-receipts).
+
+Uploads are expanded (zip archives contribute every supported file inside
+them), identical files are detected by SHA-256 so each distinct file is
+parsed once, and the distinct files are fanned out over a thread pool.
+Results are yielded as each file finishes, not in upload order.
+"""
+
+import hashlib
+import io
+import os
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from parsers import parse_and_extract_data
+except ImportError:
+    from .parsers import parse_and_extract_data
+
+# Configuration - can be overridden by environment variables
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', '1000'))
+# Limit on the uncompressed size of everything in one batch (zip bomb guard)
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(512 * 1024 * 1024)))
+
+
+class BatchTooLargeError(ValueError):
+    """Raised when a batch exceeds BATCH_MAX_FILES or BATCH_MAX_BYTES."""
+
+
+def _extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def expand_uploads(uploads, allowed_extensions, max_files: int = BATCH_MAX_FILES,
+                   max_bytes: int = BATCH_MAX_BYTES) -> tuple[list[dict], list[dict]]:
+    """
+    Turns uploaded (filename, bytes) pairs into batch items.
+
+    Zip archives are replaced by the supported files they contain, named
+    'archive.zip/inner/path.pdf'.
+
+    Returns:
+        (items, skipped): items are {'name', 'extension', 'bytes', 'sha256'};
+        skipped are {'name', 'reason'} for unsupported or unreadable files.
+    """
+    items, skipped = [], []
+    total_bytes = 0
+
+    def add(name: str, data: bytes):
+        nonlocal total_bytes
+        if len(items) >= max_files:
+            raise BatchTooLargeError(f"Batch has more than {max_files} files")
+        total_bytes += len(data)
+        if total_bytes > max_bytes:
+            raise BatchTooLargeError(f"Batch is larger than {max_bytes} bytes")
+        items.append({
+            "name": name,
+            "extension": _extension(name),
+            "bytes": data,
+            "sha256": hashlib.sha256(data).hexdigest(),
+        })
+
+    for filename, data in uploads:
+        extension = _extension(filename)
+        if extension == 'zip':
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile:
+                skipped.append({"name": filename, "reason": "Not a valid zip archive"})
+                continue
+            with archive:
+                for info in archive.infolist():
+                    inner_name = f"{filename}/{info.filename}"
+                    if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                        continue
+                    if _extension(info.filename) not in allowed_extensions:
+                        skipped.append({"name": inner_name, "reason": "Unsupported file type"})
+                        continue
+                    # Check the declared size before inflating anything
+                    if total_bytes + info.file_size > max_bytes:
+                        raise BatchTooLargeError(f"Batch is larger than {max_bytes} bytes")
+                    try:
+                        data = archive.read(info)
+                    except (zipfile.BadZipFile, RuntimeError, NotImplementedError, EOFError, zlib.error) as e:
+                        # Corrupt (bad CRC, truncated), encrypted or unsupported compression
+                        skipped.append({"name": inner_name, "reason": f"Unreadable zip member: {e}"})
+                        continue
+                    add(inner_name, data)
+        elif extension in allowed_extensions:
+            add(filename, data)
+        else:
+            skipped.append({"name": filename, "reason": "Unsupported file type"})
+    return items, skipped
+
+
+def _parse(item: dict, use_ai: bool) -> dict:
+    return parse_and_extract_data(item["bytes"], item["extension"], use_ai=use_ai)
+
+
+def process_batch(items: list[dict], use_ai: bool = False, workers: int = BATCH_WORKERS):
+    """
+    Parses items in a thread pool, parsing each distinct file only once.
+
+    Yields:
+        (item, result, duplicate_of) as files finish; duplicate_of is the
+        name of the first item with the same content, or None. result is
+        the parse_and_extract_data() dict, or {'error': ...} if it raised.
+    """
+    first_by_hash = {}
+    duplicates = {}
+    for item in items:
+        original = first_by_hash.setdefault(item["sha256"], item)
+        if original is not item:
+            duplicates.setdefault(item["sha256"], []).append(item)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch")
+    try:
+        futures = {pool.submit(_parse, item, use_ai): item for item in first_by_hash.values()}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Batch parse of {item['name']} failed: {e}")
+                result = {"error": str(e)}
+            yield item, result, None
+            for duplicate in duplicates.get(item["sha256"], []):
+                yield duplicate, result, item["name"]
+    finally:
+        # Stops queued files if the client went away mid-stream
+        pool.shutdown(wait=False, cancel_futures=True)
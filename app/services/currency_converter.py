@@ -1,48 +1,351 @@
 # In services/currency_converter.py
+import json
+import os
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
 import requests
-from datetime import date
 
-# A simple cache to store fetched exchange rates for the session
+from database.database import (get_exchange_rates, get_receipts_missing_amount_in_base,
+                               save_amounts_in_base, save_exchange_rates)
+
+# Configuration - can be overridden by environment variables
+EXCHANGE_RATES_URL = os.getenv('EXCHANGE_RATES_URL', 'https://api.frankfurter.app')
+EXCHANGE_RATES_TIMEOUT = float(os.getenv('EXCHANGE_RATES_TIMEOUT', '10'))
+# In offline mode rates come from EXCHANGE_RATES_FILE and the network is never used
+EXCHANGE_RATES_OFFLINE = os.getenv('EXCHANGE_RATES_OFFLINE', '').lower() in ('1', 'true', 'yes')
+EXCHANGE_RATES_FILE = os.getenv('EXCHANGE_RATES_FILE', 'exchange_rates.json')
+# Base currencies whose converted amounts are stored per receipt (receipt_amounts),
+# so insights in them are aggregated in SQL instead of converted per request
+MATERIALIZED_BASE_CURRENCIES = tuple(
+    c.strip().upper() for c in os.getenv('MATERIALIZED_BASE_CURRENCIES', 'INR,USD,EUR').split(',') if c.strip()
+)
+
+# Rates are only published on working days; a weekend or holiday uses the
+# last rate published before it, so range requests start this much earlier.
+RATE_LOOKBACK_DAYS = 7
+
+# Process-local cache in front of the exchange_rates table
 RATES_CACHE = {}
 
-def convert_to_base_currency(records: list[dict], base_currency: str) -> list[dict]:
+_rates_file_cache = {}
+
+
+def _date_key(value) -> str | None:
+    """Normalizes a transaction date (date, datetime or ISO string) to YYYY-MM-DD."""
+    if not value:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    try:
+        return date.fromisoformat(str(value)[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def _load_rates_file(path: str) -> dict:
     """
-    Converts amounts in a list of records to a specified base currency.
+    Reads a local rates file, reloading it only when it changes on disk.
+
+    The file uses the provider's range response format, e.g. the output of
+    GET /2024-01-01..?from=EUR: {"base": "EUR", "rates": {"2024-01-02": {"USD": 1.09, ...}}}
     """
-    print(f"Converting {len(records)} records to base currency: {base_currency}")
-    
-    for record in records:
-        original_amount = record.get('amount')
-        # --- THIS IS THE CORRECTED LINE ---
-        # If a record has no currency, assume it's INR, not the base_currency.
-        original_currency = record.get('currency', 'INR')
-        transaction_date = record.get('transaction_date')
-
-        if not original_amount or not transaction_date:
-            record['amount_in_base'] = 0
+    mtime = os.path.getmtime(path)
+    cached = _rates_file_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    _rates_file_cache[path] = (mtime, data)
+    return data
+
+
+def _fetch_offline_rates(from_currency: str, to_currency: str, start: str, end: str) -> dict[str, float]:
+    """Cross rates for a pair from the local rates file, for every published date in range."""
+    try:
+        data = _load_rates_file(EXCHANGE_RATES_FILE)
+    except (OSError, ValueError) as e:
+        print(f"Could not read exchange rates file {EXCHANGE_RATES_FILE}: {e}")
+        return {}
+
+    base = data.get('base', 'EUR')
+    rates = {}
+    for rate_date, day_rates in data.get('rates', {}).items():
+        if not start <= rate_date <= end:
+            continue
+        day_rates = dict(day_rates, **{base: 1.0})
+        if from_currency in day_rates and to_currency in day_rates:
+            rates[rate_date] = day_rates[to_currency] / day_rates[from_currency]
+    return rates
+
+
+def _fetch_rate_range(from_currency: str, to_currency: str, start: str, end: str) -> dict[str, float]:
+    """Fetches {rate_date: rate} for every published date in range with a single request."""
+    if EXCHANGE_RATES_OFFLINE:
+        return _fetch_offline_rates(from_currency, to_currency, start, end)
+
+    response = requests.get(
+        f"{EXCHANGE_RATES_URL}/{start}..{end}",
+        params={"from": from_currency, "to": to_currency},
+        timeout=EXCHANGE_RATES_TIMEOUT,
+    )
+    response.raise_for_status()
+    return {
+        rate_date: day_rates[to_currency]
+        for rate_date, day_rates in response.json().get('rates', {}).items()
+        if to_currency in day_rates
+    }
+
+
+def _rates_in_effect(dates, published: dict[str, float]) -> dict[str, float]:
+    """Maps each date to the latest published rate on or before it."""
+    published_dates = sorted(published)
+    resolved = {}
+    for day in dates:
+        i = bisect_right(published_dates, day)
+        if i:
+            resolved[day] = published[published_dates[i - 1]]
+    return resolved
+
+
+def prefetch_rates(pairs: dict[tuple[str, str], set[str]]) -> None:
+    """
+    Makes sure RATES_CACHE holds a rate for every (date, from, to) needed.
+
+    pairs maps (from_currency, to_currency) to the set of YYYY-MM-DD dates
+    required. Dates missing from the process cache are read from the rate
+    table in one query per pair; whatever is still missing is fetched with one
+    range request per pair and written back to the table.
+    """
+    today = date.today().isoformat()
+    for (from_currency, to_currency), dates in pairs.items():
+        missing = {d for d in dates if (d, from_currency, to_currency) not in RATES_CACHE}
+        if not missing:
             continue
 
-        if original_currency == base_currency:
-            record['amount_in_base'] = original_amount
+        stored = get_exchange_rates(from_currency, to_currency, min(missing), max(missing))
+        for rate_date, rate in stored.items():
+            RATES_CACHE[(rate_date, from_currency, to_currency)] = rate
+        missing -= stored.keys()
+        if not missing:
             continue
 
+        start = (date.fromisoformat(min(missing)) - timedelta(days=RATE_LOOKBACK_DAYS)).isoformat()
+        end = max(missing)
         try:
-            cache_key = (transaction_date, original_currency, base_currency)
-            if cache_key in RATES_CACHE:
-                rate = RATES_CACHE[cache_key]
-            else:
-                response = requests.get(
-                    f"https://api.frankfurter.app/{transaction_date}",
-                    params={"from": original_currency, "to": base_currency}
-                )
-                response.raise_for_status()
-                rate = response.json()['rates'][base_currency]
-                RATES_CACHE[cache_key] = rate
-
-            converted_amount = original_amount * rate
-            record['amount_in_base'] = round(converted_amount, 2)
+            published = _fetch_rate_range(from_currency, to_currency, start, end)
         except Exception as e:
-            print(f"Could not get conversion rate for {original_currency} on {transaction_date}: {e}")
-            record['amount_in_base'] = original_amount
+            print(f"Could not get conversion rates for {from_currency} to {to_currency} "
+                  f"between {start} and {end}: {e}")
+            continue
+
+        resolved = _rates_in_effect(missing, published)
+        for rate_date, rate in resolved.items():
+            RATES_CACHE[(rate_date, from_currency, to_currency)] = rate
+        # Today's rate may not be published yet, so only past dates are persisted
+        save_exchange_rates(from_currency, to_currency,
+                            {d: rate for d, rate in resolved.items() if d < today})
+        print(f"Fetched {len(published)} rate(s) for {from_currency} to {to_currency}, "
+              f"resolved {len(resolved)} of {len(missing)} missing date(s)")
+
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    """
+    Rounds to 2 decimals exactly like the built-in round().
+
+    np.round scales by 100 first, which can land on the wrong side of a half
+    cent; the few values that close to a tie are re-rounded in Python.
+    """
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in near_tie:
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def convert_amounts(amounts, currencies, dates, base_currency: str) -> np.ndarray:
+    """
+    Vectorized conversion of parallel amount / currency / date columns.
+
+    Accepts lists, NumPy arrays or pandas Series. Currencies and dates are
+    factorized, so rates are resolved once per distinct (currency, date) into
+    a small rate matrix and every row is converted with a single indexed
+    lookup and multiply. Follows the rules of convert_to_base_currency: rows
+    without an amount or date convert to 0, rows already in the base currency
+    or whose rate is unavailable keep their amount.
+    """
+    return _convert_columns(amounts, currencies, dates, base_currency)[0]
+
+
+def _to_floats(values) -> np.ndarray:
+    """values as a float array, with anything that isn't a number as NaN."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+
+
+def _convert_columns(amounts, currencies, dates, base_currency: str) -> tuple[np.ndarray, np.ndarray]:
+    """convert_amounts(), plus a mask of the rows whose result is a real conversion."""
+    amount = _to_floats(amounts)
+    currency_codes, currency_values = pd.factorize(pd.Series(currencies, dtype=object))
+    date_codes, date_values = pd.factorize(pd.Series(dates, dtype=object))
+    # Plain lists, as indexing a pandas Index one element at a time is slow
+    currency_values, date_values = currency_values.tolist(), date_values.tolist()
+
+    # Per distinct date: whether it counts as present, and its YYYY-MM-DD key.
+    # The extra trailing slot is what missing values (code -1) index into.
+    date_keys = [_date_key(value) for value in date_values] + [None]
+    has_date = np.array([bool(value) for value in date_values] + [False])[date_codes]
+
+    base_codes = np.flatnonzero(np.asarray(currency_values, dtype=object) == base_currency)
+    same_currency = currency_codes == (base_codes[0] if len(base_codes) else -2)
+    has_amount = ~np.isnan(amount) & (amount != 0)
+    needs_rate = has_amount & has_date & ~same_currency
+
+    # Only the (currency, date) combinations that actually occur are looked up
+    width = len(date_keys)
+    combos = np.unique(currency_codes[needs_rate] * width + date_codes[needs_rate] % width)
+    pairs = {}
+    for combo in combos.tolist():
+        currency_code, date_code = divmod(combo, width)
+        if currency_code >= 0 and date_keys[date_code]:
+            pairs.setdefault((currency_values[currency_code], base_currency), set()).add(date_keys[date_code])
+    prefetch_rates(pairs)
+
+    rate_matrix = np.full((len(currency_values) + 1, width), np.nan)
+    for combo in combos.tolist():
+        currency_code, date_code = divmod(combo, width)
+        if currency_code >= 0 and date_keys[date_code]:
+            rate_matrix[currency_code, date_code] = RATES_CACHE.get(
+                (date_keys[date_code], currency_values[currency_code], base_currency), np.nan)
+    rate = rate_matrix[currency_codes, date_codes]
+
+    missing_rate = needs_rate & np.isnan(rate)
+    if missing_rate.any():
+        print(f"Could not get conversion rates for {int(missing_rate.sum())} record(s); keeping original amounts")
+
+    converted = amount.copy()
+    convertible = needs_rate & ~missing_rate
+    converted[convertible] = _round_cents(amount[convertible] * rate[convertible])
+    converted[~(has_amount & has_date)] = 0.0
+    return converted, (has_amount & has_date & same_currency) | convertible
+
+
+def convert_to_base_currency(records: list[dict], base_currency: str) -> list[dict]:
+    """
+    Converts amounts in a list of records to a specified base currency.
+
+    Thin wrapper around convert_amounts() that sets 'amount_in_base' on each
+    record. Pulling the columns out of the dicts and writing the results back
+    costs about as much as the conversion itself, so callers holding a
+    DataFrame or columns should call convert_amounts() on them instead.
+    """
+    print(f"Converting {len(records)} records to base currency: {base_currency}")
+    if not records:
+        return records
+
+    # If a record has no currency, assume it's INR, not the base_currency.
+    converted = convert_amounts(
+        [record.get('amount') for record in records],
+        [record.get('currency', 'INR') for record in records],
+        [record.get('transaction_date') for record in records],
+        base_currency,
+    )
+    for record, amount_in_base in zip(records, converted.tolist()):
+        record['amount_in_base'] = amount_in_base
+
+    return records
+
+
+def amounts_in_base_for_receipt(amount, currency: str, transaction_date,
+                                base_currencies=MATERIALIZED_BASE_CURRENCIES) -> dict[str, float]:
+    """
+    Converted amounts of one receipt for every materialized base currency,
+    ready for save_receipt(). Currencies whose rate is unavailable are left
+    out and picked up later by backfill_amounts_in_base().
+    """
+    amounts = {}
+    for base_currency in base_currencies:
+        converted, resolved = _convert_columns([amount], [currency], [transaction_date], base_currency)
+        if resolved[0]:
+            amounts[base_currency] = float(converted[0])
+    return amounts
+
+
+def amounts_in_base_for_receipts(amounts, currencies, transaction_dates,
+                                 base_currencies=MATERIALIZED_BASE_CURRENCIES) -> list[dict[str, float]]:
+    """Column-wise amounts_in_base_for_receipt(): one dict per receipt, for save_receipts()."""
+    result = [{} for _ in range(len(amounts))]
+    if not result:
+        return result
+    for base_currency in base_currencies:
+        converted, resolved = _convert_columns(amounts, currencies, transaction_dates, base_currency)
+        for index in np.flatnonzero(resolved):
+            result[index][base_currency] = float(converted[index])
+    return result
+
+
+def fill_amounts_in_base(records: list[dict], base_currency: str) -> list[dict]:
+    """
+    Completes records from query_amounts_in_base(): only those without a
+    stored 'amount_in_base' are converted, and the results that used a real
+    rate are stored so the next request finds them.
+    """
+    missing = [record for record in records if record.get('amount_in_base') is None]
+    if not missing:
+        return records
+
+    converted, resolved = _convert_columns(
+        [record.get('amount') for record in missing],
+        [record.get('currency', 'INR') for record in missing],
+        [record.get('transaction_date') for record in missing],
+        base_currency,
+    )
+    rows = []
+    for record, amount_in_base, ok in zip(missing, converted.tolist(), resolved.tolist()):
+        record['amount_in_base'] = amount_in_base
+        if ok and record.get('id') is not None:
+            rows.append((record['id'], base_currency, amount_in_base))
+    save_amounts_in_base(rows)
+    print(f"Converted {len(missing)} of {len(records)} records to {base_currency} "
+          f"without a stored amount, stored {len(rows)}")
+    return records
+
+
+def backfill_amounts_in_base(base_currencies=MATERIALIZED_BASE_CURRENCIES, batch_size: int = 5000) -> int:
+    """
+    Stores converted amounts for every receipt that doesn't have them yet.
+
+    Works through the receipts in id order, batch_size at a time, so rates
+    are fetched in bulk per batch. Receipts whose rate is unavailable are
+    skipped and retried on the next run. Returns the number of rows stored.
+    """
+    stored = 0
+    for base_currency in base_currencies:
+        after_id = 0
+        while True:
+            batch = get_receipts_missing_amount_in_base(base_currency, after_id, batch_size)
+            if not batch:
+                break
+            after_id = batch[-1]['id']
+            converted, resolved = _convert_columns(
+                [record['amount'] for record in batch],
+                [record['currency'] for record in batch],
+                [record['transaction_date'] for record in batch],
+                base_currency,
+            )
+            stored += save_amounts_in_base(
+                (record['id'], base_currency, amount_in_base)
+                for record, amount_in_base, ok in zip(batch, converted.tolist(), resolved.tolist()) if ok
+            )
+        print(f"Backfilled converted amounts in {base_currency}")
+    return stored
+
 
-    return records
\ No newline at end of file
+if __name__ == '__main__':
+    print("Backfilling converted amounts...")
+    print(f"Stored {backfill_amounts_in_base()} converted amount(s).")
@@ -0,0 +1,224 @@
+"""
+Date candidates and date parsing behind find_date().
+
+find_date() used to run up to five patterns over every 3-line window around
+a date keyword and over each of the top lines again, and parsed each match by
+trying eight strptime formats in turn. The engine finds every candidate of
+the top lines in one pass of a combined pattern with a named group per kind,
+and builds dates straight from the captured fields, with a bounded LRU of
+parsed candidates so the same string is never parsed twice.
+
+Candidates and dates are exactly those of the old patterns and formats: the
+field patterns are strptime's own, formats are tried in the same order, and
+a window only sees candidates that fit inside it, as when it was scanned on
+its own.
+"""
+
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, NamedTuple
+
+from rapidfuzz import fuzz as rf_fuzz
+
+# Configuration - can be overridden by environment variables
+DATE_CACHE_SIZE = int(os.getenv('DATE_CACHE_SIZE', '4096'))
+
+MONTH_NUMBERS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'june': 6, 'july': 7,
+    'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+}
+
+DATE_KEYWORDS = ('date:', 'date', 'dated', 'bill date', 'invoice date', 'order date', 'transaction date')
+# A keyword counts from a (thefuzz, i.e. rounded) score of 70; round(69.5) == 70
+_KEYWORD_CUTOFF = 69.5
+
+# Kinds of candidates, in the order find_date() tries them
+PATTERN_KINDS = ('ymd', 'dmy', 'dmy_short')  # YYYY-MM-DD, DD/MM/YYYY, DD/MM/YY
+KEYWORD_KINDS = PATTERN_KINDS + ('compact', 'named')  # + YYYYMMDD, DD Month YYYY
+SPACED_KIND = 'spaced'  # DD Month YYYY separated by whitespace only
+
+_MONTHS = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)'
+# At most one kind can match at a position, except that 'spaced' implies 'named';
+# lookaheads let candidates overlap like separate findall() calls did
+_CANDIDATE_RE = re.compile(rf"""
+    \b(?=\d)(?=
+        (?P<ymd>\d{{4}}[-/.]\d{{1,2}}[-/.]\d{{1,2}}\b)
+      | (?P<dmy>\d{{1,2}}[-/.]\d{{1,2}}[-/.]\d{{4}}\b)
+      | (?P<dmy_short>\d{{1,2}}[-/.]\d{{1,2}}[-/.]\d{{2}}\b)
+      | (?P<compact>\d{{8}}\b)
+      | (?:(?=(?P<spaced>\d{{1,2}}\s+{_MONTHS}\w*\s+\d{{2,4}}\b)))?
+        (?P<named>\d{{1,2}}[-/.\s]+{_MONTHS}\w*[-/.\s]+\d{{2,4}}\b)
+    )""", re.VERBOSE | re.IGNORECASE)
+
+# Field patterns of strptime's %d and %m
+_DAY = r'3[01]|[12]\d|0[1-9]|[1-9]'
+_MONTH = r'1[0-2]|0[1-9]|[1-9]'
+_DAY_RE = re.compile(_DAY)
+_MONTH_RE = re.compile(_MONTH)
+_MONTH_NAMES = '|'.join(sorted(MONTH_NUMBERS, key=len, reverse=True))
+
+_SEPARATORS = re.compile(r'[/.\s]+')
+_WHITESPACE = re.compile(r'\s')
+_COMPACT_RE = re.compile(rf'(?P<Y>\d{{4}})(?P<m>{_MONTH})(?P<d>{_DAY})')
+# One alternative per shape of a normalized date; shapes shared by two
+# formats (day or month first) are told apart from the captured fields
+_FORMAT_RE = re.compile(rf"""
+    (?P<Y>\d{{4}})-(?P<m>{_MONTH})-(?P<d>{_DAY})              # %Y-%m-%d
+  | (?P<a>\d{{1,2}})-(?P<b>\d{{1,2}})-(?P<aY>\d{{4}})         # %d-%m-%Y, %m-%d-%Y
+  | (?P<c>\d{{1,2}})-(?P<e>\d{{1,2}})-(?P<cy>\d{{2}})         # %d-%m-%y, %m-%d-%y
+  | (?P<nd>{_DAY})-(?P<nb>{_MONTHS})-(?P<nY>\d{{4}})          # %d-%b-%Y
+  | (?P<mb>{_MONTH_NAMES})-(?P<md>{_DAY})-(?P<mY>\d{{4}})     # %b-%d-%Y, %B-%d-%Y
+""", re.VERBOSE | re.IGNORECASE)
+
+
+class DateCandidate(NamedTuple):
+    kind: str
+    start: int
+    end: int
+    text: str
+
+
+def _build(year: int, month: int | None, day: int) -> datetime | None:
+    try:
+        return datetime(year, month, day) if month else None
+    except ValueError:
+        return None
+
+
+def _day_month_orders(first: str, second: str) -> list[tuple[int, int]]:
+    """(month, day) readings of two fields: day first, then month first."""
+    orders = []
+    if _DAY_RE.fullmatch(first) and _MONTH_RE.fullmatch(second):
+        orders.append((int(second), int(first)))
+    if _MONTH_RE.fullmatch(first) and _DAY_RE.fullmatch(second):
+        orders.append((int(first), int(second)))
+    return orders
+
+
+def _format_readings(match: re.Match) -> list[tuple[int, int | None, int]]:
+    """(year, month, day) readings of a _FORMAT_RE match, in format order."""
+    if match['Y']:
+        return [(int(match['Y']), int(match['m']), int(match['d']))]
+    if match['a']:
+        return [(int(match['aY']), month, day) for month, day in _day_month_orders(match['a'], match['b'])]
+    if match['c']:
+        year = int(match['cy'])
+        year += 2000 if year <= 68 else 1900  # strptime's %y
+        return [(year, month, day) for month, day in _day_month_orders(match['c'], match['e'])]
+    if match['nd']:
+        return [(int(match['nY']), MONTH_NUMBERS.get(match['nb'].lower()), int(match['nd']))]
+    return [(int(match['mY']), MONTH_NUMBERS.get(match['mb'].lower()), int(match['md']))]
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_normalized(date_str: str) -> datetime | None:
+    # Compact format first, on the string as is
+    compact = _COMPACT_RE.fullmatch(date_str) if len(date_str) == 8 else None
+    if compact:
+        parsed = _build(int(compact['Y']), int(compact['m']), int(compact['d']))
+        if parsed:
+            return parsed
+
+    match = _FORMAT_RE.fullmatch(_SEPARATORS.sub('-', date_str))
+    if match:
+        for year, month, day in _format_readings(match):
+            parsed = _build(year, month, day)
+            if parsed:
+                # Handle 2-digit years
+                return parsed.replace(year=parsed.year + 2000) if parsed.year < 1950 else parsed
+
+    # Formats like "15 Jan 2024" with a longer month name
+    parts = date_str.split()
+    if len(parts) == 3:
+        day, month, year = parts
+        month_num = MONTH_NUMBERS.get(month.lower()[:3])
+        if month_num:
+            try:
+                return datetime(int(year), month_num, int(day))
+            except ValueError:
+                pass
+    return None
+
+
+def parse_date(date_str: str) -> datetime | None:
+    """
+    Date of a candidate like '2024-01-15', '15/01/24', '20240115' or
+    '15 Jan 2024', or None. Candidates without whitespace are cached by their
+    normalized form, so '15/01/2024' and '15.01.2024' share an entry.
+    """
+    if not date_str:
+        return None
+    date_str = date_str.strip()
+    if not _WHITESPACE.search(date_str):
+        date_str = _SEPARATORS.sub('-', date_str)
+    return _parse_normalized(date_str)
+
+
+def parse_cache_info():
+    """Hits, misses and size of the parsed-candidate LRU."""
+    return _parse_normalized.cache_info()
+
+
+def date_keyword(line_lower: str) -> str | None:
+    """First date keyword with a partial_ratio of at least 70 in the line, or None."""
+    for keyword in DATE_KEYWORDS:
+        if rf_fuzz.partial_ratio(keyword, line_lower, score_cutoff=_KEYWORD_CUTOFF):
+            return keyword
+    return None
+
+
+def best_date(candidates: Iterable[str]) -> str | None:
+    """The most recent candidate date not in the future (or the earliest if all are), as YYYY-MM-DD."""
+    found_dates = [d for d in map(parse_date, candidates) if d]
+    if not found_dates:
+        return None
+    today = datetime.now()
+    valid_dates = [d for d in found_dates if d <= today]
+    if valid_dates:
+        return max(valid_dates).strftime('%Y-%m-%d')
+    return min(found_dates).strftime('%Y-%m-%d')
+
+
+class DateScan:
+    """
+    Date candidates of a block of lines, found in one pass over the lines
+    joined with spaces (the way find_date() joins a keyword window).
+    """
+
+    def __init__(self, lines: list[str]):
+        self.text = " ".join(lines)
+        self.spans = []
+        start = 0
+        for line in lines:
+            self.spans.append((start, start + len(line)))
+            start += len(line) + 1
+
+        self.candidates = []
+        for match in _CANDIDATE_RE.finditer(self.text):
+            start, kind = match.start(), match.lastgroup
+            if kind == 'named' and match[SPACED_KIND]:
+                self.candidates.append(DateCandidate(SPACED_KIND, start, match.end(SPACED_KIND), match[SPACED_KIND]))
+            self.candidates.append(DateCandidate(kind, start, match.end(kind), match[kind]))
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def candidates_in(self, first_line: int, last_line: int, kinds: Iterable[str] = KEYWORD_KINDS) -> list[str]:
+        """
+        Candidate strings of the given kinds within lines first_line to
+        last_line, as findall() of each kind's pattern on those lines would
+        return them (non-overlapping per kind), kind by kind.
+        """
+        start, end = self.spans[first_line][0], self.spans[last_line][1]
+        found = []
+        for kind in kinds:
+            kind_end = start
+            for candidate in self.candidates:
+                if candidate.kind == kind and candidate.start >= kind_end and candidate.end <= end:
+                    found.append(candidate.text)
+                    kind_end = candidate.end
+        return found
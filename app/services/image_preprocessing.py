@@ -0,0 +1,175 @@
+"""
+OpenCV preprocessing of receipt images before tesseract.
+
+Phone photos arrive as large RGB images (often 4000x3000) with uneven
+lighting and a slight tilt. Tesseract is slower on them and often less
+accurate than on a normalized image, so before OCR an image is converted to
+grayscale, scaled so its text is about OCR_TARGET_TEXT_HEIGHT pixels tall
+(or to OCR_TARGET_DPI when the text height cannot be measured and the file
+carries a resolution), straightened, and binarized with an adaptive
+threshold. The result is a NumPy array, which pytesseract takes as is.
+
+Text height and skew are measured on a small copy of the image, so their
+cost does not grow with the photo's resolution.
+"""
+
+import os
+
+import numpy as np
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+    print("OpenCV not available. Images are OCRed without preprocessing.")
+
+# Configuration - can be overridden by environment variables
+# Height of a line of text tesseract reads best at; 0 disables text height scaling
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv('OCR_TARGET_TEXT_HEIGHT', '30'))
+# Used for images whose text height cannot be measured, if they carry a DPI; 0 disables
+OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', '300'))
+# Longest side of the preprocessed image
+OCR_MAX_IMAGE_SIDE = int(os.getenv('OCR_MAX_IMAGE_SIDE', '3000'))
+# Neighbourhood (odd, in pixels) and offset of the adaptive threshold
+OCR_THRESHOLD_BLOCK_SIZE = int(os.getenv('OCR_THRESHOLD_BLOCK_SIZE', '31'))
+OCR_THRESHOLD_C = int(os.getenv('OCR_THRESHOLD_C', '10'))
+# Largest tilt corrected, in degrees; 0 disables deskewing
+OCR_MAX_SKEW_DEGREES = float(os.getenv('OCR_MAX_SKEW_DEGREES', '10'))
+
+# Longest side of the copy text height and skew are measured on
+_MEASURE_SIDE = 1000
+# Smallest scale change and tilt worth resampling the image for
+_MIN_RESCALE = 0.1
+_MIN_SKEW_DEGREES = 0.25
+_SKEW_STEP_DEGREES = 0.5
+# Upscaling past this only magnifies blur
+_MAX_UPSCALE = 4.0
+
+
+def _to_gray(image) -> np.ndarray:
+    """Grayscale uint8 array of a PIL image or an array in RGB(A) or L."""
+    if not isinstance(image, np.ndarray):
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            image = image.convert('RGB')
+        image = np.asarray(image)
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+
+def _measure_copy(gray: np.ndarray) -> tuple[np.ndarray, float]:
+    """Inverted (text white) Otsu binarization of a copy at most _MEASURE_SIDE long, and its scale."""
+    scale = min(1.0, _MEASURE_SIDE / max(gray.shape))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    _, binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return binary, scale
+
+
+def estimate_text_height(binary: np.ndarray) -> float | None:
+    """
+    Median height of the character-sized connected components of an
+    inverted binary image, or None if there are too few to tell.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # Characters: a few pixels up to a tenth of the image, not much wider than tall
+    max_height = binary.shape[0] / 10
+    chars = heights[(heights >= 3) & (heights <= max_height) & (widths <= 3 * heights)]
+    if len(chars) < 10:
+        return None
+    return float(np.median(chars))
+
+
+def estimate_skew(binary: np.ndarray, max_degrees: float = None) -> float:
+    """
+    Rotation in degrees (counter-clockwise positive) that levels the text
+    lines of an inverted binary image: the one within max_degrees whose row
+    sums vary most, i.e. where lines and the gaps between them are sharpest.
+    """
+    max_degrees = OCR_MAX_SKEW_DEGREES if max_degrees is None else max_degrees
+    if max_degrees <= 0 or not binary.any():
+        return 0.0
+    height, width = binary.shape
+    center = (width / 2, height / 2)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_degrees, max_degrees + _SKEW_STEP_DEGREES / 2, _SKEW_STEP_DEGREES):
+        matrix = cv2.getRotationMatrix2D(center, float(angle), 1.0)
+        rotated = cv2.warpAffine(binary, matrix, (width, height), flags=cv2.INTER_NEAREST)
+        score = float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def _rotate(gray: np.ndarray, angle: float) -> np.ndarray:
+    """
+    Rotates by angle degrees about the center, growing the canvas so no
+    corner is cut off; the new edges repeat the border so they threshold
+    like the paper around them.
+    """
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width, new_height = int(height * sin + width * cos), int(height * cos + width * sin)
+    matrix[0, 2] += new_width / 2 - width / 2
+    matrix[1, 2] += new_height / 2 - height / 2
+    return cv2.warpAffine(gray, matrix, (new_width, new_height), flags=cv2.INTER_CUBIC,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+def _scale_for(gray: np.ndarray, binary: np.ndarray, measure_scale: float, dpi: float | None,
+               target_text_height: int, target_dpi: int, max_side: int) -> float:
+    scale = 1.0
+    text_height = estimate_text_height(binary) if target_text_height > 0 else None
+    if text_height:
+        scale = target_text_height / (text_height / measure_scale)
+    elif dpi and target_dpi > 0:
+        scale = target_dpi / dpi
+    scale = min(scale, _MAX_UPSCALE)
+    if max_side > 0:
+        scale = min(scale, max_side / max(gray.shape))
+    return scale
+
+
+def preprocess_for_ocr(image, target_text_height: int = None, target_dpi: int = None,
+                       max_side: int = None, deskew: bool = True) -> np.ndarray:
+    """
+    Grayscale, rescaled, deskewed and binarized copy of an image, for tesseract.
+
+    Args:
+        image: PIL image (its 'dpi' info is used for OCR_TARGET_DPI) or NumPy array.
+        target_text_height: Pixel height to scale text lines to; 0 disables.
+        target_dpi: Resolution to scale to when the text height is unknown; 0 disables.
+        max_side: Longest side of the result; 0 for no limit.
+        deskew: Whether to straighten tilted text.
+
+    Returns:
+        uint8 array, black text on white.
+    """
+    target_text_height = OCR_TARGET_TEXT_HEIGHT if target_text_height is None else target_text_height
+    target_dpi = OCR_TARGET_DPI if target_dpi is None else target_dpi
+    max_side = OCR_MAX_IMAGE_SIDE if max_side is None else max_side
+    dpi = None
+    if not isinstance(image, np.ndarray) and image.info.get('dpi'):
+        dpi = float(image.info['dpi'][0]) or None
+
+    gray = _to_gray(image)
+    binary, measure_scale = _measure_copy(gray)
+
+    scale = _scale_for(gray, binary, measure_scale, dpi, target_text_height, target_dpi, max_side)
+    if abs(scale - 1) >= _MIN_RESCALE:
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+    if deskew:
+        angle = estimate_skew(binary)
+        if abs(angle) >= _MIN_SKEW_DEGREES:
+            gray = _rotate(gray, angle)
+
+    block_size = max(3, OCR_THRESHOLD_BLOCK_SIZE | 1)
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                 block_size, OCR_THRESHOLD_C)
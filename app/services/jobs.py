@@ -0,0 +1,161 @@
+"""
+In-process background job queue.
+
+Used by POST /process-receipt?async=true so OCR runs outside the Flask
+request thread. A bounded queue feeds a fixed set of worker threads (OCR
+itself runs in tesseract subprocesses and the page_ocr process pool, so the
+GIL is not the bottleneck); no external broker is needed. Jobs are kept in
+memory and forgotten JOB_RETENTION_SECONDS after they finish, so a restart
+loses queued and finished jobs.
+
+The job function is called as func(*args, timings=dict, **kwargs) and may
+record its per-stage durations (in seconds) in that dict.
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Configuration - can be overridden by environment variables
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_QUEUE_MAX = int(os.getenv('JOB_QUEUE_MAX', '100'))
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while JOB_QUEUE_MAX jobs are waiting."""
+
+
+class JobQueue:
+    """Bounded queue of jobs run by a fixed pool of daemon worker threads."""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX,
+                 retention_seconds: float = JOB_RETENTION_SECONDS):
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self._queue = queue.Queue(maxsize=max(1, max_queued))
+        self._jobs = OrderedDict()  # job id -> job dict, in submission order
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started_at = time.time()
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def _ensure_workers(self):
+        # Called with self._lock held; threads start on first submit
+        if not self._threads:
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs) -> str:
+        """Queues func(*args, **kwargs) and returns the job id."""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "timings": {},
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._prune()
+            self._ensure_workers()
+            try:
+                self._queue.put_nowait((job, func, args, kwargs))
+            except queue.Full:
+                self._stats["rejected"] += 1
+                raise QueueFullError(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+            self._jobs[job_id] = job
+            self._stats["submitted"] += 1
+        return job_id
+
+    def _work(self):
+        while True:
+            job, func, args, kwargs = self._queue.get()
+            started = time.time()
+            with self._lock:
+                job["status"] = "running"
+                job["started_at"] = started
+                job["timings"]["queued"] = round(started - job["submitted_at"], 6)
+                self._busy += 1
+            stage_timings = {}
+            try:
+                result, error = func(*args, timings=stage_timings, **kwargs), None
+            except Exception as e:
+                print(f"Job {job['id']} failed: {e}")
+                result, error = None, str(e)
+            finished = time.time()
+            with self._lock:
+                job["timings"].update({stage: round(seconds, 6) for stage, seconds in stage_timings.items()})
+                job["timings"]["run"] = round(finished - started, 6)
+                job["finished_at"] = finished
+                job["result"] = result
+                job["error"] = error
+                job["status"] = "failed" if error else "done"
+                self._stats["failed" if error else "completed"] += 1
+                self._busy -= 1
+                self._busy_seconds += finished - started
+            self._queue.task_done()
+
+    def _prune(self):
+        # Called with self._lock held: forget finished jobs past their retention
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> dict | None:
+        """Snapshot of a job, or None if it is unknown or was pruned."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job, timings=dict(job["timings"]))
+            if snapshot["status"] == "queued":
+                # Position among the jobs still waiting (0 = next to run)
+                snapshot["queue_position"] = sum(
+                    1 for other in self._jobs.values()
+                    if other["status"] == "queued" and other["submitted_at"] < job["submitted_at"]
+                )
+        return snapshot
+
+    def stats(self) -> dict:
+        """Queue depth, busy workers and utilization since the queue was created."""
+        with self._lock:
+            stats = dict(self._stats)
+            busy = self._busy
+            busy_seconds = self._busy_seconds
+            stats["tracked_jobs"] = len(self._jobs)
+        elapsed = max(time.time() - self._started_at, 1e-9)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_queued"] = self._queue.maxsize
+        stats["workers"] = self.workers
+        stats["busy_workers"] = busy
+        stats["utilization"] = round(min(busy_seconds / (elapsed * self.workers), 1.0), 4)
+        return stats
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide job queue, created on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
+
+
+def get_job_stats() -> dict:
+    return get_job_queue().stats()
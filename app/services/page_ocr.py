@@ -0,0 +1,168 @@
+"""
+Page-level OCR for multi-page PDFs.
+
+Pages with a text layer are read directly. Image-only pages are rasterized
+in the calling process and handed to a pool of worker processes as raw
+pixmap samples (no PNG encode/decode round trip), so rasterizing the next
+page overlaps with tesseract working on the previous ones. At most
+OCR_MAX_IN_FLIGHT_PAGES rasterized pages exist at any time, which bounds
+memory on long scans, and results are reassembled in page order.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+# Configuration - can be overridden by environment variables
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(min(4, os.cpu_count() or 1))))
+OCR_MAX_IN_FLIGHT_PAGES = int(os.getenv('OCR_MAX_IN_FLIGHT_PAGES', str(2 * OCR_WORKERS)))
+# Start method for the worker processes ('fork', 'spawn' or 'forkserver'). Forking a
+# process with running threads (Flask, the job queue) can deadlock the children.
+OCR_START_METHOD = os.getenv('OCR_START_METHOD') or 'spawn'
+
+PDF_RENDER_ZOOM = 2  # Higher resolution for OCR
+PDF_OCR_CONFIGS = ['--psm 6', '--psm 4', '--psm 3']
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Returns the shared OCR process pool, created on first use."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            context = multiprocessing.get_context(OCR_START_METHOD)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def rasterize_page(page, zoom: float = PDF_RENDER_ZOOM) -> tuple:
+    """Renders a page to a picklable (mode, size, samples) triple of raw pixels."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    mode = {1: 'L', 3: 'RGB', 4: 'RGBA'}[pix.n]
+    return mode, (pix.width, pix.height), pix.samples
+
+
+def ocr_page(raster: tuple, configs=PDF_OCR_CONFIGS) -> str:
+    """
+    OCRs one rasterized page with each config and keeps the longest text.
+
+    Runs in the worker processes, so it only takes picklable arguments.
+    """
+    mode, size, samples = raster
+    image = Image.frombuffer(mode, size, samples, 'raw', mode, 0, 1)
+    best_text = ""
+    for config in configs:
+        try:
+            text = pytesseract.image_to_string(image, config=config)
+            if len(text.strip()) > len(best_text.strip()):
+                best_text = text
+        except Exception:
+            continue
+    return best_text
+
+
+def extract_pdf_text(file_bytes: bytes, workers: int = None, max_in_flight: int = None) -> str:
+    """
+    Extracts the text of every page of a PDF, in page order.
+
+    Args:
+        file_bytes: The PDF file.
+        workers: OCR worker processes; 1 or less OCRs in this process.
+        max_in_flight: Most rasterized pages waiting for or being OCRed at once.
+    """
+    doc = fitz.open(stream=file_bytes, filetype="pdf")
+    try:
+        texts, ocr_pages = read_text_layer(doc)
+        ocr_pdf_pages(doc, ocr_pages, texts, workers, max_in_flight)
+    finally:
+        doc.close()
+    return join_pages(texts)
+
+
+def read_text_layer(doc) -> tuple[list[str], list[int]]:
+    """Text of each page of an open PDF from its text layer, and the numbers of the pages without one."""
+    page_count = len(doc)
+    print(f"PDF has {page_count} pages")
+    texts = [""] * page_count
+    ocr_pages = []
+    for page_num in range(page_count):
+        text = doc.load_page(page_num).get_text()
+        if text.strip():
+            print(f"Extracted {len(text)} chars directly from page {page_num + 1}")
+            texts[page_num] = text
+        else:
+            ocr_pages.append(page_num)
+    return texts, ocr_pages
+
+
+def ocr_pdf_pages(doc, page_nums: list[int], texts: list[str], workers: int = None, max_in_flight: int = None):
+    """OCRs the given pages of an open PDF, writing each result to texts[page_num]."""
+    if not page_nums:
+        return
+    workers = OCR_WORKERS if workers is None else workers
+    max_in_flight = max(1, OCR_MAX_IN_FLIGHT_PAGES if max_in_flight is None else max_in_flight)
+    print(f"No direct text on {len(page_nums)} page(s), using OCR with {max(workers, 1)} worker(s)...")
+    if workers > 1 and len(page_nums) > 1:
+        _ocr_pages_in_pool(doc, page_nums, texts, workers, max_in_flight)
+    else:
+        for page_num in page_nums:
+            texts[page_num] = ocr_page(rasterize_page(doc.load_page(page_num)))
+            print(f"OCR extracted {len(texts[page_num])} chars from page {page_num + 1}")
+
+
+def join_pages(texts: list[str]) -> str:
+    return "".join(text + "\n" for text in texts)
+
+
+def _ocr_pages_in_pool(doc, page_nums: list[int], texts: list[str], workers: int, max_in_flight: int):
+    """OCRs the given pages in the process pool, writing each result to texts[page_num]."""
+    pool = _get_pool(workers)
+    pending = {}
+    completed = set()
+    try:
+        for page_num in page_nums:
+            # Wait for a slot first, so rasterized pages never pile up in memory
+            while len(pending) >= max_in_flight:
+                _collect(wait(pending, return_when=FIRST_COMPLETED).done, pending, texts, completed)
+            future = pool.submit(ocr_page, rasterize_page(doc.load_page(page_num)))
+            pending[future] = page_num
+        while pending:
+            _collect(wait(pending, return_when=FIRST_COMPLETED).done, pending, texts, completed)
+    except BrokenProcessPool as e:
+        # A crashed worker takes the pool down; finish the rest in this process.
+        # Pages already OCRed are kept, even those that came back blank.
+        print(f"OCR worker pool failed ({e}), continuing without it")
+        _reset_pool()
+        for future in pending:
+            future.cancel()
+        for page_num in page_nums:
+            if page_num not in completed:
+                texts[page_num] = ocr_page(rasterize_page(doc.load_page(page_num)))
+
+
+def _collect(done, pending: dict, texts: list[str], completed: set):
+    for future in done:
+        page_num = pending.pop(future)
+        texts[page_num] = future.result()
+        completed.add(page_num)
+        print(f"OCR extracted {len(texts[page_num])} chars from page {page_num + 1}")
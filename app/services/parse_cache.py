@@ -0,0 +1,190 @@
+"""
+Content-addressed cache of parse_and_extract_data() results.
+
+Entries are keyed by the SHA-256 of the uploaded bytes, the file extension
+and the parser version, so re-uploading the same receipt (or pressing
+"Process File" again) returns the stored raw text and fields without running
+OCR. The cache lives in its own SQLite file, separate from the receipts
+database, and is bounded by PARSE_CACHE_MAX_BYTES: once over the limit the
+least recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Configuration - can be overridden by environment variables
+PARSE_CACHE_ENABLED = os.getenv('PARSE_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+# Made absolute at import, so the file doesn't follow whichever directory the process runs in
+PARSE_CACHE_PATH = os.path.abspath(os.getenv(
+    'PARSE_CACHE_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'parse_cache.db')
+))
+PARSE_CACHE_MAX_BYTES = int(os.getenv('PARSE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+def cache_key(file_bytes: bytes, file_extension: str, parser_version: str) -> str:
+    """Key of a parse result: content hash, normalized extension and parser version."""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    return f"{digest}:{file_extension.lower().strip()}:{parser_version}"
+
+
+class ParseCache:
+    """SQLite-backed LRU map from cache_key() to a parse result dict."""
+
+    def __init__(self, path: str = PARSE_CACHE_PATH, max_bytes: int = PARSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with self._lock held; the one connection is shared by all threads
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS parse_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_last_used ON parse_cache(last_used)")
+            # Running total of parse_cache.size, kept by put() and clear() in their transactions
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS parse_cache_meta (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total_bytes INTEGER NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO parse_cache_meta (id, total_bytes) "
+                "SELECT 1, COALESCE(SUM(size), 0) FROM parse_cache"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> dict | None:
+        """Returns the cached result for key and marks it as recently used, or None."""
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute("SELECT result FROM parse_cache WHERE cache_key = ?", (key,)).fetchone()
+                if row is None:
+                    self._stats["misses"] += 1
+                    return None
+                conn.execute("UPDATE parse_cache SET last_used = ? WHERE cache_key = ?", (time.time(), key))
+                self._stats["hits"] += 1
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                # A broken cache must never break parsing
+                print(f"Parse cache read failed: {e}")
+                self._stats["errors"] += 1
+                self._stats["misses"] += 1
+                return None
+
+    def put(self, key: str, result: dict):
+        """Stores result under key, then evicts least recently used entries over max_bytes."""
+        payload = json.dumps(result, default=str)
+        size = len(payload.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    replaced = conn.execute("SELECT size FROM parse_cache WHERE cache_key = ?", (key,)).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO parse_cache (cache_key, result, size, created_at, last_used) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, payload, size, now, now)
+                    )
+                    conn.execute(
+                        "UPDATE parse_cache_meta SET total_bytes = total_bytes + ?",
+                        (size - (replaced[0] if replaced else 0),)
+                    )
+                    total = conn.execute("SELECT total_bytes FROM parse_cache_meta").fetchone()[0]
+                    evicted = self._evict(conn, total)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                self._stats["stores"] += 1
+                self._stats["evictions"] += evicted
+            except sqlite3.Error as e:
+                print(f"Parse cache write failed: {e}")
+                self._stats["errors"] += 1
+
+    def _evict(self, conn: sqlite3.Connection, total: int) -> int:
+        # Only scans the entries once the running total is over the limit
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        for key, size in conn.execute("SELECT cache_key, size FROM parse_cache ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM parse_cache WHERE cache_key = ?", (key,))
+            total -= size
+            evicted += 1
+        conn.execute("UPDATE parse_cache_meta SET total_bytes = ?", (total,))
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM parse_cache")
+                conn.execute("UPDATE parse_cache_meta SET total_bytes = 0")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters plus the current entry count and size. With caching
+        disabled the file is never opened, so entries and size are 0.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            if not PARSE_CACHE_ENABLED:
+                entries, size = 0, 0
+            else:
+                try:
+                    entries, size = self._connection().execute(
+                        "SELECT (SELECT COUNT(*) FROM parse_cache), total_bytes FROM parse_cache_meta"
+                    ).fetchone()
+                except sqlite3.Error:
+                    entries, size = None, None
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["entries"] = entries
+        stats["size_bytes"] = size
+        stats["max_bytes"] = self.max_bytes
+        stats["enabled"] = PARSE_CACHE_ENABLED
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseCache:
+    """Returns the process-wide cache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ParseCache()
+        return _cache
+
+
+def get_parse_cache_stats() -> dict:
+    return get_parse_cache().stats()
@@ -1,10 +1,34 @@
 import pytesseract
 from PIL import Image
 import io
+import multiprocessing
+import os
 import re
-from datetime import datetime
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
 import fitz  # PyMuPDF
-from thefuzz import fuzz
+
+try:
+    from ocr_strategy import adaptive_ocr
+    from page_ocr import join_pages, ocr_pdf_pages, read_text_layer
+    from pipeline import Pipeline, PipelineAbort, Stage
+    from image_preprocessing import OPENCV_AVAILABLE, preprocess_for_ocr
+    from parse_cache import PARSE_CACHE_ENABLED, cache_key, get_parse_cache
+    from vendor_index import VendorIndex
+    from amount_scanner import KEYWORD_WINDOW, tokenize_amounts
+    from date_engine import PATTERN_KINDS, SPACED_KIND, DateScan, best_date, date_keyword, parse_date
+except ImportError:
+    from .ocr_strategy import adaptive_ocr
+    from .page_ocr import join_pages, ocr_pdf_pages, read_text_layer
+    from .pipeline import Pipeline, PipelineAbort, Stage
+    from .image_preprocessing import OPENCV_AVAILABLE, preprocess_for_ocr
+    from .parse_cache import PARSE_CACHE_ENABLED, cache_key, get_parse_cache
+    from .vendor_index import VendorIndex
+    from .amount_scanner import KEYWORD_WINDOW, tokenize_amounts
+    from .date_engine import PATTERN_KINDS, SPACED_KIND, DateScan, best_date, date_keyword, parse_date
 
 # Try to import AI parser, fallback gracefully if not available
 try:
@@ -277,6 +301,50 @@ KNOWN_VENDORS = {
         'bookstore': 'Book Store',
     }
 }
+# Keywords that identify the category of a document, checked in order
+CATEGORY_KEYWORDS = {
+    'Electricity': ['electricity', 'electric', 'power', 'energy', 'utility', 'bescom', 'tneb', 'msedcl'],
+    'Internet & Telecom': ['internet', 'broadband', 'telecom', 'mobile', 'phone', 'wifi', 'data'],
+    'Groceries': ['grocery', 'supermarket', 'fresh', 'mart', 'food'],
+    'Restaurant': ['restaurant', 'cafe', 'hotel', 'dining', 'food court'],
+    'Transportation': ['taxi', 'uber', 'ola', 'fuel', 'petrol', 'gas', 'transport'],
+    'Healthcare': ['hospital', 'clinic', 'medical', 'pharmacy', 'health'],
+    'Shopping': ['mall', 'shop', 'retail', 'store', 'fashion'],
+    'Banking': ['bank', 'atm', 'financial', 'credit', 'debit']
+}
+
+# Built once: Aho-Corasick automaton over all vendor and category keywords
+VENDOR_INDEX = VendorIndex(KNOWN_VENDORS, CATEGORY_KEYWORDS)
+
+BUSINESS_SUFFIXES = ('ltd', 'limited', 'pvt', 'private', 'corp', 'corporation',
+                     'inc', 'incorporated', 'llc', 'llp', 'co', 'company')
+# Word boundaries keep 'co' from matching inside other words
+_BUSINESS_SUFFIX_RE = re.compile(r'\b(?:' + '|'.join(BUSINESS_SUFFIXES) + r')\b')
+# Lines that carry amounts, dates or account details rather than a vendor name
+_NON_VENDOR_LINE_RE = re.compile(
+    r'^\d+$|total|amount|₹|\$|invoice|bill|date.*\d{4}|account|number|rr\s+number|tariff|reading', re.IGNORECASE)
+_SUFFIX_SPLIT_RES = {suffix: re.compile(suffix, re.IGNORECASE) for suffix in BUSINESS_SUFFIXES}
+
+# Part of the parse cache key: bump whenever OCR or extraction output changes,
+# so results cached by an older parser are not served
+PARSER_VERSION = "3"
+
+TEXT_EXTENSIONS = ('txt', 'text', 'log', 'csv', 'tsv', 'dat')
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'bmp', 'tiff')
+# Stages that turn the file into raw text (what _extract_text_with_ocr() runs)
+TEXT_STAGES = ('decode', 'preprocess', 'text', 'ocr')
+# Line breaks and page breaks (tesseract and PDFs end pages with a form feed)
+_LINE_BREAK_RE = re.compile(r'\r\n?|\x0c')
+
+# Configuration - can be overridden by environment variables
+# Processes ParserEngine.parse_many() fans out to; 0 parses in the calling process
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', '0'))
+# Documents sent to a worker process at a time
+PARSE_CHUNK_SIZE = int(os.getenv('PARSE_CHUNK_SIZE', '16'))
+# Fresh interpreters by default: a forked worker would share the parent's
+# parse cache connection and pools
+PARSE_START_METHOD = os.getenv('PARSE_START_METHOD') or 'spawn'
+
 # ==============================================================================
 # ENHANCED PARSING FUNCTIONS
 # ==============================================================================
@@ -291,74 +359,31 @@ def find_vendor(text: str) -> tuple[str | None, str | None]:
     """
     text_lower = text.lower()
     lines = text.split('\n')
+    # One pass over the text finds every keyword that occurs verbatim
+    found = VENDOR_INDEX.find(text_lower)
     
     # Step 1: Detect category from document content first
-    category_keywords = {
-        'Electricity': ['electricity', 'electric', 'power', 'energy', 'utility', 'bescom', 'tneb', 'msedcl'],
-        'Internet & Telecom': ['internet', 'broadband', 'telecom', 'mobile', 'phone', 'wifi', 'data'],
-        'Groceries': ['grocery', 'supermarket', 'fresh', 'mart', 'food'],
-        'Restaurant': ['restaurant', 'cafe', 'hotel', 'dining', 'food court'],
-        'Transportation': ['taxi', 'uber', 'ola', 'fuel', 'petrol', 'gas', 'transport'],
-        'Healthcare': ['hospital', 'clinic', 'medical', 'pharmacy', 'health'],
-        'Shopping': ['mall', 'shop', 'retail', 'store', 'fashion'],
-        'Banking': ['bank', 'atm', 'financial', 'credit', 'debit']
-    }
-    
-    detected_category = None
-    for category, keywords in category_keywords.items():
-        for keyword in keywords:
-            if fuzz.partial_ratio(keyword, text_lower) >= 85:
-                detected_category = category
-                print(f"Category detected: {category} (keyword: '{keyword}')")
-                break
-        if detected_category:
-            break
+    detected_category, category_keyword = VENDOR_INDEX.detect_category(text_lower, found)
+    if detected_category:
+        print(f"Category detected: {detected_category} (keyword: '{category_keyword}')")
     
     # Step 2: Search for vendors based on detected category
     if detected_category:
         # Only search within the detected category
-        vendors_to_search = {detected_category: KNOWN_VENDORS[detected_category]}
         print(f"Searching only in {detected_category} category")
     else:
         # Search all categories
-        vendors_to_search = KNOWN_VENDORS
         print("No specific category detected, searching all categories")
     
-    # Fuzzy search within the selected vendor categories
-    best_match_score = 0
-    best_vendor_name = None
-    best_vendor_category = None
-    
-    for category, vendors in vendors_to_search.items():
-        for keyword, name in vendors.items():
-            # Skip very short keywords to avoid false matches
-            if len(keyword) < 4:
-                continue
-                
-            # Use multiple fuzzy matching approaches
-            partial_score = fuzz.partial_ratio(keyword.lower(), text_lower)
-            token_score = fuzz.token_sort_ratio(keyword.lower(), text_lower)
-            ratio_score = fuzz.ratio(keyword.lower(), text_lower)
-            
-            # Take the best score but require higher threshold for short keywords
-            score = max(partial_score, token_score, ratio_score)
-            min_threshold = 90 if len(keyword) < 6 else 85
-            
-            if score > best_match_score and score >= min_threshold:
-                # Additional check: keyword should appear as a meaningful part
-                if keyword.lower() in text_lower or any(word in text_lower for word in keyword.lower().split()):
-                    best_match_score = score
-                    best_vendor_name = name
-                    best_vendor_category = category
+    # Fuzzy search, limited to vendors whose keyword (or a word of it) is in the text
+    best_vendor_name, best_vendor_category, best_match_score = VENDOR_INDEX.best_vendor(
+        text_lower, detected_category, found)
     
     if best_vendor_name:
         print(f"Vendor found by fuzzy search: {best_vendor_name} (Score: {best_match_score})")
         return best_vendor_name, best_vendor_category
 
     # Step 3: Fallback to business suffix heuristics
-    business_suffixes = ['ltd', 'limited', 'pvt', 'private', 'corp', 'corporation', 
-                        'inc', 'incorporated', 'llc', 'llp', 'co', 'company']
-    
     for i, line in enumerate(lines[:15]):  # Check top 15 lines
         line_clean = line.strip()
         line_lower = line_clean.lower()
@@ -366,21 +391,20 @@ def find_vendor(text: str) -> tuple[str | None, str | None]:
         # Skip lines that are too short or contain obvious non-vendor info
         if len(line_clean) < 5:
             continue
-        if re.search(r'^\d+$|total|amount|₹|\$|invoice|bill|date.*\d{4}|account|number|rr\s+number|tariff|reading', line_clean, re.IGNORECASE):
+        if _NON_VENDOR_LINE_RE.search(line_clean):
             continue
             
         # Check for business suffixes - require word boundaries for precision
-        suffix_pattern = r'\b(?:' + '|'.join(business_suffixes) + r')\b'
-        if re.search(suffix_pattern, line_lower):
+        if _BUSINESS_SUFFIX_RE.search(line_lower):
             print(f"Found business suffix in line: '{line_clean}'")
             
             # Extract vendor name - handle various formats
             cleaned_line = re.sub(r'[(),]', ' ', line_clean)  # Remove parentheses and commas
             
             # Split by suffix and take the first part
-            for suffix in business_suffixes:
+            for suffix in BUSINESS_SUFFIXES:
                 if suffix in line_lower:
-                    parts = re.split(suffix, cleaned_line, flags=re.IGNORECASE)
+                    parts = _SUFFIX_SPLIT_RES[suffix].split(cleaned_line)
                     if parts and len(parts[0].strip()) >= 3:
                         vendor_name = parts[0].strip()
                         vendor_name = re.sub(r'[^\w\s&-]', '', vendor_name).strip()
@@ -420,49 +444,36 @@ def find_date(text: str) -> str | None:
     1. Look for 'date:' labels with fuzzy search
     2. Look for YYYY-MM-DD or similar patterns with punctuation
     3. Apply fuzzy search for date-related keywords
+
+    Date candidates of the top lines are found in one pass (see date_engine.py).
     """
     lines = text.split('\n')
-    
+    scan = DateScan(lines[:20])
+
     # Step 1: Look for explicit date labels (start from top)
-    date_keywords = ['date:', 'date', 'dated', 'bill date', 'invoice date', 'order date', 'transaction date']
-    
     for i, line in enumerate(lines[:15]):  # Check top 15 lines
-        line_lower = line.lower().strip()
-        
         # Check for date keywords with fuzzy matching (lower threshold for OCR errors)
-        for keyword in date_keywords:
-            if fuzz.partial_ratio(keyword, line_lower) >= 70:  # Lower threshold for OCR errors
-                # Search this line and next 2 lines for date patterns
-                search_area = " ".join(lines[i:i+3])
-                date_found = _extract_date_from_text(search_area)
-                if date_found:
-                    print(f"Date found near keyword '{keyword}': {date_found}")
-                    return date_found
+        keyword = date_keyword(line.lower().strip())
+        if keyword:
+            # Search this line and next 2 lines for date patterns
+            date_found = best_date(scan.candidates_in(i, min(i + 2, len(scan) - 1)))
+            if date_found:
+                print(f"Date found near keyword '{keyword}': {date_found}")
+                return date_found
 
     # Step 2: Look for standard date patterns (YYYY-MM-DD, DD/MM/YYYY, etc.)
-    for line in lines[:20]:  # Check top 20 lines
-        # Look for structured date patterns
-        date_patterns = [
-            r'\b\d{4}[-/.]\d{1,2}[-/.]\d{1,2}\b',  # YYYY-MM-DD
-            r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{4}\b',  # DD/MM/YYYY or MM/DD/YYYY
-            r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2}\b',  # DD/MM/YY
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, line)
-            for match in matches:
-                parsed_date = _parse_date_string(match)
-                if parsed_date:
-                    formatted_date = parsed_date.strftime('%Y-%m-%d')
-                    print(f"Date found by pattern matching: {formatted_date}")
-                    return formatted_date
+    for i in range(len(scan)):  # Check top 20 lines
+        for candidate in scan.candidates_in(i, i, PATTERN_KINDS):
+            parsed_date = parse_date(candidate)
+            if parsed_date:
+                formatted_date = parsed_date.strftime('%Y-%m-%d')
+                print(f"Date found by pattern matching: {formatted_date}")
+                return formatted_date
 
     # Step 3: Fuzzy search for month names and dates
-    month_pattern = r'\b\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\s+\d{2,4}\b'
-    for line in lines[:20]:
-        matches = re.findall(month_pattern, line, re.IGNORECASE)
-        for match in matches:
-            parsed_date = _parse_date_string(match)
+    for i in range(len(scan)):
+        for candidate in scan.candidates_in(i, i, (SPACED_KIND,)):
+            parsed_date = parse_date(candidate)
             if parsed_date:
                 formatted_date = parsed_date.strftime('%Y-%m-%d')
                 print(f"Date found by month pattern: {formatted_date}")
@@ -478,227 +489,90 @@ def find_currency_and_amount(text: str) -> tuple[float | None, str | None]:
     2. When found, look at the number and check 2 lines up and around
     3. Look for separators (---, ===) and check amounts below them
     4. Return the most likely final amount
+
+    The text is tokenized once (see amount_scanner.py); every step below
+    reads the tokens of the lines it looks at.
     """
-    lines = text.split('\n')
-    amount_keywords = ["total", "grand total", "amount", "to pay", "amount to be paid", "balance", 
-                      "net amount", "final amount", "payable", "due", "subtotal", "bill amount",
-                      "invoice amount", "payment due", "amount due", "total due", "total payable",
-                      "total amount", "sum total", "net total", "gross amount", "charge", "fee",
-                      "price", "cost", "payment", "outstanding", "balance due", "to be paid"]
-    currency_map = {'₹': 'INR', '¥': 'INR', 'rs': 'INR', 'inr': 'INR', '$': 'USD', '€': 'EUR', '£': 'GBP'}
-    
-    # Improved amount pattern to catch various formats
-    amount_pattern = r'(?:rs\.?\s*|₹\s*|¥\s*|inr\s*|\$\s*|€\s*|£\s*)?(\d+(?:,\d{3})*(?:\.\d{2})?)'
+    tokens = tokenize_amounts(text)
+    numbers, currencies, keywords = {}, {}, {}
+    separators, blanks = set(), set()
+    for token in tokens:
+        if token.kind == 'number':
+            numbers.setdefault(token.line, []).append(token)
+        elif token.kind == 'currency':
+            currencies[token.line] = token.currency
+        elif token.kind == 'keyword':
+            keywords[token.line] = token
+        elif token.kind == 'separator':
+            separators.add(token.line)
+        else:
+            blanks.add(token.line)
+    line_count = text.count('\n') + 1
+
+    def line_amounts(i: int, minimum: float = 1, skip_years: bool = True) -> list[float]:
+        # Skip date-like numbers (years) unless asked not to
+        return [token.value for token in numbers.get(i, ())
+                if token.value >= minimum and not (skip_years and 1900 <= token.value <= 2100)]
+
+    def nearby_amounts(i: int, before: int, after: int, priority: int) -> list[tuple]:
+        found = []
+        for j in range(max(0, i - before), min(line_count, i + after + 1)):
+            if j == i or j in blanks:
+                continue
+            found.extend((amount, currencies.get(j, 'INR'), priority) for amount in line_amounts(j))
+        return found
+
     candidates = []
 
     # Step 0: High priority scan for currency symbols directly next to numbers
-    currency_adjacent_pattern = r'([₹¥$€£])\s*(\d+(?:,\d{3})*(?:\.\d{2})?)'
-    for line in lines:
-        matches = re.finditer(currency_adjacent_pattern, line, re.IGNORECASE)
-        for match in matches:
-            symbol, amount_str = match.groups()
-            try:
-                clean_amount = amount_str.replace(',', '')
-                amount_val = float(clean_amount)
-                
-                if amount_val < 1:
-                    continue
-                
-                # Skip date-like numbers (years)
-                if 1900 <= amount_val <= 2100:
-                    continue
-                
-                # Map currency symbol
-                currency_found = currency_map.get(symbol, 'INR')
-                
-                # VERY HIGH priority for currency symbols directly adjacent to numbers
-                priority = 500  # Highest priority
-                candidates.append((amount_val, currency_found, priority))
-                print(f"Found currency-adjacent amount: {symbol} {amount_val} (priority: {priority})")
-                
-            except ValueError:
-                continue
+    for token in tokens:
+        if token.kind != 'number' or token.currency is None or token.value < 1 or 1900 <= token.value <= 2100:
+            continue
+        # VERY HIGH priority for currency symbols directly adjacent to numbers
+        priority = 500  # Highest priority
+        candidates.append((token.value, token.currency, priority))
+        print(f"Found currency-adjacent amount: {token.value} {token.currency} (priority: {priority})")
 
     # Start from bottom - check last 25 lines
-    for i in range(len(lines) - 1, max(0, len(lines) - 25), -1):
-        line = lines[i].strip()
-        line_lower = line.lower()
-        
-        if not line:
+    for i in range(line_count - 1, max(0, line_count - KEYWORD_WINDOW), -1):
+        if i in blanks:
             continue
-            
-        # Step 1: Look for amount keywords with fuzzy search
-        best_keyword_score = 0
-        matched_keyword = ""
-        
-        # Define keyword priorities (higher = more specific/important)
-        keyword_priorities = {
-            "amount to be paid": 100,
-            "total amount": 95,
-            "grand total": 95,
-            "total": 90,
-            "amount due": 85,
-            "total due": 85,
-            "net amount": 80,
-            "balance": 75,
-            "due": 70,
-            "amount": 65,
-            "payable": 60,
-            "payment": 55,
-            "cost": 50,
-            "price": 50,
-            "fee": 45,
-            "charge": 45
-        }
-        
-        for keyword in amount_keywords:
-            score = fuzz.partial_ratio(keyword, line_lower)
-            if score >= 80:  # Only consider good matches
-                # Apply keyword priority bonus
-                priority_bonus = keyword_priorities.get(keyword, 50)
-                adjusted_score = score + priority_bonus
-                
-                if adjusted_score > best_keyword_score:
-                    best_keyword_score = adjusted_score
-                    matched_keyword = keyword
-                    
-        # Debug output
-        if best_keyword_score >= 80:
-            print(f"Found keyword '{matched_keyword}' in line: '{line}' (score: {best_keyword_score})")
-        
+
+        # Step 1: Amount keyword found by the tokenizer (score includes the keyword's priority)
+        keyword = keywords.get(i)
+        best_keyword_score = keyword.value if keyword else 0
+        if keyword:
+            print(f"Found keyword '{keyword.keyword}' in line {i} (score: {best_keyword_score})")
+
         # Step 2: Check if previous lines have separators
-        has_separator_above = False
-        if i > 0:
-            prev_line = lines[i-1].strip()
-            if re.match(r'^[-=_*\.]{3,}$', prev_line):
-                has_separator_above = True
-        
+        has_separator_above = i > 0 and (i - 1) in separators
+
         # Step 3: If we found keywords or separators, extract amounts
         if best_keyword_score >= 130 or has_separator_above:  # Higher threshold due to priority bonus
-            # For keyword matches, focus on the current line first
             if best_keyword_score >= 80:
-                # Find amounts on the same line as the keyword
-                amount_matches = re.findall(amount_pattern, line, re.IGNORECASE)
-                
-                same_line_amounts = []
-                for amount_str in amount_matches:
-                    try:
-                        clean_amount = amount_str.replace(',', '')
-                        amount_val = float(clean_amount)
-                        
-                        if amount_val < 1:
-                            continue
-                        
-                        # Skip date-like numbers (years)
-                        if 1900 <= amount_val <= 2100:
-                            continue
-                        
-                        # Detect currency
-                        currency_found = 'INR'
-                        for symbol, code in currency_map.items():
-                            if symbol in line.lower():
-                                currency_found = code
-                                break
-                        
-                        # Very high priority for amounts on same line as keywords
-                        priority = best_keyword_score + 200
-                        same_line_amounts.append((amount_val, currency_found, priority))
-                        print(f"Found amount {amount_val} on same line as '{matched_keyword}' (priority: {priority})")
-                        
-                    except ValueError:
-                        continue
-                
+                # Very high priority for amounts on same line as keywords
+                priority = best_keyword_score + 200
+                same_line_amounts = [(amount, currencies.get(i, 'INR'), priority) for amount in line_amounts(i)]
+                for amount, _, _ in same_line_amounts:
+                    print(f"Found amount {amount} on same line as '{keyword.keyword}' (priority: {priority})")
+
                 # If we found amounts on the same line as keywords, use them and skip nearby lines
                 if same_line_amounts:
                     candidates.extend(same_line_amounts)
                 else:
-                    # Only look at nearby lines if no amount found on keyword line
-                    search_start = max(0, i - 2)
-                    search_end = min(len(lines), i + 3)
-                    
-                    for j in range(search_start, search_end):
-                        if j == i or not lines[j].strip():
-                            continue
-                            
-                        amount_matches = re.findall(amount_pattern, lines[j], re.IGNORECASE)
-                        
-                        for amount_str in amount_matches:
-                            try:
-                                clean_amount = amount_str.replace(',', '')
-                                amount_val = float(clean_amount)
-                                
-                                if amount_val < 1:
-                                    continue
-                                
-                                # Skip date-like numbers (years)
-                                if 1900 <= amount_val <= 2100:
-                                    continue
-                                
-                                currency_found = 'INR'
-                                for symbol, code in currency_map.items():
-                                    if symbol in lines[j].lower():
-                                        currency_found = code
-                                        break
-                                
-                                # Lower priority for nearby lines
-                                priority = best_keyword_score + 50
-                                candidates.append((amount_val, currency_found, priority))
-                                
-                            except ValueError:
-                                continue
-            
+                    # Only look at nearby lines if no amount found on keyword line (lower priority)
+                    candidates.extend(nearby_amounts(i, 2, 2, best_keyword_score + 50))
+
             # For separator matches, look in nearby lines
             elif has_separator_above:
-                search_start = max(0, i - 1)
-                search_end = min(len(lines), i + 2)
-                
-                for j in range(search_start, search_end):
-                    if j == i or not lines[j].strip():
-                        continue
-                        
-                    amount_matches = re.findall(amount_pattern, lines[j], re.IGNORECASE)
-                    
-                    for amount_str in amount_matches:
-                        try:
-                            clean_amount = amount_str.replace(',', '')
-                            amount_val = float(clean_amount)
-                            
-                            if amount_val < 1:
-                                continue
-                            
-                            # Skip date-like numbers (years)
-                            if 1900 <= amount_val <= 2100:
-                                continue
-                            
-                            currency_found = 'INR'
-                            for symbol, code in currency_map.items():
-                                if symbol in lines[j].lower():
-                                    currency_found = code
-                                    break
-                            
-                            priority = 75  # Medium priority for separator context
-                            candidates.append((amount_val, currency_found, priority))
-                            
-                        except ValueError:
-                            continue
+                candidates.extend(nearby_amounts(i, 1, 1, 75))  # Medium priority for separator context
 
     if not candidates:
         # Fallback: look for any large amounts in bottom 10 lines
-        for line in lines[-10:]:
-            amounts = re.findall(amount_pattern, line, re.IGNORECASE)
-            for amount_str in amounts:
-                try:
-                    clean_amount = amount_str.replace(',', '')
-                    amount_val = float(clean_amount)
-                    if amount_val >= 10:  # Reasonable minimum for a receipt total
-                        currency_found = 'INR'
-                        for symbol, code in currency_map.items():
-                            if symbol in line.lower():
-                                currency_found = code
-                                break
-                        candidates.append((amount_val, currency_found, 10))  # Low priority
-                except ValueError:
-                    continue
+        for i in range(max(0, line_count - 10), line_count):
+            # Reasonable minimum for a receipt total; low priority
+            candidates.extend((amount, currencies.get(i, 'INR'), 10)
+                              for amount in line_amounts(i, minimum=10, skip_years=False))
 
     if candidates:
         # Sort by priority first, then by amount (largest)
@@ -710,106 +584,117 @@ def find_currency_and_amount(text: str) -> tuple[float | None, str | None]:
     return None, None
 
 
-# --- Helper functions for Date Parsing ---
-def _extract_date_from_text(text: str) -> str | None:
-    """Finds all possible dates in a block of text and returns the best one."""
-    date_patterns = [
-        r'\b\d{4}[-/.]\d{1,2}[-/.]\d{1,2}\b',  # YYYY-MM-DD
-        r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{4}\b',  # DD/MM/YYYY or MM/DD/YYYY
-        r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2}\b',  # DD/MM/YY
-        r'\b\d{8}\b',  # YYYYMMDD (compact format)
-        r'\b\d{1,2}[-/.\s]+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*[-/.\s]+\d{2,4}\b'  # DD Month YYYY with various separators
-    ]
-    
-    found_dates = []
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for date_str in matches:
-            parsed_date = _parse_date_string(date_str.strip())
-            if parsed_date:
-                found_dates.append(parsed_date)
+# ==============================================================================
+# MAIN CONTROLLER FUNCTION
+# ==============================================================================
+def parse_and_extract_data(file_bytes: bytes, file_extension: str, use_ai: bool = False,
+                           timings: dict | None = None, skip_stages: Iterable[str] = ()) -> dict:
+    """
+    Main function to orchestrate OCR and parsing with enhanced logic.
 
-    if not found_dates:
-        return None
+    The document goes through PIPELINE (decode, preprocess, text, ocr,
+    normalize, extract, validate); stages named in skip_stages or PIPELINE_SKIP_STAGES
+    are skipped. The result's 'metadata' holds each stage's outcome and
+    seconds, the seconds of each field extractor and any validation issues.
 
-    # Return the most recent valid date (not in future)
-    today = datetime.now()
-    valid_dates = [d for d in found_dates if d <= today]
-    
-    if valid_dates:
-        return max(valid_dates).strftime('%Y-%m-%d')
-    else:
-        # If all dates are in future, return the earliest one
-        return min(found_dates).strftime('%Y-%m-%d')
+    Successful results are cached by file content, extension, PARSER_VERSION
+    and skipped stages, so processing the same file again skips OCR. If a
+    timings dict is given, the seconds spent in 'cache_lookup' and in each
+    stage are recorded in it.
+    """
+    timings = {} if timings is None else timings
+    skip = PIPELINE.skip | frozenset(skip_stages)
+    if not PARSE_CACHE_ENABLED:
+        return _parse_and_extract_uncached(file_bytes, file_extension, use_ai, timings, skip)
 
-def _parse_date_string(date_str: str) -> datetime | None:
-    """Parse date string with multiple format attempts."""
-    if not date_str:
-        return None
-        
-    # Clean up the date string
-    date_str = date_str.strip()
-    
-    # Try compact format first with original string (no normalization)
-    if re.match(r'^\d{8}$', date_str):
-        try:
-            parsed = datetime.strptime(date_str, '%Y%m%d')
-            return parsed
-        except ValueError:
-            pass
-    
-    # Handle different separators for other formats
-    normalized_date = re.sub(r'[/.\s]+', '-', date_str)
-    
-    # Try different date formats with normalized string
-    formats_to_try = [
-        '%Y-%m-%d',     # 2024-01-15
-        '%d-%m-%Y',     # 15-01-2024
-        '%m-%d-%Y',     # 01-15-2024
-        '%d-%m-%y',     # 15-01-24
-        '%m-%d-%y',     # 01-15-24
-        '%d-%b-%Y',     # 15-Jan-2024
-        '%b-%d-%Y',     # Jan-15-2024
-        '%B-%d-%Y',     # January-15-2024
-    ]
-    
-    for fmt in formats_to_try:
-        try:
-            parsed = datetime.strptime(normalized_date, fmt)
-            # Handle 2-digit years
-            if parsed.year < 1950:
-                parsed = parsed.replace(year=parsed.year + 2000)
-            return parsed
-        except ValueError:
-            continue
-    
-    # Try original string for month names
-    try:
-        # Handle formats like "15 Jan 2024"
-        parts = date_str.split()
-        if len(parts) == 3:
-            day, month, year = parts
-            month_names = {
-                'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-                'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-            }
-            month_num = month_names.get(month.lower()[:3])
-            if month_num:
-                return datetime(int(year), month_num, int(day))
-    except (ValueError, IndexError):
-        pass
-    
-    return None
+    start = time.perf_counter()
+    cache = get_parse_cache()
+    version = PARSER_VERSION + (f"-skip:{','.join(sorted(skip))}" if skip else "")
+    key = cache_key(file_bytes, file_extension, version)
+    cached = cache.get(key)
+    timings['cache_lookup'] = time.perf_counter() - start
+    lookup = {"stage": "cache_lookup", "outcome": "hit" if cached is not None else "miss",
+              "seconds": round(timings['cache_lookup'], 6)}
+    if cached is not None:
+        print(f"Parse cache hit for {key[:12]}..., skipping OCR")
+        return dict(cached, metadata={"stages": [lookup], "parser_version": PARSER_VERSION})
 
+    result = _parse_and_extract_uncached(file_bytes, file_extension, use_ai, timings, skip)
+    result["metadata"]["stages"].insert(0, lookup)
+    # Failures may be transient (e.g. tesseract missing), so only successes are kept
+    if "error" not in result:
+        cache.put(key, {field: value for field, value in result.items() if field != "metadata"})
+    return result
 
-# ==============================================================================
-# MAIN CONTROLLER FUNCTION
-# ==============================================================================
-def parse_and_extract_data(file_bytes: bytes, file_extension: str, use_ai: bool = False) -> dict:
+
+class ParserEngine:
     """
-    Main function to orchestrate OCR and parsing with enhanced logic.
+    Parses many documents in a row, e.g. a nightly re-parse of the archive.
+
+    The vendor index, keyword tables and compiled patterns are built once,
+    when this module is imported, and the parse cache is opened once; the
+    engine reuses them for every document. With workers > 0, parse_many()
+    sends chunks of documents to a pool of worker processes, each of which
+    imports the parser once and then parses chunk after chunk.
     """
-    raw_text = ""
+
+    def __init__(self, use_ai: bool = False, workers: int = PARSE_WORKERS, chunk_size: int = PARSE_CHUNK_SIZE,
+                 skip_stages: Iterable[str] = ()):
+        self.use_ai = use_ai
+        self.skip_stages = tuple(skip_stages)
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+
+    def parse(self, file_bytes: bytes, file_extension: str, timings: dict | None = None) -> dict:
+        """parse_and_extract_data() for one document; exceptions become {'error': ...} results."""
+        try:
+            return parse_and_extract_data(file_bytes, file_extension, use_ai=self.use_ai, timings=timings,
+                                          skip_stages=self.skip_stages)
+        except Exception as e:
+            print(f"Parse failed: {e}")
+            return {"error": str(e)}
+
+    def parse_many(self, documents: Iterable[tuple[bytes, str]]) -> Iterator[dict]:
+        """
+        Yields the parse result of each (file_bytes, file_extension) pair, in
+        input order.
+
+        documents is read lazily, one chunk at a time; with worker processes
+        at most two chunks per worker are queued or being parsed at once, so
+        memory stays bounded however long the input is.
+        """
+        documents = iter(documents)
+        chunks = iter(lambda: list(islice(documents, self.chunk_size)), [])
+        if self.workers <= 0:
+            for chunk in chunks:
+                yield from _parse_chunk(chunk, self.use_ai, self.skip_stages)
+            return
+
+        context = multiprocessing.get_context(PARSE_START_METHOD)
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        try:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_parse_chunk, chunk, self.use_ai, self.skip_stages))
+                if len(pending) >= 2 * self.workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Stops queued chunks if the caller stops iterating early
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_chunk(documents: list[tuple[bytes, str]], use_ai: bool, skip_stages: tuple[str, ...] = ()) -> list[dict]:
+    """Parses a chunk of documents; runs in the worker processes, so it must stay picklable."""
+    engine = ParserEngine(use_ai=use_ai, workers=0, skip_stages=skip_stages)
+    return [engine.parse(file_bytes, file_extension) for file_bytes, file_extension in documents]
+
+
+def _parse_and_extract_uncached(file_bytes: bytes, file_extension: str, use_ai: bool = False,
+                                timings: dict | None = None, skip: Iterable[str] = ()) -> dict:
+    timings = {} if timings is None else timings
+    context = _new_context(file_bytes, file_extension)
 
     # Disabling AI
     
@@ -893,164 +778,263 @@ def parse_and_extract_data(file_bytes: bytes, file_extension: str, use_ai: bool
             print("Using Standard OCR...")
             raw_text = _extract_text_with_ocr(file_bytes, file_extension)"""
 
+
         # Disabling AI
+    print("Using Standard OCR (AI parser disabled)...")
     try:
-        print("Using Standard OCR (AI parser disabled)...")
-        raw_text = _extract_text_with_ocr(file_bytes, file_extension)
-        # Print raw text for debugging
-        print("=" * 50)
-        print("RAW TEXT EXTRACTED FROM OCR:")
-        print("=" * 50)
-        print(raw_text)
-        print("=" * 50)
-        print(f"Text length: {len(raw_text) if raw_text else 0} characters")
-        print("=" * 50)
-
-        if not raw_text or len(raw_text.strip()) < 10:
-            print("Warning: OCR extracted very little text")
-            return {
-                "vendor": None,
-                "transaction_date": None,
-                "amount": None,
-                "currency": "INR",
-                "raw_text": raw_text,
-                "category": None,
-                "error": "Insufficient text extracted from document"
-            }
-
-        # Apply enhanced parsing functions
-        vendor, category = find_vendor(raw_text)
-        transaction_date = find_date(raw_text)
-        amount, currency = find_currency_and_amount(raw_text)
-        
-        return {
-            "vendor": vendor,
-            "transaction_date": transaction_date,
-            "amount": amount,
-            "currency": currency or "INR",
-            "raw_text": raw_text,
-            "category": category
-        }
-        
-    except Exception as e:
-        print(f"Error in parse_and_extract_data: {str(e)}")
+        stages = PIPELINE.run(context, skip=skip, timings=timings)
+    finally:
+        _close_context(context)
+    metadata = dict(context["metadata"], stages=stages, parser_version=PARSER_VERSION)
+
+    if "error" in context:
         return {
             "vendor": None,
             "transaction_date": None,
             "amount": None,
             "currency": "INR",
-            "raw_text": raw_text,
+            "raw_text": context.get("raw_text", ""),
             "category": None,
-            "error": str(e)
+            "error": context["error"],
+            "metadata": metadata
         }
 
+    fields = context["fields"]
+    return {
+        "vendor": fields.get("vendor"),
+        "transaction_date": fields.get("transaction_date"),
+        "amount": fields.get("amount"),
+        "currency": fields.get("currency") or "INR",
+        "raw_text": context["raw_text"],
+        "category": fields.get("category"),
+        "metadata": metadata
+    }
+
+
+def _score_fields(fields: dict) -> int:
+    """Counts how many of amount, date and vendor were extracted."""
+    return sum(fields.get(field) is not None for field in ('amount', 'transaction_date', 'vendor'))
+
+
+def _score_ocr_text(text: str) -> int:
+    """Scores OCR output by how many of amount, date and vendor can be extracted from it."""
+    if not text.strip():
+        return 0
+    return _score_fields(_extract_fields(_normalize_text(text))[0])
+
 
 def _extract_text_with_ocr(file_bytes: bytes, file_extension: str) -> str:
-    """Extract text using standard OCR methods."""
+    """Extract text using standard OCR methods (the pipeline's TEXT_STAGES only)."""
+    context = _new_context(file_bytes, file_extension)
     try:
-        print(f"Starting text extraction for file type: {file_extension}")
-        print(f"File size: {len(file_bytes)} bytes")
-        
-        # Handle text files directly (no OCR needed)
-        file_ext_clean = file_extension.lower().strip()
-        print(f"Cleaned file extension: '{file_ext_clean}'")
-        
-        if file_ext_clean in ['txt', 'text', 'log', 'csv', 'tsv', 'dat']:
-            print(f"Processing text file directly (extension: {file_ext_clean})...")
+        PIPELINE.run(context, skip=[name for name in PIPELINE.names if name not in TEXT_STAGES])
+    finally:
+        _close_context(context)
+    return context.get("raw_text") or ""
+
+
+# ==============================================================================
+# PIPELINE STAGES
+# ==============================================================================
+# Each stage reads and fills in the document context: file_bytes and extension
+# to start with, then raw_text (plus image, pdf, page_texts and ocr_pages on
+# the way), the normalized text, the extracted fields and metadata.
+
+def _new_context(file_bytes: bytes, file_extension: str) -> dict:
+    return {
+        "file_bytes": file_bytes,
+        "extension": file_extension.lower().strip(),
+        "fields": {},
+        "metadata": {"extractors": {}, "issues": []},
+    }
+
+
+def _close_context(context: dict):
+    if context.get("pdf") is not None:
+        context["pdf"].close()
+
+
+def _decode_text(file_bytes: bytes) -> str:
+    try:
+        # Try UTF-8 first, then fallback to other encodings
+        text = file_bytes.decode('utf-8')
+        print(f"Successfully decoded text file: {len(text)} characters")
+        return text
+    except UnicodeDecodeError:
+        try:
+            text = file_bytes.decode('latin-1')
+            print(f"Successfully decoded text file with latin-1: {len(text)} characters")
+            return text
+        except UnicodeDecodeError:
             try:
-                # Try UTF-8 first, then fallback to other encodings
-                text = file_bytes.decode('utf-8')
-                print(f"Successfully decoded text file: {len(text)} characters")
+                text = file_bytes.decode('cp1252')
+                print(f"Successfully decoded text file with cp1252: {len(text)} characters")
                 return text
             except UnicodeDecodeError:
-                try:
-                    text = file_bytes.decode('latin-1')
-                    print(f"Successfully decoded text file with latin-1: {len(text)} characters")
-                    return text
-                except UnicodeDecodeError:
-                    try:
-                        text = file_bytes.decode('cp1252')
-                        print(f"Successfully decoded text file with cp1252: {len(text)} characters")
-                        return text
-                    except UnicodeDecodeError:
-                        print("Failed to decode text file with common encodings, treating as binary")
-                        return str(file_bytes)
-        
-        elif file_extension.lower() in ['jpg', 'jpeg', 'png', 'bmp', 'tiff']:
-            # Image OCR
-            print("Processing image file...")
-            image = Image.open(io.BytesIO(file_bytes))
-            print(f"Image size: {image.size}, Mode: {image.mode}")
-            
-            # Try multiple OCR configurations for better results
-            ocr_configs = [
-                '--psm 6',  # Uniform block of text
-                '--psm 4',  # Single column of text
-                '--psm 3',  # Fully automatic page segmentation
-                '--psm 1',  # Automatic page segmentation with OSD
-            ]
-            
-            best_text = ""
-            for config in ocr_configs:
-                try:
-                    print(f"Trying OCR with config: {config}")
-                    text = pytesseract.image_to_string(image, config=config)
-                    if len(text.strip()) > len(best_text.strip()):
-                        best_text = text
-                        print(f"Better result with {config}: {len(text)} chars")
-                except Exception as e:
-                    print(f"OCR config {config} failed: {e}")
-                    continue
-            
-            return best_text
-            
-        elif file_extension.lower() == 'pdf':
-            # PDF OCR
-            print("Processing PDF file...")
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            full_text = ""
-            
-            print(f"PDF has {len(doc)} pages")
-            
-            for page_num in range(len(doc)):
-                print(f"Processing page {page_num + 1}...")
-                page = doc.load_page(page_num)
-                
-                # Try to extract text directly first
-                text = page.get_text()
-                if text.strip():
-                    print(f"Extracted {len(text)} chars directly from page {page_num + 1}")
-                    full_text += text + "\n"
-                else:
-                    print(f"No direct text on page {page_num + 1}, using OCR...")
-                    # If no text, use OCR on page image
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # Higher resolution
-                    img_data = pix.tobytes("png")
-                    image = Image.open(io.BytesIO(img_data))
-                    
-                    # Try multiple OCR configs for PDF pages too
-                    ocr_configs = ['--psm 6', '--psm 4', '--psm 3']
-                    best_ocr_text = ""
-                    
-                    for config in ocr_configs:
-                        try:
-                            ocr_text = pytesseract.image_to_string(image, config=config)
-                            if len(ocr_text.strip()) > len(best_ocr_text.strip()):
-                                best_ocr_text = ocr_text
-                        except:
-                            continue
-                    
-                    full_text += best_ocr_text + "\n"
-                    print(f"OCR extracted {len(best_ocr_text)} chars from page {page_num + 1}")
-            
-            doc.close()
-            return full_text
-            
-        else:
-            raise ValueError(f"Unsupported file extension: {file_extension}")
-            
-    except Exception as e:
-        print(f"OCR extraction error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return ""
+                print("Failed to decode text file with common encodings, treating as binary")
+                return str(file_bytes)
+
+
+def _decode_stage(context: dict) -> str:
+    """Decodes text files and opens images and PDFs; the outcome is the kind of file."""
+    file_bytes, extension = context["file_bytes"], context["extension"]
+    print(f"Starting text extraction for file type: {extension}")
+    print(f"File size: {len(file_bytes)} bytes")
+
+    if extension in TEXT_EXTENSIONS:
+        # Handle text files directly (no OCR needed)
+        print(f"Processing text file directly (extension: {extension})...")
+        context["raw_text"] = _decode_text(file_bytes)
+        return "text"
+    if extension in IMAGE_EXTENSIONS:
+        print("Processing image file...")
+        context["image"] = Image.open(io.BytesIO(file_bytes))
+        print(f"Image size: {context['image'].size}, Mode: {context['image'].mode}")
+        return "image"
+    if extension == 'pdf':
+        print("Processing PDF file...")
+        context["pdf"] = fitz.open(stream=file_bytes, filetype="pdf")
+        return "pdf"
+    raise ValueError(f"Unsupported file extension: {extension}")
+
+
+def _preprocess_stage(context: dict) -> str:
+    """Grayscales, rescales, deskews and binarizes images; the ocr stage gets a NumPy array."""
+    if context.get("image") is None:
+        return "not_needed"
+    if not OPENCV_AVAILABLE:
+        return "unavailable"
+    context["image"] = preprocess_for_ocr(context["image"])
+    height, width = context["image"].shape
+    print(f"Preprocessed image size: ({width}, {height})")
+
+
+def _text_stage(context: dict) -> str:
+    """Reads the text layer of each PDF page; pages without one are left for the ocr stage."""
+    if context.get("pdf") is None:
+        return "not_needed"
+    context["page_texts"], context["ocr_pages"] = read_text_layer(context["pdf"])
+    context["raw_text"] = join_pages(context["page_texts"])
+    return "partial" if context["ocr_pages"] else "ok"
+
+
+def _ocr_stage(context: dict) -> str:
+    """OCRs images and the PDF pages without a text layer."""
+    if context.get("image") is not None:
+        # Try configs in order, stopping once the receipt fields can be found;
+        # the winner's fields are kept so the extract stage need not redo them
+        extracted = {}
+
+        def score(text: str) -> int:
+            if not text.strip():
+                return 0
+            normalized = _normalize_text(text)
+            extracted[text] = (normalized, *_extract_fields(normalized))
+            return _score_fields(extracted[text][1])
+
+        context["raw_text"] = adaptive_ocr(context["image"], score)
+        if context["raw_text"] in extracted:
+            context["extracted"] = extracted[context["raw_text"]]
+        return "ok"
+    if context.get("ocr_pages"):
+        # Image-only pages are OCRed in parallel by page_ocr
+        ocr_pdf_pages(context["pdf"], context["ocr_pages"], context["page_texts"])
+        context["raw_text"] = join_pages(context["page_texts"])
+        return "ok"
+    return "not_needed"
+
+
+def _normalize_stage(context: dict):
+    """Unifies line breaks and drops NUL bytes; ends the document if there is too little text."""
+    raw_text = context.get("raw_text") or ""
+    # Print raw text for debugging
+    print("=" * 50)
+    print("RAW TEXT EXTRACTED FROM OCR:")
+    print("=" * 50)
+    print(raw_text)
+    print("=" * 50)
+    print(f"Text length: {len(raw_text)} characters")
+    print("=" * 50)
+
+    if len(raw_text.strip()) < 10:
+        print("Warning: OCR extracted very little text")
+        raise PipelineAbort("Insufficient text extracted from document")
+    context["text"] = _normalize_text(raw_text)
+
+
+def _normalize_text(raw_text: str) -> str:
+    return _LINE_BREAK_RE.sub('\n', raw_text).replace('\x00', '')
+
+
+def _extract_vendor(text: str) -> dict:
+    vendor, category = find_vendor(text)
+    return {"vendor": vendor, "category": category}
+
+
+def _extract_date(text: str) -> dict:
+    return {"transaction_date": find_date(text)}
+
+
+def _extract_amount(text: str) -> dict:
+    amount, currency = find_currency_and_amount(text)
+    return {"amount": amount, "currency": currency}
+
+
+# Field extractors run by the extract stage, in order; each returns result fields
+FIELD_EXTRACTORS = {
+    'vendor': _extract_vendor,
+    'date': _extract_date,
+    'amount': _extract_amount,
+}
+
+
+def _extract_fields(text: str) -> tuple[dict, dict]:
+    """Runs FIELD_EXTRACTORS over text; returns the fields and each extractor's time in seconds."""
+    fields, timings = {}, {}
+    for name, extractor in FIELD_EXTRACTORS.items():
+        start = time.perf_counter()
+        fields.update(extractor(text))
+        timings[name] = round(time.perf_counter() - start, 6)
+    return fields, timings
+
+
+def _extract_stage(context: dict) -> str:
+    """Runs FIELD_EXTRACTORS over the normalized text, timing each one.
+
+    Reuses the fields the ocr stage extracted while scoring configs when they
+    came from this same text.
+    """
+    text, fields, timings = context.get("extracted") or (None, None, None)
+    outcome = "reused"
+    if text != context["text"]:
+        fields, timings = _extract_fields(context["text"])
+        outcome = "ok"
+    context["fields"].update(fields)
+    context["metadata"]["extractors"].update(timings)
+    return outcome
+
+
+def _validate_stage(context: dict) -> str:
+    """Records issues with the extracted fields in the metadata; the fields are kept as they are."""
+    fields, issues = context["fields"], context["metadata"]["issues"]
+    for field in ('vendor', 'transaction_date', 'amount'):
+        if fields.get(field) is None:
+            issues.append(f"missing {field}")
+    if fields.get("amount") is not None and fields["amount"] <= 0:
+        issues.append("amount is not positive")
+    if fields.get("transaction_date") and fields["transaction_date"] > time.strftime('%Y-%m-%d'):
+        issues.append("transaction_date is in the future")
+    return "issues" if issues else "ok"
+
+
+# Text extraction stages only log failures, so the document carries on with
+# whatever text there is; normalize decides whether that is enough
+PIPELINE = Pipeline([
+    Stage('decode', _decode_stage, fatal=False),
+    Stage('preprocess', _preprocess_stage, fatal=False),
+    Stage('text', _text_stage, fatal=False),
+    Stage('ocr', _ocr_stage, fatal=False),
+    Stage('normalize', _normalize_stage),
+    Stage('extract', _extract_stage),
+    Stage('validate', _validate_stage, fatal=False),
+])
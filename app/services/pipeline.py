@@ -0,0 +1,99 @@
+"""
+Staged pipeline behind parse_and_extract_data().
+
+A document goes through registered stages in order (decode, preprocess,
+text, ocr, normalize, extract, validate by default, see parsers.py). Each stage is a
+callable taking the document context dict, which it reads and fills in, and
+returning an outcome string (None means 'ok'). The pipeline records each
+stage's wall time and outcome, so a slow or failing stage shows up in the
+result's metadata and in job timings.
+
+Stages can be skipped by name, per call or for every document through
+PIPELINE_SKIP_STAGES (e.g. 'ocr' to only read text layers). A stage that
+raises either ends the document (fatal stages) or is recorded as an error
+and the next stage runs with what is there (non-fatal stages, e.g. OCR).
+"""
+
+import os
+import time
+from typing import Callable, Iterable, NamedTuple
+
+# Configuration - can be overridden by environment variables
+PIPELINE_SKIP_STAGES = frozenset(
+    s.strip() for s in os.getenv('PIPELINE_SKIP_STAGES', '').split(',') if s.strip()
+)
+
+
+class PipelineAbort(Exception):
+    """Raised by a stage to end the pipeline; the message becomes the result's error."""
+
+
+class Stage(NamedTuple):
+    name: str
+    func: Callable[[dict], str | None]
+    fatal: bool = True
+
+
+class Pipeline:
+    """Ordered, named stages run over a document context."""
+
+    def __init__(self, stages: Iterable[Stage] = (), skip: Iterable[str] = PIPELINE_SKIP_STAGES):
+        self.stages: list[Stage] = []
+        self.skip = frozenset(skip)
+        for stage in stages:
+            self.register(*stage)
+
+    @property
+    def names(self) -> list[str]:
+        return [stage.name for stage in self.stages]
+
+    def register(self, name: str, func: Callable[[dict], str | None], fatal: bool = True,
+                 before: str | None = None):
+        """
+        Adds a stage at the end, or before the named stage. Registering an
+        existing name replaces that stage in place.
+        """
+        stage = Stage(name, func, fatal)
+        names = self.names
+        if name in names:
+            self.stages[names.index(name)] = stage
+        elif before is not None:
+            if before not in names:
+                raise ValueError(f"Unknown stage: {before}")
+            self.stages.insert(names.index(before), stage)
+        else:
+            self.stages.append(stage)
+
+    def run(self, context: dict, skip: Iterable[str] = (), timings: dict | None = None) -> list[dict]:
+        """
+        Runs the stages over context.
+
+        Returns one {'stage', 'outcome', 'seconds'} record per stage, plus
+        'error' for stages that raised. If a fatal stage raises (or any stage
+        raises PipelineAbort), the remaining stages are not run and
+        context['error'] is set. Seconds per stage are also added to timings.
+        """
+        skip = self.skip | frozenset(skip)
+        records = []
+        for stage in self.stages:
+            if stage.name in skip:
+                records.append({"stage": stage.name, "outcome": "skipped", "seconds": 0.0})
+                continue
+            start = time.perf_counter()
+            record = {"stage": stage.name}
+            try:
+                record["outcome"] = stage.func(context) or "ok"
+            except Exception as e:
+                print(f"Pipeline stage '{stage.name}' failed: {e}")
+                record["outcome"] = "error"
+                record["error"] = str(e)
+                if stage.fatal or isinstance(e, PipelineAbort):
+                    context["error"] = str(e)
+            seconds = time.perf_counter() - start
+            record["seconds"] = round(seconds, 6)
+            records.append(record)
+            if timings is not None:
+                timings[stage.name] = seconds
+            if "error" in context:
+                break
+        return records
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import unittest
+
+from amount_scanner import best_keywords, tokenize_amounts
+from parsers import find_currency_and_amount
+
+
+def find_quietly(text):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return find_currency_and_amount(text)
+
+
+class TestTokenizeAmounts(unittest.TestCase):
+
+    def test_token_kinds_and_lines(self):
+        tokens = tokenize_amounts("Coffee 120\n\n-----\nTotal Rs. 1,250.50\n$ 5")
+        self.assertIn(('number', 0, 120.0, None, None), tokens)
+        self.assertIn(('blank', 1, None, None, None), tokens)
+        self.assertIn(('separator', 2, None, None, None), tokens)
+        self.assertIn(('number', 3, 1250.5, None, None), tokens)
+        self.assertIn(('currency', 3, None, 'INR', None), tokens)
+        self.assertIn(('number', 4, 5.0, 'USD', None), tokens)
+        self.assertIn(('keyword', 3, 190, None, 'total'), tokens)
+
+    def test_line_currency_prefers_inr_codes(self):
+        tokens = tokenize_amounts("Price $10 inr 800")
+        self.assertIn(('currency', 0, None, 'INR', None), tokens)
+        # A symbol does not carry over to the next line
+        tokens = tokenize_amounts("€\n7")
+        self.assertIn(('number', 1, 7.0, None, None), tokens)
+
+    def test_only_symbol_amounts_above_the_bottom_window(self):
+        text = "\n".join(["Header $ 12 and 40"] + ["item"] * 40 + ["Total 99.00"])
+        numbers = [token for token in tokenize_amounts(text) if token.kind == 'number']
+        self.assertEqual(numbers, [('number', 0, 12.0, 'USD', None), ('number', 41, 99.0, None, None)])
+
+    def test_best_keywords(self):
+        self.assertEqual(best_keywords(["grand total", "thank you"]), [(195, 'grand total'), (0, '')])
+        self.assertEqual(best_keywords([]), [])
+
+
+class TestFindCurrencyAndAmount(unittest.TestCase):
+
+    def test_sample_bills(self):
+        self.assertEqual(find_quietly("DMART\nDate: 19/07/2025\n...\nGrand Total   Rs. 1,250.50\n"), (1250.5, 'INR'))
+        self.assertEqual(find_quietly("BESCOM\n...\nNet Amount Payable : ₹ 2345.00"), (2345.0, 'INR'))
+        self.assertEqual(find_quietly("Airtel\nInvoice Date : 01-07-2025\n...\nTotal Amount Due 999.00"),
+                         (999.0, 'INR'))
+        self.assertEqual(find_quietly("Cafe\nLatte $4.50\nTip 1.00\nTotal $5.50"), (5.5, 'USD'))
+
+    def test_amount_below_keyword_and_separator(self):
+        self.assertEqual(find_quietly("Shop\nAmount to be paid\n845.00\nThank you"), (845.0, 'INR'))
+        self.assertEqual(find_quietly("Shop\nItem 30.00\n=====\n480.00"), (480.0, 'INR'))
+
+    def test_no_amount(self):
+        self.assertEqual(find_quietly("Some text without a total."), (None, None))
+        self.assertEqual(find_quietly(""), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import unittest
+import zipfile
+from unittest.mock import patch
+
+import batch
+from batch import BatchTooLargeError, expand_uploads, process_batch
+
+ALLOWED = {'txt', 'pdf', 'png', 'jpg'}
+
+
+def make_zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+class TestExpandUploads(unittest.TestCase):
+
+    def test_zip_members_and_unsupported_files(self):
+        archive = make_zip({'bills/a.txt': b'a', 'bills/notes.doc': b'n', '__MACOSX/._a.txt': b'm'})
+        items, skipped = expand_uploads([('dump.zip', archive), ('b.PNG', b'b'), ('c.exe', b'c')], ALLOWED)
+        self.assertEqual([(i['name'], i['extension']) for i in items], [('dump.zip/bills/a.txt', 'txt'), ('b.PNG', 'png')])
+        self.assertEqual([s['name'] for s in skipped], ['dump.zip/bills/notes.doc', 'c.exe'])
+
+    def test_unreadable_zip_members_are_skipped(self):
+        archive = make_zip({'a.txt': b'hello receipt', 'b.txt': b'fine', 'c.txt': b'secret'})
+        archive = archive.replace(b'hello receipt', b'jello receipt')  # Bad CRC-32
+        # Set the encrypted flag of c.txt, the third central directory entry
+        entry = [i for i in range(len(archive)) if archive.startswith(b'PK\x01\x02', i)][2]
+        archive = archive[:entry + 8] + b'\x01' + archive[entry + 9:]
+        items, skipped = expand_uploads([('dump.zip', archive)], ALLOWED)
+        self.assertEqual([i['name'] for i in items], ['dump.zip/b.txt'])
+        self.assertEqual([s['name'] for s in skipped], ['dump.zip/a.txt', 'dump.zip/c.txt'])
+        self.assertIn('Bad CRC-32', skipped[0]['reason'])
+        self.assertIn('encrypted', skipped[1]['reason'])
+
+    def test_limits(self):
+        with self.assertRaises(BatchTooLargeError):
+            expand_uploads([('a.txt', b'a'), ('b.txt', b'b')], ALLOWED, max_files=1)
+        with self.assertRaises(BatchTooLargeError):
+            expand_uploads([('dump.zip', make_zip({'a.txt': b'x' * 1000}))], ALLOWED, max_bytes=100)
+
+
+class TestProcessBatch(unittest.TestCase):
+
+    def test_identical_files_are_parsed_once(self):
+        items, _ = expand_uploads([('a.txt', b'same'), ('b.txt', b'other'), ('c.txt', b'same')], ALLOWED)
+        with patch.object(batch, 'parse_and_extract_data',
+                          side_effect=lambda data, ext, use_ai: {"raw_text": data.decode()}) as parse:
+            results = {item['name']: (result, duplicate_of) for item, result, duplicate_of in process_batch(items)}
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual(results['c.txt'], ({"raw_text": "same"}, 'a.txt'))
+        self.assertEqual(results['b.txt'], ({"raw_text": "other"}, None))
+
+    def test_exceptions_become_error_results(self):
+        items, _ = expand_uploads([('a.txt', b'a')], ALLOWED)
+        with patch.object(batch, 'parse_and_extract_data', side_effect=RuntimeError("boom")):
+            (_, result, _), = list(process_batch(items))
+        self.assertEqual(result, {"error": "boom"})
+
+
+if __name__ == '__main__':
+    unittest.main()
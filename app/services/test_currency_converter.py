@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+# Point the database at a throwaway file before it initializes itself on import
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_PATH', os.path.join(_tmp_dir, 'test_receipts.db'))
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from database import database
+from models.receipt import ReceiptData
+from services import currency_converter
+
+# 2025-07-19 and 2025-07-20 are a weekend, so they use Friday's rate
+RATES_FILE = {
+    "base": "EUR",
+    "rates": {
+        "2025-07-17": {"USD": 1.10, "INR": 99.0},
+        "2025-07-18": {"USD": 1.20, "INR": 102.0},
+        "2025-07-21": {"USD": 1.25, "INR": 100.0},
+    },
+}
+
+
+class OfflineRatesTestCase(unittest.TestCase):
+    """Fresh database and rate cache per test, with rates read from RATES_FILE."""
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        currency_converter.RATES_CACHE.clear()
+
+        rates_path = os.path.join(tempfile.mkdtemp(), 'rates.json')
+        with open(rates_path, 'w') as f:
+            json.dump(RATES_FILE, f)
+        patcher = mock.patch.multiple(currency_converter, EXCHANGE_RATES_OFFLINE=True,
+                                      EXCHANGE_RATES_FILE=rates_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestCurrencyConverter(OfflineRatesTestCase):
+
+    def test_offline_cross_rates_and_weekends(self):
+        records = [
+            {'amount': 10.0, 'currency': 'USD', 'transaction_date': '2025-07-18'},
+            {'amount': 10.0, 'currency': 'USD', 'transaction_date': '2025-07-20'},
+            {'amount': 10.0, 'currency': 'EUR', 'transaction_date': '2025-07-21'},
+            {'amount': 10.0, 'currency': 'INR', 'transaction_date': '2025-07-21'},
+        ]
+        converted = currency_converter.convert_to_base_currency(records, 'INR')
+        self.assertEqual([r['amount_in_base'] for r in converted], [850.0, 850.0, 1000.0, 10.0])
+
+    def test_rates_are_persisted(self):
+        records = [{'amount': 1.0, 'currency': 'USD', 'transaction_date': '2025-07-19'}]
+        currency_converter.convert_to_base_currency(records, 'EUR')
+        stored = database.get_exchange_rates('USD', 'EUR', '2025-07-01', '2025-07-31')
+        self.assertAlmostEqual(stored['2025-07-19'], 1 / 1.20)
+
+        # A new process (empty cache) is served from the table without fetching
+        currency_converter.RATES_CACHE.clear()
+        with mock.patch.object(currency_converter, '_fetch_rate_range') as fetch:
+            currency_converter.convert_to_base_currency(records, 'EUR')
+        fetch.assert_not_called()
+        self.assertEqual(records[0]['amount_in_base'], 0.83)
+
+    def test_one_range_request_per_pair(self):
+        records = [{'amount': 1.0, 'currency': currency, 'transaction_date': f'2025-07-{day}'}
+                   for currency in ('USD', 'EUR') for day in (17, 18, 19, 20, 21)]
+        with mock.patch.object(currency_converter, '_fetch_rate_range',
+                               wraps=currency_converter._fetch_rate_range) as fetch:
+            currency_converter.convert_to_base_currency(records, 'INR')
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual({call.args[:2] for call in fetch.call_args_list},
+                         {('USD', 'INR'), ('EUR', 'INR')})
+
+    def test_columnar_conversion(self):
+        converted = currency_converter.convert_amounts(
+            [10.0, None, 10.0, 10.0, 10.0, 0],
+            ['USD', 'USD', 'USD', 'USD', 'INR', 'USD'],
+            [date(2025, 7, 18), '2025-07-18', '', 'not a date', '2025-07-18', '2025-07-18'],
+            'INR',
+        )
+        self.assertEqual(converted.tolist(), [850.0, 0.0, 0.0, 10.0, 10.0, 0.0])
+
+    def test_missing_rate_keeps_original_amount(self):
+        records = [{'amount': 5.0, 'currency': 'USD', 'transaction_date': '2025-07-01'}]
+        currency_converter.convert_to_base_currency(records, 'INR')
+        self.assertEqual(records[0]['amount_in_base'], 5.0)
+
+
+class TestStoredAmounts(OfflineRatesTestCase):
+
+    def save(self, vendor, transaction_date, amount, currency, materialize=True):
+        receipt = ReceiptData(vendor=vendor, transaction_date=transaction_date, amount=amount,
+                              currency=currency, raw_text='', raw_data=b'', raw_data_extension='txt')
+        amounts = (currency_converter.amounts_in_base_for_receipt(amount, currency, transaction_date)
+                   if materialize else None)
+        return database.save_receipt(receipt, amounts_in_base=amounts)
+
+    def test_save_and_aggregate_in_sql(self):
+        self.save('Starbucks', date(2025, 7, 18), 10.0, 'USD')
+        self.save('Mart', date(2025, 7, 21), 300.0, 'INR')
+        self.save('Mart', date(2025, 7, 19), 100.0, 'INR')
+
+        summary = database.aggregate_amounts_in_base('INR')[0]
+        self.assertEqual((summary['record_count'], summary['converted_count']), (3, 3))
+        self.assertEqual(summary['total'], 1250.0)
+        self.assertEqual(database.median_amount_in_base('INR'), 300.0)
+        self.assertEqual(database.median_amount_in_base('INR', keywords=['mart'], search_feature='vendor'), 200.0)
+
+        by_vendor = {g['vendor']: g['total'] for g in database.aggregate_amounts_in_base('USD', group_by='vendor')}
+        self.assertEqual(by_vendor, {'Starbucks': 10.0, 'Mart': 4.93})
+
+    def test_backfill_and_fill(self):
+        receipt_id = self.save('Starbucks', date(2025, 7, 18), 10.0, 'USD', materialize=False)
+        records = database.query_amounts_in_base('INR')
+        self.assertIsNone(records[0]['amount_in_base'])
+
+        self.assertEqual(currency_converter.backfill_amounts_in_base(), 3)
+        self.assertEqual(database.get_receipts_missing_amount_in_base('EUR'), [])
+        self.assertEqual(database.query_amounts_in_base('INR')[0]['amount_in_base'], 850.0)
+
+        # Editing the receipt invalidates its stored amounts until they are filled again
+        with database.get_pool().write() as conn:
+            conn.execute("UPDATE receipts SET amount = 20 WHERE id = ?", (receipt_id,))
+        records = currency_converter.fill_amounts_in_base(database.query_amounts_in_base('INR'), 'INR')
+        self.assertEqual(records[0]['amount_in_base'], 1700.0)
+        self.assertEqual(database.query_amounts_in_base('INR')[0]['amount_in_base'], 1700.0)
+
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
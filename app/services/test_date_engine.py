@@ -0,0 +1,74 @@
+import contextlib
+import io
+import unittest
+from datetime import datetime
+
+from date_engine import DateScan, best_date, date_keyword, parse_date
+from parsers import find_date
+
+
+def find_quietly(text):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return find_date(text)
+
+
+class TestParseDate(unittest.TestCase):
+
+    def test_formats(self):
+        self.assertEqual(parse_date('2024-01-15'), datetime(2024, 1, 15))
+        self.assertEqual(parse_date('15/01/2024'), datetime(2024, 1, 15))
+        self.assertEqual(parse_date('01.15.2024'), datetime(2024, 1, 15))  # month first when day first fails
+        self.assertEqual(parse_date('15-01-24'), datetime(2024, 1, 15))
+        self.assertEqual(parse_date('15-01-85'), datetime(1985, 1, 15))
+        self.assertEqual(parse_date('20240115'), datetime(2024, 1, 15))
+        self.assertEqual(parse_date('15 Jan 2024'), datetime(2024, 1, 15))
+        self.assertEqual(parse_date('15 January 2024'), datetime(2024, 1, 15))
+        self.assertEqual(parse_date('0024-01-15'), datetime(2024, 1, 15))
+
+    def test_invalid(self):
+        self.assertIsNone(parse_date('2024-02-30'))
+        self.assertIsNone(parse_date('20241301'))
+        self.assertIsNone(parse_date('15-January-2024'))
+        self.assertIsNone(parse_date(''))
+
+    def test_normalized_candidates_share_a_cache_entry(self):
+        self.assertIs(parse_date('17/03/2023'), parse_date('17.03.2023'))
+
+
+class TestDateScan(unittest.TestCase):
+
+    def test_candidates_per_line_and_window(self):
+        scan = DateScan(["Bill Date:", "15", "Jan 2024 ref 2024.01.16", "20240117"])
+        self.assertEqual(scan.candidates_in(1, 2), ['2024.01.16', '15 Jan 2024'])
+        self.assertEqual(scan.candidates_in(2, 2), ['2024.01.16'])
+        self.assertEqual(scan.candidates_in(3, 3), ['20240117'])
+        self.assertEqual(scan.candidates_in(1, 2, ('spaced',)), ['15 Jan 2024'])
+
+    def test_overlapping_candidates_of_different_kinds(self):
+        scan = DateScan(["15/01/2024/03/04"])
+        self.assertEqual(scan.candidates_in(0, 0), ['2024/03/04', '15/01/2024'])
+
+    def test_best_date_prefers_latest_past_date(self):
+        self.assertEqual(best_date(['2024-01-15', '2023-05-01', '2999-01-01', 'junk']), '2024-01-15')
+        self.assertEqual(best_date(['2999-01-01', '2998-01-01']), '2998-01-01')
+        self.assertIsNone(best_date([]))
+
+
+class TestFindDate(unittest.TestCase):
+
+    def test_sample_bills(self):
+        # The latest past date within the keyword line and the two below it
+        self.assertEqual(find_quietly("BESCOM\nBill Date: 20-06-2025\nDue Date: 15-07-2025"), '2025-07-15')
+        self.assertEqual(find_quietly("Airtel\nInvoice Date : 01-07-2025\n...\nTotal 999.00"), '2025-07-01')
+        self.assertEqual(find_quietly("DMART\nAddress\nRef 2025/07/19 19:40"), '2025-07-19')
+        self.assertEqual(find_quietly("Cafe\nServed 3 March 2024"), '2024-03-03')
+        self.assertIsNone(find_quietly("Some text without a date."))
+
+    def test_date_keyword(self):
+        self.assertEqual(date_keyword('bill date: 20-06-2025'), 'date:')
+        self.assertEqual(date_keyword('invoice dt 01-07-2025'), 'invoice date')
+        self.assertIsNone(date_keyword('grand total 450.00'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import image_preprocessing
+from image_preprocessing import estimate_skew, estimate_text_height, preprocess_for_ocr
+
+BACKGROUND = (235, 228, 215)
+
+
+def receipt_photo(size=(1500, 2000), font_size=40, tilt=0.0) -> Image.Image:
+    image = Image.new('RGB', size, BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=font_size)
+    for i in range(int(size[1] / (font_size * 1.6)) - 4):
+        draw.text((100, 100 + i * font_size * 1.6), f"Item {i} Masala Dosa x2  Rs. {i * 13.5:.2f}",
+                  fill=(30, 30, 30), font=font)
+    return image.rotate(tilt, fillcolor=BACKGROUND) if tilt else image
+
+
+@unittest.skipUnless(image_preprocessing.OPENCV_AVAILABLE, "OpenCV not installed")
+class TestImagePreprocessing(unittest.TestCase):
+
+    def test_measures_text_height_and_skew(self):
+        binary, scale = image_preprocessing._measure_copy(np.asarray(receipt_photo(tilt=3).convert('L')))
+        self.assertAlmostEqual(estimate_text_height(binary) / scale, 29, delta=5)
+        self.assertAlmostEqual(estimate_skew(binary), -3, delta=0.5)
+        self.assertEqual(estimate_skew(np.zeros((50, 50), np.uint8)), 0.0)
+
+    def test_scales_text_to_target_height(self):
+        result = preprocess_for_ocr(receipt_photo(font_size=80, size=(3000, 4000)), target_text_height=30)
+        self.assertEqual(result.dtype, np.uint8)
+        self.assertEqual(set(np.unique(result)), {0, 255})
+        binary, scale = image_preprocessing._measure_copy(result)
+        self.assertAlmostEqual(estimate_text_height(binary) / scale, 30, delta=5)
+
+    def test_max_side_and_disabled_scaling(self):
+        photo = receipt_photo()
+        self.assertEqual(max(preprocess_for_ocr(photo, max_side=800, deskew=False).shape), 800)
+        self.assertEqual(preprocess_for_ocr(photo, target_text_height=0, target_dpi=0, deskew=False).shape,
+                         (2000, 1500))
+
+    def test_accepts_arrays_and_grayscale(self):
+        photo = receipt_photo(size=(600, 800), font_size=20)
+        self.assertEqual(preprocess_for_ocr(np.asarray(photo), deskew=False).ndim, 2)
+        self.assertEqual(preprocess_for_ocr(photo.convert('L'), deskew=False).ndim, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import time
+import unittest
+
+from jobs import JobQueue, QueueFullError
+
+
+def wait_for(queue: JobQueue, job_id: str, timeout: float = 5) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def add(a, b, timings):
+    timings['add'] = 0.5
+    return a + b
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def test_result_and_timings(self):
+        queue = JobQueue(workers=1)
+        job = wait_for(queue, queue.submit(add, 2, b=3))
+        self.assertEqual((job["status"], job["result"]), ("done", 5))
+        self.assertEqual(job["timings"]["add"], 0.5)
+        self.assertIn("queued", job["timings"])
+        self.assertIn("run", job["timings"])
+        self.assertEqual(queue.stats()["completed"], 1)
+
+    def test_failure_is_recorded(self):
+        queue = JobQueue(workers=1)
+        job = wait_for(queue, queue.submit(add, 1, None))
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("unsupported operand", job["error"])
+
+    def test_bounded_queue_rejects_when_full(self):
+        release = threading.Event()
+        queue = JobQueue(workers=1, max_queued=1)
+        blocker = queue.submit(lambda timings: release.wait(5))
+        while queue.get(blocker)["status"] != "running":
+            time.sleep(0.01)
+        waiting = queue.submit(add, 1, 1)
+        self.assertEqual(queue.get(waiting)["queue_position"], 0)
+        with self.assertRaises(QueueFullError):
+            queue.submit(add, 1, 1)
+        stats = queue.stats()
+        self.assertEqual((stats["queue_depth"], stats["busy_workers"], stats["rejected"]), (1, 1, 1))
+        release.set()
+        self.assertEqual(wait_for(queue, waiting)["result"], 2)
+
+    def test_finished_jobs_are_pruned(self):
+        queue = JobQueue(workers=1, retention_seconds=0)
+        job_id = queue.submit(add, 1, 1)
+        wait_for(queue, job_id)
+        queue.submit(add, 1, 1)
+        self.assertIsNone(queue.get(job_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
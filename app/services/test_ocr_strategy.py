@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import patch
+
+import ocr_strategy
+
+CONFIGS = ['--psm 6', '--psm 4', '--psm 3']
+
+
+class TestAdaptiveOcr(unittest.TestCase):
+
+    def setUp(self):
+        ocr_strategy.reset_ocr_stats()
+
+    def run_ocr(self, outputs: dict, **kwargs):
+        def fake_ocr(image, config='', timeout=0):
+            result = outputs[config]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with patch.object(ocr_strategy.pytesseract, 'image_to_string', side_effect=fake_ocr) as mocked:
+            text = ocr_strategy.adaptive_ocr(None, score=lambda t: t.count('field'), configs=CONFIGS,
+                                             threshold=2, **kwargs)
+        return text, [call.kwargs['config'] for call in mocked.call_args_list]
+
+    def test_stops_at_first_good_result(self):
+        text, tried = self.run_ocr({'--psm 6': 'field field', '--psm 4': 'x', '--psm 3': 'x'})
+        self.assertEqual((text, tried), ('field field', ['--psm 6']))
+        stats = ocr_strategy.get_ocr_stats()
+        self.assertEqual(stats['early_exits'], 1)
+        self.assertEqual(stats['configs']['--psm 6']['hit_rate'], 1.0)
+
+    def test_keeps_highest_score_then_longest(self):
+        text, tried = self.run_ocr({'--psm 6': 'field with a lot of noise', '--psm 4': RuntimeError('boom'),
+                                    '--psm 3': 'nothing useful, but longer than the others'})
+        self.assertEqual(text, 'field with a lot of noise')
+        self.assertEqual(tried, CONFIGS)
+        stats = ocr_strategy.get_ocr_stats()['configs']
+        self.assertEqual(stats['--psm 6']['selected'], 1)
+        self.assertEqual(stats['--psm 4']['timeouts'], 1)
+        self.assertEqual(stats['--psm 3']['hit_rate'], 0.0)
+
+    def test_time_budget_skips_remaining_configs(self):
+        text, tried = self.run_ocr({'--psm 6': 'field', '--psm 4': 'field field', '--psm 3': ''}, time_budget=0)
+        # The first config always runs; the rest are skipped once the budget is gone
+        self.assertEqual((text, tried), ('field', ['--psm 6']))
+        self.assertEqual(ocr_strategy.get_ocr_stats()['budget_exhausted'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
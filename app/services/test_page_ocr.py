@@ -0,0 +1,72 @@
+import shutil
+import unittest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import fitz  # PyMuPDF
+
+import page_ocr
+
+
+def make_pdf(pages: list[str]) -> bytes:
+    """Builds a PDF where an empty string makes an image-only (blank) page."""
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page(width=200, height=100)
+        if text:
+            page.insert_text((10, 50), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class TestPageOcr(unittest.TestCase):
+
+    def test_pages_keep_their_order(self):
+        pdf = make_pdf(["first page", "", "third page", ""])
+        seen = []
+
+        def fake_ocr(image, config=''):
+            seen.append(image.size)
+            return "ocr" + "!" * len(seen)
+
+        with patch.object(page_ocr.pytesseract, 'image_to_string', side_effect=fake_ocr):
+            text = page_ocr.extract_pdf_text(pdf, workers=1)
+
+        lines = [line for line in text.splitlines() if line]
+        self.assertEqual(lines[0], "first page")
+        self.assertEqual(lines[1], "ocr!!!")  # longest of the three configs wins
+        self.assertEqual(lines[2], "third page")
+        self.assertEqual(lines[3], "ocr!!!!!!")
+        # Raw samples are rendered at PDF_RENDER_ZOOM
+        self.assertEqual(seen[0], (200 * page_ocr.PDF_RENDER_ZOOM, 100 * page_ocr.PDF_RENDER_ZOOM))
+
+    def test_broken_pool_retries_only_unfinished_pages(self):
+        outcomes = iter(["", BrokenProcessPool("worker died")])  # Page 1 blank, then the pool breaks
+
+        class FakePool:
+            def submit(self, fn, raster):
+                future, outcome = Future(), next(outcomes)
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+                return future
+
+        with patch.object(page_ocr, '_get_pool', return_value=FakePool()), \
+                patch.object(page_ocr, '_reset_pool'), \
+                patch.object(page_ocr, 'ocr_page', return_value="retried") as in_process:
+            text = page_ocr.extract_pdf_text(make_pdf(["", "", ""]), workers=2, max_in_flight=1)
+        self.assertEqual(in_process.call_count, 2)
+        self.assertEqual(text.splitlines(), ["", "retried", "retried"])
+
+    @unittest.skipIf(shutil.which('tesseract') is None, "tesseract is not installed")
+    def test_pool_matches_in_process(self):
+        pdf = make_pdf(["", "", ""])
+        self.assertEqual(page_ocr.extract_pdf_text(pdf, workers=2, max_in_flight=1),
+                         page_ocr.extract_pdf_text(pdf, workers=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
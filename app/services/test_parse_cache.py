@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import parse_cache
+from parse_cache import ParseCache, cache_key
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'parse_cache.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_content_extension_and_version(self):
+        key = cache_key(b'receipt', 'PNG ', '1')
+        self.assertEqual(key, cache_key(b'receipt', 'png', '1'))
+        self.assertNotEqual(key, cache_key(b'receipt!', 'png', '1'))
+        self.assertNotEqual(key, cache_key(b'receipt', 'jpg', '1'))
+        self.assertNotEqual(key, cache_key(b'receipt', 'png', '2'))
+
+    def test_round_trip_and_counters(self):
+        cache = ParseCache(self.path)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', {"vendor": "DMart", "amount": 12.5, "raw_text": "DMART\ntotal 12.50"})
+        self.assertEqual(cache.get('a')["amount"], 12.5)
+        # Survives a restart
+        self.assertEqual(ParseCache(self.path).get('a')["vendor"], "DMart")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = ParseCache(self.path, max_bytes=250)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, {"raw_text": key * 80})
+            cache.get('a')  # keep 'a' hot
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_running_total_replaces_per_put_sum(self):
+        cache = ParseCache(self.path, max_bytes=200)
+        statements = []
+        cache.put('a', {"raw_text": "a" * 80})
+        cache._conn.set_trace_callback(statements.append)
+        cache.put('a', {"raw_text": "a" * 40})  # replacing counts only the new size
+        cache.put('b', {"raw_text": "b" * 80})
+        self.assertFalse([s for s in statements if 'SUM(' in s])
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["size_bytes"]), (2, 56 + 96))
+        # Over the limit: 'a' is evicted and the total follows
+        cache.put('c', {"raw_text": "c" * 80})
+        self.assertEqual((cache.stats()["size_bytes"], cache.stats()["evictions"]), (96 + 96, 1))
+        cache.clear()
+        self.assertEqual(ParseCache(self.path).stats()["size_bytes"], 0)
+
+    def test_default_path_and_disabled_stats(self):
+        self.assertTrue(os.path.isabs(ParseCache().path))
+        cache = ParseCache(self.path)
+        with patch.object(parse_cache, 'PARSE_CACHE_ENABLED', False):
+            stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["size_bytes"], stats["enabled"]), (0, 0, False))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_parse_and_extract_data_uses_cache(self):
+        import parsers
+
+        text = b"DMart Supermarket\nDate: 2024-07-18\nTotal: Rs 450.00\n"
+        with patch.object(parse_cache, '_cache', ParseCache(self.path)), \
+                patch.object(parsers, '_parse_and_extract_uncached',
+                             wraps=parsers._parse_and_extract_uncached) as uncached:
+            first = parsers.parse_and_extract_data(text, 'txt')
+            second = parsers.parse_and_extract_data(text, 'txt')
+            self.assertEqual(uncached.call_count, 1)
+            self.assertEqual(second.pop("metadata")["stages"][0]["outcome"], "hit")
+            first.pop("metadata")
+            self.assertEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
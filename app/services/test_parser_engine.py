@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import parsers
+from parsers import ParserEngine
+
+DOCUMENTS = [
+    (b"DMART\nDate: 19/07/2025\nGrand Total   Rs. 1,250.50\n", 'txt'),
+    (b"Airtel\nInvoice Date : 01-07-2025\nTotal Amount Due 999.00\n", 'txt'),
+    (b"x", 'txt'),
+    (b"BESCOM\nBill Date: 20-06-2025\nNet Amount Payable : \xe2\x82\xb9 2345.00\n", 'txt'),
+    (b"not a document", 'exe'),
+]
+
+
+def setUpModule():
+    # Worker processes read the cache settings from the environment
+    global tmp
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['PARSE_CACHE_PATH'] = os.path.join(tmp.name, 'parse_cache.db')
+    os.environ['PARSE_CACHE_ENABLED'] = '0'
+
+
+def tearDownModule():
+    tmp.cleanup()
+
+
+class TestParserEngine(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(parsers, 'PARSE_CACHE_ENABLED', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_many_in_process_keeps_input_order(self):
+        results = list(ParserEngine(workers=0, chunk_size=2).parse_many(iter(DOCUMENTS)))
+        self.assertEqual([r.get('vendor') for r in results], ['DMart', 'Airtel', None, 'BESCOM', None])
+        self.assertEqual(results[0]['amount'], 1250.5)
+        self.assertIn('error', results[2])
+        self.assertIn('error', results[4])
+
+    def test_parse_many_reads_documents_lazily(self):
+        read = []
+
+        def documents():
+            for document in DOCUMENTS:
+                read.append(document)
+                yield document
+
+        results = ParserEngine(workers=0, chunk_size=2).parse_many(documents())
+        next(results)
+        self.assertEqual(len(read), 2)
+
+    def test_parse_many_with_worker_processes_matches_in_process(self):
+        expected = list(ParserEngine(workers=0).parse_many(DOCUMENTS))
+        actual = list(ParserEngine(workers=2, chunk_size=2).parse_many(DOCUMENTS))
+        # Stage timings differ from run to run
+        for result in expected + actual:
+            result.pop('metadata')
+        self.assertEqual(actual, expected)
+
+    def test_parse_errors_become_results(self):
+        with patch.object(parsers, 'parse_and_extract_data', side_effect=RuntimeError("boom")):
+            self.assertEqual(list(ParserEngine().parse_many(DOCUMENTS[:1])), [{"error": "boom"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
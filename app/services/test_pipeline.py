@@ -0,0 +1,135 @@
+import contextlib
+import io
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+import parsers
+from pipeline import Pipeline, PipelineAbort, Stage
+
+
+def append(name, outcome=None):
+    def stage(context):
+        context.setdefault("ran", []).append(name)
+        return outcome
+    return stage
+
+
+def fail(context):
+    raise RuntimeError("boom")
+
+
+def parse_quietly(*args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parsers.parse_and_extract_data(*args, **kwargs)
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_runs_stages_in_order_with_timings(self):
+        pipeline = Pipeline([Stage('a', append('a')), Stage('b', append('b', 'partial'))], skip=())
+        context, timings = {}, {}
+        records = pipeline.run(context, timings=timings)
+        self.assertEqual(context["ran"], ['a', 'b'])
+        self.assertEqual([(r["stage"], r["outcome"]) for r in records], [('a', 'ok'), ('b', 'partial')])
+        self.assertEqual(set(timings), {'a', 'b'})
+
+    def test_register_replaces_or_inserts(self):
+        pipeline = Pipeline([Stage('a', append('a')), Stage('c', append('c'))], skip=())
+        pipeline.register('b', append('b'), before='c')
+        pipeline.register('a', append('A'))
+        self.assertEqual(pipeline.names, ['a', 'b', 'c'])
+        context = {}
+        pipeline.run(context)
+        self.assertEqual(context["ran"], ['A', 'b', 'c'])
+        with self.assertRaises(ValueError):
+            pipeline.register('d', append('d'), before='missing')
+
+    def test_skipped_stages(self):
+        pipeline = Pipeline([Stage('a', append('a')), Stage('b', append('b'))], skip=('a',))
+        context = {}
+        records = pipeline.run(context, skip=('b',))
+        self.assertNotIn("ran", context)
+        self.assertEqual([r["outcome"] for r in records], ['skipped', 'skipped'])
+
+    def test_fatal_and_non_fatal_failures(self):
+        stages = [Stage('a', fail, fatal=False), Stage('b', append('b')), Stage('c', fail), Stage('d', append('d'))]
+        context = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = Pipeline(stages, skip=()).run(context)
+        self.assertEqual([r["outcome"] for r in records], ['error', 'ok', 'error'])
+        self.assertEqual(context["ran"], ['b'])
+        self.assertEqual(context["error"], "boom")
+
+    def test_abort_ends_even_non_fatal_stages(self):
+        def abort(context):
+            raise PipelineAbort("nothing to do")
+
+        context = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = Pipeline([Stage('a', abort, fatal=False), Stage('b', append('b'))], skip=()).run(context)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(context["error"], "nothing to do")
+
+
+class TestParsePipeline(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(parsers, 'PARSE_CACHE_ENABLED', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_metadata(self):
+        result = parse_quietly(b"DMART\r\nDate: 19/07/2025\r\nGrand Total   Rs. 1,250.50\r\n", 'txt')
+        self.assertEqual((result["vendor"], result["transaction_date"], result["amount"]),
+                         ('DMart', '2025-07-19', 1250.5))
+        metadata = result["metadata"]
+        self.assertEqual([(s["stage"], s["outcome"]) for s in metadata["stages"]],
+                         [('decode', 'text'), ('preprocess', 'not_needed'), ('text', 'not_needed'),
+                          ('ocr', 'not_needed'), ('normalize', 'ok'), ('extract', 'ok'), ('validate', 'ok')])
+        self.assertEqual(list(metadata["extractors"]), ['vendor', 'date', 'amount'])
+        self.assertEqual(metadata["issues"], [])
+
+    def test_extract_reuses_fields_from_ocr_scoring(self):
+        def fake_ocr(image, score):
+            texts = ["Some shop\nnothing here", "DMART\r\nDate: 19/07/2025\r\nGrand Total   Rs. 1,250.50"]
+            return max(texts, key=score)
+
+        calls = []
+
+        def counted(name, extractor):
+            def run(text):
+                calls.append(name)
+                return extractor(text)
+            return run
+
+        extractors = {name: counted(name, extractor) for name, extractor in parsers.FIELD_EXTRACTORS.items()}
+        image = io.BytesIO()
+        Image.new('L', (40, 40), 255).save(image, format='PNG')
+        with patch.object(parsers, 'adaptive_ocr', fake_ocr), patch.dict(parsers.FIELD_EXTRACTORS, extractors):
+            result = parse_quietly(image.getvalue(), 'png')
+        self.assertEqual((result["vendor"], result["transaction_date"], result["amount"]),
+                         ('DMart', '2025-07-19', 1250.5))
+        stages = {s["stage"]: s["outcome"] for s in result["metadata"]["stages"]}
+        self.assertEqual(stages['extract'], 'reused')
+        # Once per scored config; none again in the extract stage
+        self.assertEqual(len(calls), 2 * len(extractors))
+        self.assertEqual(list(result["metadata"]["extractors"]), ['vendor', 'date', 'amount'])
+
+    def test_validation_issues_and_skipped_stages(self):
+        result = parse_quietly(b"Some shop receipt\nnothing else here\n", 'txt', skip_stages=['ocr'])
+        stages = {s["stage"]: s["outcome"] for s in result["metadata"]["stages"]}
+        self.assertEqual((stages['ocr'], stages['validate']), ('skipped', 'issues'))
+        self.assertIn("missing amount", result["metadata"]["issues"])
+        self.assertNotIn("error", result)
+
+    def test_insufficient_text_is_an_error(self):
+        result = parse_quietly(b"x", 'exe')
+        self.assertEqual(result["error"], "Insufficient text extracted from document")
+        self.assertEqual([s["outcome"] for s in result["metadata"]["stages"]],
+                         ['error', 'not_needed', 'not_needed', 'not_needed', 'error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from vendor_index import AhoCorasick, VendorIndex
+
+KNOWN_VENDORS = {
+    'Electricity': {
+        'bescom': 'BESCOM',
+        'tata power': 'Tata Power',
+    },
+    'Internet & Telecom': {
+        'jio': 'Jio',
+    },
+    'Groceries': {
+        'dmart': 'DMart',
+        'more': 'More Supermarket',
+        'more retail': 'More Retail',
+    },
+}
+
+CATEGORY_KEYWORDS = {
+    'Electricity': ['electricity', 'power'],
+    'Groceries': ['grocery', 'mart'],
+}
+
+
+class TestAhoCorasick(unittest.TestCase):
+
+    def test_overlapping_and_nested_patterns(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers', 'xyz'])
+        self.assertEqual(automaton.find('ushers'), {'she', 'he', 'hers'})
+        self.assertEqual(automaton.find('this'), {'his'})
+        self.assertEqual(automaton.find(''), set())
+
+
+class TestVendorIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = VendorIndex(KNOWN_VENDORS, CATEGORY_KEYWORDS)
+
+    def test_exact_keyword_scores_100(self):
+        text = "bescom power bill for july\ntotal 1200"
+        self.assertEqual(self.index.detect_category(text), ('Electricity', 'power'))
+        self.assertEqual(self.index.best_vendor(text, 'Electricity'), ('BESCOM', 'Electricity', 100))
+
+    def test_category_restricts_vendors(self):
+        text = "dmart grocery\ntotal 300"
+        self.assertEqual(self.index.best_vendor(text, 'Electricity'), (None, None, 0))
+        self.assertEqual(self.index.best_vendor(text, 'Groceries')[:2], ('DMart', 'Groceries'))
+
+    def test_short_keywords_are_skipped(self):
+        self.assertEqual(self.index.best_vendor("jio recharge"), (None, None, 0))
+
+    def test_word_of_keyword_makes_candidate(self):
+        # 'tata' occurs, so 'tata power' is scored with the fuzzy scorers
+        name, category, score = self.index.best_vendor("tata powr")
+        self.assertEqual((name, category), ('Tata Power', 'Electricity'))
+        self.assertGreaterEqual(score, 85)
+
+
+if __name__ == '__main__':
+    unittest.main()
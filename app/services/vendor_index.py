@@ -0,0 +1,179 @@
+"""
+Vendor and category keyword index used by find_vendor().
+
+find_vendor() used to score every KNOWN_VENDORS keyword against the whole
+OCR text with three fuzzy scorers. Most of that work is wasted: a vendor
+keyword only counts if it, or one of its words, occurs verbatim in the text.
+The index finds all such occurrences with one Aho-Corasick pass and runs the
+fuzzy scorers only for the keywords that survive. It also skips any scorer
+that provably cannot reach the threshold, so it returns exactly what the
+per-keyword loop returned.
+"""
+
+from collections import deque
+
+from rapidfuzz import fuzz as rf_fuzz
+from rapidfuzz.utils import default_process
+
+# thefuzz's force_ascii drops these characters before processing
+_NON_ASCII = {i: None for i in range(128, 256)}
+
+# thefuzz scores are round()ed rapidfuzz scores; round(84.5) == 84, so a
+# thefuzz score of at least 85 means a raw score strictly above this
+_CUTOFF_85 = 84.5
+
+
+class AhoCorasick:
+    """Finds which of a fixed set of patterns occur in a text in one pass."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._out = [()]
+
+        for pattern in dict.fromkeys(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._out.append(())
+                state = next_state
+            self._out[state] = (pattern,)
+
+        # Breadth-first, so every fail target is finished before it is used.
+        # Each state's transitions are then completed with those of its fail
+        # state, turning the trie into a DFA: one dict lookup per character.
+        fail = [0] * len(self._goto)
+        self._delta = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[fail[state]], **self._goto[state]} if state else self._delta[0]
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                if state:
+                    fail[next_state] = self._delta[fail[state]].get(char, 0)
+                self._out[next_state] += self._out[fail[next_state]]
+
+    def find(self, text: str) -> set[str]:
+        """Returns the set of patterns that occur anywhere in text."""
+        delta, out = self._delta, self._out
+        state = 0
+        hits = set()
+        for char in text:
+            state = delta[state].get(char, 0)
+            if out[state]:
+                hits.add(state)
+        found = set()
+        for state in hits:
+            found.update(out[state])
+        return found
+
+
+def _sorted_tokens(text: str) -> str:
+    """Preprocessing thefuzz's token_sort_ratio applies to each side."""
+    text = text.translate(_NON_ASCII)
+    return " ".join(sorted(default_process(text).split()))
+
+
+def _ratio_bound(len_a: int, len_b: int) -> float:
+    """Highest ratio() two strings of these lengths can reach."""
+    return 200 * min(len_a, len_b) / (len_a + len_b) if len_a + len_b else 0
+
+
+class VendorIndex:
+    """
+    KNOWN_VENDORS and the category keywords of find_vendor(), indexed once.
+
+    Entries keep their dictionary order, so ties resolve the same way as
+    iterating the dictionaries did.
+    """
+
+    def __init__(self, known_vendors: dict, category_keywords: dict, min_keyword_length: int = 4):
+        self.category_keywords = [(category, keyword.lower())
+                                  for category, keywords in category_keywords.items()
+                                  for keyword in keywords]
+        # (category, keyword, name, sorted tokens) per usable vendor keyword
+        self.vendors = []
+        self._entries_by_pattern = {}
+        for category, vendors in known_vendors.items():
+            for keyword, name in vendors.items():
+                if len(keyword) < min_keyword_length:
+                    continue
+                keyword = keyword.lower()
+                index = len(self.vendors)
+                self.vendors.append((category, keyword, name, _sorted_tokens(keyword)))
+                for pattern in [keyword] + keyword.split():
+                    self._entries_by_pattern.setdefault(pattern, set()).add(index)
+
+        self._automaton = AhoCorasick(list(self._entries_by_pattern) +
+                                      [keyword for _, keyword in self.category_keywords])
+
+    def detect_category(self, text_lower: str, found: set[str] | None = None):
+        """
+        First category (in definition order) with a keyword whose
+        fuzz.partial_ratio against the text is at least 85.
+
+        Returns (category, keyword) or (None, None).
+        """
+        if found is None:
+            found = self._automaton.find(text_lower)
+        for category, keyword in self.category_keywords:
+            # A verbatim occurrence scores 100; anything else needs the real scorer
+            if keyword in found:
+                return category, keyword
+            score = rf_fuzz.partial_ratio(keyword, text_lower, score_cutoff=_CUTOFF_85)
+            if round(score) >= 85:
+                return category, keyword
+        return None, None
+
+    def best_vendor(self, text_lower: str, category: str | None = None, found: set[str] | None = None):
+        """
+        Highest scoring vendor keyword, restricted to category if given.
+
+        Score and thresholds are those of find_vendor(): the best of
+        partial_ratio, token_sort_ratio and ratio, at least 90 for keywords
+        shorter than 6 characters and 85 otherwise, and only for keywords
+        that (or one of whose words) appear verbatim in the text.
+
+        Returns (name, category, score) or (None, None, 0).
+        """
+        if found is None:
+            found = self._automaton.find(text_lower)
+        candidates = set()
+        for pattern in found:
+            candidates.update(self._entries_by_pattern.get(pattern, ()))
+
+        text_tokens = None
+        best = (None, None, 0)
+        for index in sorted(candidates):
+            vendor_category, keyword, name, keyword_tokens = self.vendors[index]
+            if category is not None and vendor_category != category:
+                continue
+            threshold = 90 if len(keyword) < 6 else 85
+            floor = max(threshold, best[2] + 1) - 0.5
+
+            if keyword in found:
+                score = 100
+            else:
+                score = round(rf_fuzz.partial_ratio(keyword, text_lower, score_cutoff=floor))
+                if _ratio_bound(len(keyword), len(text_lower)) >= floor:
+                    score = max(score, round(rf_fuzz.ratio(keyword, text_lower)))
+                if text_tokens is None:
+                    text_tokens = _sorted_tokens(text_lower)
+                if _ratio_bound(len(keyword_tokens), len(text_tokens)) >= floor:
+                    score = max(score, round(rf_fuzz.ratio(keyword_tokens, text_tokens)))
+
+            if score > best[2] and score >= threshold:
+                best = (name, vendor_category, score)
+                if score == 100:
+                    break
+        return best
+
+    def find(self, text_lower: str) -> set[str]:
+        """Keywords and keyword words occurring verbatim in text_lower."""
+        return self._automaton.find(text_lower)
@@ -0,0 +1,205 @@
+import importlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Point the app at a throwaway database and caches before it initializes itself on import
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_PATH', os.path.join(_tmp_dir, 'test_receipts.db'))
+os.environ.setdefault('PARSE_CACHE_PATH', os.path.join(_tmp_dir, 'parse_cache.db'))
+
+app_dir = Path(__file__).parent
+sys.path.insert(0, str(app_dir))
+
+# app.py shares its name with this package: under pytest it is app.app
+app_module = importlib.import_module('app.app' if __package__ else 'app')
+from database import blob_store, database
+from services import currency_converter
+
+RECEIPT = {
+    "vendor": "Starbucks",
+    "transaction_date": "2025-01-06",
+    "amount": 10.0,
+    "currency": "USD",
+    "category": "Restaurant",
+    "raw_text": "Starbucks total 10.00",
+    "raw_data": "",
+    "raw_data_extension": "txt",
+}
+
+
+def post_with_timeout(client, url, timeout=10, **kwargs):
+    """Posts from a thread so a deadlocked request fails the test instead of hanging it."""
+    responses = []
+    thread = threading.Thread(target=lambda: responses.append(client.post(url, **kwargs)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if not responses:
+        raise AssertionError(f"POST {url} did not finish within {timeout}s")
+    return responses[0]
+
+
+class TestSaveReceipts(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        currency_converter.RATES_CACHE.clear()
+        self.client = app_module.app.test_client()
+
+    def test_fetches_missing_rates_before_saving(self):
+        # The exchange_rates table is empty, so converting fetches rates and stores them
+        published = {'INR': {'2025-01-06': 85.5}, 'EUR': {'2025-01-06': 0.96}}
+        with patch.object(currency_converter, 'EXCHANGE_RATES_OFFLINE', False), \
+                patch.object(currency_converter, '_fetch_rate_range',
+                             side_effect=lambda from_currency, to_currency, start, end: published[to_currency]) as fetch:
+            response = post_with_timeout(self.client, '/save-receipts', json=[RECEIPT])
+        self.assertEqual(response.status_code, 201, response.get_json())
+        self.assertEqual(fetch.call_count, 2)
+        receipt_id = response.get_json()["data"]["receipt_ids"][0]
+        stored = {r['id']: r['amount_in_base'] for r in database.query_amounts_in_base('INR')}
+        self.assertEqual(stored[receipt_id], 855.0)
+        self.assertEqual(database.get_exchange_rates('USD', 'INR', '2025-01-01', '2025-01-31'),
+                         {'2025-01-06': 85.5})
+
+
+class TestDashboard(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        self.client = app_module.app.test_client()
+        # INR to the other base currencies isn't needed here
+        patcher = patch.object(currency_converter, 'EXCHANGE_RATES_OFFLINE', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        receipts = [
+            dict(RECEIPT, vendor=vendor, category=category, transaction_date=date, amount=amount, currency="INR")
+            for vendor, category, date, amount in [
+                ("Starbucks", "Restaurant", "2025-01-06", 250.0), ("Starbucks", "Restaurant", "2025-01-06", 120.5),
+                ("Starbucks", "Restaurant", "2025-01-20", 99.99), ("DMart", "Groceries", "2025-01-07", 1250.5),
+                ("DMart", None, "2025-02-03", 310.0), ("BESCOM", "Utilities", "2025-02-10", 1800.0),
+            ]
+        ]
+        response = self.client.post('/save-receipts', json=receipts)
+        self.assertEqual(response.status_code, 201, response.get_json())
+
+    def dashboards(self, query):
+        """The dashboard for query built from the rollups and from the receipts."""
+        with patch.object(app_module, 'get_receipts_in_base', side_effect=AssertionError("not from rollups")):
+            from_rollups = self.client.get(f'/insights/dashboard?{query}').get_json()["data"]
+        with patch.object(app_module, '_dashboard_from_rollups', return_value=None):
+            from_receipts = self.client.get(f'/insights/dashboard?{query}').get_json()["data"]
+        return from_rollups, from_receipts
+
+    def test_rollups_match_receipts(self):
+        unfiltered, _ = self.dashboards('bucket=D')
+        for query, filtered in (('bucket=D', False), ('bucket=W&top_n=2', False),
+                                ('bucket=M&search_feature=vendor&search_keyword=dmart&search_mode=fuzzy', True),
+                                ('range_feature=transaction_date&start=2025-01-07&end=2025-02-28', True)):
+            with self.subTest(query=query):
+                from_rollups, from_receipts = self.dashboards(query)
+                self.assertEqual(from_rollups, from_receipts)
+                statistics = from_rollups["statistics"]
+                self.assertGreater(statistics["record_count"], 0)
+                if filtered:
+                    self.assertLess(statistics["record_count"], unfiltered["statistics"]["record_count"])
+                    self.assertLess(statistics["total"], unfiltered["statistics"]["total"])
+        search, _ = self.dashboards('search_feature=vendor&search_keyword=dmart&search_mode=fuzzy')
+        self.assertEqual([v["vendor"] for v in search["vendors"]["spend"]["top"]], ["DMart"])
+
+    def test_falls_back_to_receipts(self):
+        response = self.client.get('/insights/dashboard?range_feature=amount&start=100&end=500')
+        self.assertEqual(response.get_json()["data"]["statistics"]["record_count"], 3)
+
+    def test_unmaterialized_base_currency_converts_columns(self):
+        # No GBP rates offline, so amounts are kept as they are
+        with patch.object(app_module, 'convert_amounts', wraps=currency_converter.convert_amounts) as convert:
+            dashboard = self.client.get('/insights/dashboard?base_currency=GBP').get_json()["data"]
+            vendors = self.client.get('/insights/top-vendors?base_currency=GBP&range_feature=amount'
+                                      '&start=100&end=2000').get_json()["data"]
+            series = self.client.get('/insights/spending-over-time?base_currency=GBP&range_feature=amount'
+                                     '&start=100&end=2000').get_json()["data"]
+        self.assertEqual(convert.call_count, 3)  # Once per request, on whole columns
+        self.assertEqual((dashboard["statistics"]["record_count"], dashboard["statistics"]["total"]), (6, 3830.99))
+        self.assertEqual(vendors, [{"vendor": "BESCOM", "value": 1800.0}, {"vendor": "DMart", "value": 1560.5},
+                                   {"vendor": "Starbucks", "value": 370.5}])
+        self.assertEqual(round(sum(day["Total Spend"] for day in series), 2), 3731.0)
+
+
+class TestFuzzySearch(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        self.client = app_module.app.test_client()
+
+    def search(self, keyword):
+        response = self.client.get(f'/receipts?search_feature=vendor&search_mode=fuzzy&search_keyword={keyword}')
+        return [r['vendor'] for r in response.get_json()["data"]]
+
+    def test_index_follows_updated_vendors(self):
+        receipt_id, = database.save_receipts([dict(RECEIPT, currency="INR")])
+        self.assertEqual(self.search('starbuks'), ['Starbucks'])
+        with database.get_pool().write() as conn:
+            conn.execute("UPDATE receipts SET vendor = 'Blue Tokai' WHERE id = ?", (receipt_id,))
+        self.assertEqual(self.search('blue tokay'), ['Blue Tokai'])
+        self.assertEqual(self.search('starbuks'), [])
+
+
+class TestReceiptFile(unittest.TestCase):
+
+    def setUp(self):
+        database.DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+        database.initialize_database()
+        self.client = app_module.app.test_client()
+        # A relative store path, resolved from a working directory other than app/
+        cwd, blob_path = os.getcwd(), blob_store.BLOB_STORE_PATH
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(setattr, blob_store, 'BLOB_STORE_PATH', blob_path)
+        os.chdir(tempfile.mkdtemp())
+        blob_store.BLOB_STORE_PATH = 'blobs'
+
+    def test_download_from_relative_store_path(self):
+        response = self.client.post('/save-receipts', json=[dict(RECEIPT, raw_data="c2Nhbg==", raw_data_extension="png")])
+        receipt_id = response.get_json()["data"]["receipt_ids"][0]
+        response = self.client.get(f'/receipts/{receipt_id}/file')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'scan')
+        response.close()
+
+    def stored_files(self):
+        return [f for _, _, files in os.walk('blobs') for f in files]
+
+    def post_form(self, **fields):
+        form = {key: value for key, value in RECEIPT.items() if key not in ('raw_data', 'raw_data_extension')}
+        form.update(currency='INR', file=(io.BytesIO(b'scan'), 'receipt.png'), **fields)
+        with patch.object(currency_converter, 'EXCHANGE_RATES_OFFLINE', True):
+            return self.client.post('/save-receipt', data=form, content_type='multipart/form-data')
+
+    def test_multipart_upload_is_stored_only_when_saved(self):
+        self.assertEqual(self.post_form(amount='-1').status_code, 422)
+        with patch.object(app_module, 'save_receipt', side_effect=RuntimeError("disk full")):
+            self.assertEqual(self.post_form().status_code, 500)
+        self.assertEqual(self.stored_files(), [])
+        response = self.post_form()
+        self.assertEqual(response.status_code, 201, response.get_json())
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_unknown_blob_hash_is_rejected(self):
+        missing = dict(RECEIPT, blob_hash='0' * 64)
+        response = self.client.post('/save-receipt', json=missing)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('0' * 64, response.get_json()["error"])
+        response = self.client.post('/save-receipts', json=[RECEIPT, missing])
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(database.get_all_receipts(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
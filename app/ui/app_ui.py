@@ -1,7 +1,6 @@
 import streamlit as st
 import requests
 import pandas as pd
-import base64
 import time
 import json
 from datetime import datetime, date, timedelta
@@ -188,12 +187,13 @@ if 'extracted_data' in st.session_state and st.session_state.extracted_data:
                     "vendor": vendor, "transaction_date": transaction_date.isoformat() if transaction_date else None,
                     "amount": amount, "currency": currency.upper(), "category": category,
                     "raw_text": data.get('raw_text'),
-                    "raw_data": base64.b64encode(st.session_state.file_bytes).decode('utf-8'),
                     "raw_data_extension": st.session_state.file_extension
                 }
+                # The original file goes as a multipart part, not base64 in JSON
+                upload = {'file': (f"receipt.{st.session_state.file_extension}", st.session_state.file_bytes)}
                 with st.spinner("Saving receipt..."):
                     try:
-                        response = requests.post(f"{BACKEND_URL}/save-receipt", json=final_data)
+                        response = requests.post(f"{BACKEND_URL}/save-receipt", data=final_data, files=upload)
                         if response.status_code == 201:
                             # Clear the form data and show success message
                             st.success("✅ Receipt saved successfully!")
@@ -226,7 +226,7 @@ if 'extracted_data' in st.session_state and st.session_state.extracted_data:
 # ==============================================================================
 st.subheader("Filter Data")
 filter_cols = st.columns(4)
-search_feature = filter_cols[0].selectbox("Search In", options=['vendor', 'category'], key='search_in')
+search_feature = filter_cols[0].selectbox("Search In", options=['vendor', 'category', 'raw_text', 'all'], key='search_in')
 search_keyword = filter_cols[1].text_input("Search Keyword", placeholder="e.g., Starbucks", key='search_kw')
 range_feature = filter_cols[2].selectbox("Filter by Range", options=["(None)", "transaction_date", "amount"], key='range_feature')
 display_currency = filter_cols[3].selectbox("Display Currency", options=['INR', 'USD', 'EUR', 'GBP'], key='display_curr')
@@ -261,11 +261,12 @@ with st.expander("View Filtered Raw Data"):
             table_params = active_filter_params.copy()
             table_params['sort_by'] = 'transaction_date'
             table_params['order'] = 'desc'
-            response = requests.get(f"{BACKEND_URL}/receipts", params=table_params, timeout=10)
+            # Streamed one receipt per line, so large exports don't need one huge JSON document
+            table_params['format'] = 'ndjson'
+            response = requests.get(f"{BACKEND_URL}/receipts", params=table_params, timeout=10, stream=True)
             
         if response.status_code == 200:
-            response_data = response.json()
-            receipts = response_data.get('data', [])
+            receipts = [json.loads(line) for line in response.iter_lines() if line]
             if receipts:
                 df = pd.DataFrame(receipts)
                 
@@ -310,29 +311,26 @@ st.divider()
 # ==============================================================================
 st.header(f"📊 Insights ({display_currency})")
 
+# Every insight and chart below is computed from this one response
+dashboard = {}
+try:
+    dashboard_response = requests.get(f"{BACKEND_URL}/insights/dashboard", params=active_filter_params, timeout=30)
+    if dashboard_response.status_code == 200:
+        dashboard = dashboard_response.json().get('data', {}) or {}
+    else:
+        st.error(f"❌ Failed to load insights: HTTP {dashboard_response.status_code}")
+except requests.exceptions.ConnectionError:
+    st.error("❌ Connection Error: Could not connect to the backend server.")
+except requests.exceptions.Timeout:
+    st.error("⏱️ Timeout Error: Request took too long. Please try again.")
+except Exception as e:
+    st.error(f"Could not load insights: {e}")
+
+stats = dashboard.get('statistics', {})
+# One row per (date, vendor, category) with spend and count
+time_series_df = pd.DataFrame(dashboard.get('time_series', []))
+
 try:
-    # Get basic statistics
-    stats_response = requests.get(f"{BACKEND_URL}/insights/statistics", params=active_filter_params)
-    stats = stats_response.json().get('data', {}) if stats_response.status_code == 200 else {}
-    
-    # Get top vendors by spend and frequency
-    vendor_spend_params = active_filter_params.copy()
-    vendor_spend_params['mode'] = 'spend'
-    vendor_freq_params = active_filter_params.copy()
-    vendor_freq_params['mode'] = 'frequency'
-    
-    top_vendors_spend = requests.get(f"{BACKEND_URL}/insights/top-vendors", params=vendor_spend_params)
-    top_vendors_freq = requests.get(f"{BACKEND_URL}/insights/top-vendors", params=vendor_freq_params)
-    
-    # Get top categories by spend and frequency
-    cat_spend_params = active_filter_params.copy()
-    cat_spend_params['mode'] = 'spend'
-    cat_freq_params = active_filter_params.copy()
-    cat_freq_params['mode'] = 'frequency'
-    
-    top_categories_spend = requests.get(f"{BACKEND_URL}/insights/top-categories", params=cat_spend_params)
-    top_categories_freq = requests.get(f"{BACKEND_URL}/insights/top-categories", params=cat_freq_params)
-    
     symbol = CURRENCY_SYMBOLS.get(display_currency, '')
     
     # Key Metrics Row
@@ -357,21 +355,14 @@ try:
         view_rank = st.selectbox("Rank", ["Top", "Bottom"], key="insight_rank")
     
     # Get appropriate data based on selections
-    if view_type == "Vendor" and view_metric == "Sales":
-        data_source = top_vendors_spend.json().get('data', []) if top_vendors_spend.status_code == 200 else []
-    elif view_type == "Vendor" and view_metric == "Frequency":
-        data_source = top_vendors_freq.json().get('data', []) if top_vendors_freq.status_code == 200 else []
-    elif view_type == "Category" and view_metric == "Sales":
-        data_source = top_categories_spend.json().get('data', []) if top_categories_spend.status_code == 200 else []
-    else:  # Category + Frequency
-        data_source = top_categories_freq.json().get('data', []) if top_categories_freq.status_code == 200 else []
+    ranking_key = 'vendors' if view_type == "Vendor" else 'categories'
+    mode_key = 'spend' if view_metric == "Sales" else 'frequency'
+    rank_key = 'top' if view_rank == "Top" else 'bottom'
+    data_source = dashboard.get(ranking_key, {}).get(mode_key, {}).get(rank_key, [])
     
     # Display results based on selection
     if data_source:
-        if view_rank == "Top":
-            display_data = data_source[:3]  # Top 3
-        else:
-            display_data = data_source[-3:]  # Bottom 3
+        display_data = data_source[:3]  # Top 3 / Bottom 3
         
         # Show results
         for i, item in enumerate(display_data, 1):
@@ -417,106 +408,37 @@ with viz_cols[0]:
     analysis_type = st.selectbox("Analyze By", options=['Vendor', 'Category'], key="breakdown_type")
     analysis_mode = st.selectbox("Mode", options=['Spend', 'Frequency'], key="breakdown_mode")
     
-    # Add filters for the first graph
-    if analysis_type == 'Vendor':
-        # Get available vendors for filtering
-        try:
-            table_params = active_filter_params.copy()
-            response = requests.get(f"{BACKEND_URL}/receipts", params=table_params, timeout=10)
-            if response.status_code == 200:
-                response_data = response.json()
-                all_receipts = response_data.get('data', [])
-                if all_receipts:
-                    df_all = pd.DataFrame(all_receipts)
-                    available_vendors = sorted(df_all['vendor'].dropna().unique().tolist())
-                    if available_vendors:
-                        selected_vendors_breakdown = st.multiselect(
-                            "Select Vendors to Display:",
-                            options=available_vendors,
-                            default=available_vendors[:5] if len(available_vendors) > 5 else available_vendors,
-                            key="selected_vendors_breakdown"
-                        )
-                    else:
-                        selected_vendors_breakdown = []
-                else:
-                    selected_vendors_breakdown = []
-            else:
-                selected_vendors_breakdown = []
-        except:
-            selected_vendors_breakdown = []
-    else:  # Category
-        # Get available categories for filtering
-        try:
-            table_params = active_filter_params.copy()
-            response = requests.get(f"{BACKEND_URL}/receipts", params=table_params, timeout=10)
-            if response.status_code == 200:
-                response_data = response.json()
-                all_receipts = response_data.get('data', [])
-                if all_receipts:
-                    df_all = pd.DataFrame(all_receipts)
-                    available_categories = sorted(df_all['category'].dropna().unique().tolist())
-                    if available_categories:
-                        selected_categories_breakdown = st.multiselect(
-                            "Select Categories to Display:",
-                            options=available_categories,
-                            default=available_categories[:5] if len(available_categories) > 5 else available_categories,
-                            key="selected_categories_breakdown"
-                        )
-                    else:
-                        selected_categories_breakdown = []
-                else:
-                    selected_categories_breakdown = []
-            else:
-                selected_categories_breakdown = []
-        except:
-            selected_categories_breakdown = []
-    
-    # Prepare parameters
-    analysis_params = active_filter_params.copy()
-    analysis_params['mode'] = analysis_mode.lower()
+    index_col = 'vendor' if analysis_type == 'Vendor' else 'category'
+    value_col = 'spend' if analysis_mode == 'Spend' else 'count'
     
     try:
-        if analysis_type == 'Vendor':
-            if 'selected_vendors_breakdown' in locals() and selected_vendors_breakdown:
-                response = requests.get(f"{BACKEND_URL}/insights/top-vendors", params=analysis_params)
-                chart_title = f"Selected Vendors by {analysis_mode}"
-                index_col = 'vendor'
-                
-                response.raise_for_status()
-                response_data = response.json()
-                all_data = response_data.get('data', [])
-                
-                # Filter data to only show selected vendors
-                data = [item for item in all_data if item['vendor'] in selected_vendors_breakdown]
-            else:
-                st.info("Please select at least one vendor to display.")
-                data = []
-        else:  # Category
-            if 'selected_categories_breakdown' in locals() and selected_categories_breakdown:
-                response = requests.get(f"{BACKEND_URL}/insights/top-categories", params=analysis_params)
-                chart_title = f"Selected Categories by {analysis_mode}"
-                index_col = 'category'
-                
-                response.raise_for_status()
-                response_data = response.json()
-                all_data = response_data.get('data', [])
-                
-                # Filter data to only show selected categories
-                data = [item for item in all_data if item['category'] in selected_categories_breakdown]
-            else:
-                st.info("Please select at least one category to display.")
-                data = []
+        if not time_series_df.empty:
+            available = sorted(time_series_df[index_col].dropna().unique().tolist())
+        else:
+            available = []
         
-        if data:
-            st.write(f"**{chart_title}**")
-            st.bar_chart(pd.DataFrame(data).set_index(index_col))
-        elif analysis_type == 'Vendor' and 'selected_vendors_breakdown' in locals() and selected_vendors_breakdown:
-            st.info(f"No data available for selected vendors.")
-        elif analysis_type == 'Category' and 'selected_categories_breakdown' in locals() and selected_categories_breakdown:
-            st.info(f"No data available for selected categories.")
+        if available:
+            selected_breakdown = st.multiselect(
+                f"Select {'Vendors' if analysis_type == 'Vendor' else 'Categories'} to Display:",
+                options=available,
+                default=available[:5] if len(available) > 5 else available,
+                key=f"selected_{'vendors' if analysis_type == 'Vendor' else 'categories'}_breakdown"
+            )
+            
+            if selected_breakdown:
+                breakdown = (
+                    time_series_df[time_series_df[index_col].isin(selected_breakdown)]
+                    .groupby(index_col)[value_col].sum()
+                    .sort_values(ascending=False)
+                    .rename('value')
+                )
+                st.write(f"**Selected {'Vendors' if analysis_type == 'Vendor' else 'Categories'} by {analysis_mode}**")
+                st.bar_chart(breakdown.to_frame())
+            else:
+                st.info(f"Please select at least one {analysis_type.lower()} to display.")
+        else:
+            st.info(f"No data available for {analysis_type.lower()} breakdown.")
             
-    except requests.exceptions.HTTPError as e:
-        st.error(f"Error fetching {analysis_type.lower()} data: {e.response.status_code} {e.response.reason}")
     except Exception as e:
         st.error(f"An error occurred: {e}")
 
@@ -533,101 +455,37 @@ with viz_cols[1]:
     time_metric = st.selectbox("Metric", options=['Spend', 'Frequency'], key="time_metric")
     
     try:
-        # Get all receipts to extract available vendors/categories
-        table_params = active_filter_params.copy()
-        response = requests.get(f"{BACKEND_URL}/receipts", params=table_params, timeout=10)
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            all_receipts = response_data.get('data', [])
+        if not time_series_df.empty:
+            group_col = 'vendor' if time_analysis_type == 'By Vendor' else 'category'
+            label = 'vendors' if time_analysis_type == 'By Vendor' else 'categories'
+            value_col = 'spend' if time_metric == 'Spend' else 'count'
             
-            if all_receipts:
-                df_all = pd.DataFrame(all_receipts)
+            available = sorted(time_series_df[group_col].dropna().unique().tolist())
+            if available:
+                selected = st.multiselect(
+                    f"Select {label.capitalize()} to Display:",
+                    options=available,
+                    default=available[:5] if len(available) > 5 else available,
+                    key=f"selected_{label}"
+                )
                 
-                if time_analysis_type == 'By Vendor':
-                    # Get unique vendors
-                    available_vendors = sorted(df_all['vendor'].dropna().unique().tolist())
-                    if available_vendors:
-                        selected_vendors = st.multiselect(
-                            "Select Vendors to Display:",
-                            options=available_vendors,
-                            default=available_vendors[:5] if len(available_vendors) > 5 else available_vendors,
-                            key="selected_vendors"
-                        )
-                        
-                        if selected_vendors:
-                            # Filter data for selected vendors
-                            filtered_df = df_all[df_all['vendor'].isin(selected_vendors)].copy()
-                            filtered_df['transaction_date'] = pd.to_datetime(filtered_df['transaction_date'])
-                            
-                            if time_metric == 'Spend':
-                                # Convert currency if needed
-                                if 'amount_in_base' not in filtered_df.columns:
-                                    # Use original amount if no conversion available
-                                    filtered_df['amount_in_base'] = filtered_df['amount']
-                                
-                                # Group by date and vendor, sum amounts
-                                time_series = filtered_df.groupby([filtered_df['transaction_date'].dt.date, 'vendor'])['amount_in_base'].sum().unstack(fill_value=0)
-                            else:  # Frequency
-                                # Group by date and vendor, count transactions
-                                time_series = filtered_df.groupby([filtered_df['transaction_date'].dt.date, 'vendor']).size().unstack(fill_value=0)
-                            
-                            if not time_series.empty:
-                                st.line_chart(time_series)
-                            else:
-                                st.info("No data available for selected vendors.")
-                        else:
-                            st.info("Please select at least one vendor to display.")
+                if selected:
+                    filtered_df = time_series_df[time_series_df[group_col].isin(selected)].copy()
+                    filtered_df['date'] = pd.to_datetime(filtered_df['date']).dt.date
+                    time_series = filtered_df.groupby(['date', group_col])[value_col].sum().unstack(fill_value=0)
+                    
+                    if not time_series.empty:
+                        st.line_chart(time_series)
                     else:
-                        st.info("No vendors found in the current data.")
-                
-                elif time_analysis_type == 'By Category':
-                    # Get unique categories
-                    available_categories = sorted(df_all['category'].dropna().unique().tolist())
-                    if available_categories:
-                        selected_categories = st.multiselect(
-                            "Select Categories to Display:",
-                            options=available_categories,
-                            default=available_categories[:5] if len(available_categories) > 5 else available_categories,
-                            key="selected_categories"
-                        )
-                        
-                        if selected_categories:
-                            # Filter data for selected categories
-                            filtered_df = df_all[df_all['category'].isin(selected_categories)].copy()
-                            filtered_df['transaction_date'] = pd.to_datetime(filtered_df['transaction_date'])
-                            
-                            if time_metric == 'Spend':
-                                # Convert currency if needed
-                                if 'amount_in_base' not in filtered_df.columns:
-                                    # Use original amount if no conversion available
-                                    filtered_df['amount_in_base'] = filtered_df['amount']
-                                
-                                # Group by date and category, sum amounts
-                                time_series = filtered_df.groupby([filtered_df['transaction_date'].dt.date, 'category'])['amount_in_base'].sum().unstack(fill_value=0)
-                            else:  # Frequency
-                                # Group by date and category, count transactions
-                                time_series = filtered_df.groupby([filtered_df['transaction_date'].dt.date, 'category']).size().unstack(fill_value=0)
-                            
-                            if not time_series.empty:
-                                st.line_chart(time_series)
-                            else:
-                                st.info("No data available for selected categories.")
-                        else:
-                            st.info("Please select at least one category to display.")
-                    else:
-                        st.info("No categories found in the current data.")
+                        st.info(f"No data available for selected {label}.")
+                else:
+                    st.info(f"Please select at least one {label[:-1] if label == 'vendors' else 'category'} to display.")
             else:
-                st.info("No data available for time-series analysis.")
+                st.info(f"No {label} found in the current data.")
         else:
-            st.error(f"❌ Failed to load data: HTTP {response.status_code}")
+            st.info("No data available for time-series analysis.")
             
-    except requests.exceptions.ConnectionError:
-        st.error("❌ Connection Error: Could not connect to the backend server.")
-    except requests.exceptions.Timeout:
-        st.error("⏱️ Timeout Error: Request took too long. Please try again.")
     except Exception as e:
         st.error(f"❌ Error in time-series analysis: {str(e)}")
 
 st.divider()
-
@@ -0,0 +1,147 @@
+"""
+Compares the line-by-line find_currency_and_amount() that rescanned lines
+with several regexes and scored every keyword with thefuzz, against the
+current one built on the single-pass amount tokenizer, on synthetic bills of
+increasing length (itemized bills and multi-page statements run to hundreds
+of lines).
+
+Both must return the same amount and currency for every bill; the script
+exits non-zero otherwise.
+
+Usage:
+    python benchmarks/bench_amount_scanner.py --bills 200
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import sys
+import time
+
+import synthetic_data  # noqa: F401  (puts app/ on sys.path)
+
+from thefuzz import fuzz
+
+from services.amount_scanner import AMOUNT_KEYWORDS, DEFAULT_KEYWORD_PRIORITY, KEYWORD_PRIORITIES
+from services.parsers import find_currency_and_amount
+
+CURRENCY_MAP = {'₹': 'INR', '¥': 'INR', 'rs': 'INR', 'inr': 'INR', '$': 'USD', '€': 'EUR', '£': 'GBP'}
+AMOUNT_PATTERN = r'(?:rs\.?\s*|₹\s*|¥\s*|inr\s*|\$\s*|€\s*|£\s*)?(\d+(?:,\d{3})*(?:\.\d{2})?)'
+ADJACENT_PATTERN = r'([₹¥$€£])\s*(\d+(?:,\d{3})*(?:\.\d{2})?)'
+
+ITEMS = ("paneer tikka", "butter naan", "dal makhani", "mineral water", "cold coffee", "veg biryani",
+         "basmati rice 5kg", "toor dal", "sunflower oil", "detergent", "data pack", "late fee")
+FOOTERS = ("Thank you for visiting", "GSTIN 29ABCDE1234F1Z5", "Visit again", "Customer copy",
+           "Date: 12/03/2024 Time 18:42", "Bill No 2024/118")
+
+
+def legacy_amounts(line: str, minimum: float = 1, skip_years: bool = True):
+    """(amount, currency) pairs of a line, as the old per-line regex passes found them."""
+    found = []
+    for amount_str in re.findall(AMOUNT_PATTERN, line, re.IGNORECASE):
+        amount_val = float(amount_str.replace(',', ''))
+        if amount_val < minimum or (skip_years and 1900 <= amount_val <= 2100):
+            continue
+        currency_found = next((code for symbol, code in CURRENCY_MAP.items() if symbol in line.lower()), 'INR')
+        found.append((amount_val, currency_found))
+    return found
+
+
+def legacy_find_currency_and_amount(text: str):
+    """find_currency_and_amount() as it was before the tokenizer, without its prints."""
+    lines = text.split('\n')
+    candidates = []
+    for line in lines:
+        for match in re.finditer(ADJACENT_PATTERN, line, re.IGNORECASE):
+            symbol, amount_str = match.groups()
+            amount_val = float(amount_str.replace(',', ''))
+            if amount_val < 1 or 1900 <= amount_val <= 2100:
+                continue
+            candidates.append((amount_val, CURRENCY_MAP.get(symbol, 'INR'), 500))
+
+    for i in range(len(lines) - 1, max(0, len(lines) - 25), -1):
+        line = lines[i].strip()
+        if not line:
+            continue
+        best_keyword_score = 0
+        for keyword in AMOUNT_KEYWORDS:
+            score = fuzz.partial_ratio(keyword, line.lower())
+            if score >= 80:
+                adjusted_score = score + KEYWORD_PRIORITIES.get(keyword, DEFAULT_KEYWORD_PRIORITY)
+                if adjusted_score > best_keyword_score:
+                    best_keyword_score = adjusted_score
+        has_separator_above = i > 0 and bool(re.match(r'^[-=_*\.]{3,}$', lines[i - 1].strip()))
+
+        if best_keyword_score >= 130 or has_separator_above:
+            if best_keyword_score >= 80:
+                same_line = [(a, c, best_keyword_score + 200) for a, c in legacy_amounts(line)]
+                if same_line:
+                    candidates.extend(same_line)
+                else:
+                    for j in range(max(0, i - 2), min(len(lines), i + 3)):
+                        if j != i and lines[j].strip():
+                            candidates.extend((a, c, best_keyword_score + 50) for a, c in legacy_amounts(lines[j]))
+            elif has_separator_above:
+                for j in range(max(0, i - 1), min(len(lines), i + 2)):
+                    if j != i and lines[j].strip():
+                        candidates.extend((a, c, 75) for a, c in legacy_amounts(lines[j]))
+
+    if not candidates:
+        for line in lines[-10:]:
+            candidates.extend((a, c, 10) for a, c in legacy_amounts(line, minimum=10, skip_years=False))
+
+    if candidates:
+        amount, currency, _ = max(candidates, key=lambda x: (x[2], x[0]))
+        return amount, currency
+    return None, None
+
+
+def synthetic_bill(rng: random.Random, items: int) -> str:
+    symbol = rng.choice(['₹', 'Rs.', '$', '€', '£', 'INR ', ''])
+    lines = [rng.choice(["SPICE GARDEN", "BIG BAZAAR", "Reliance Fresh", "Airtel"]), rng.choice(FOOTERS)]
+    total = 0.0
+    for _ in range(items):
+        price = round(rng.uniform(5, 2500), 2)
+        total += price
+        spacer = " " * rng.randint(1, 12)
+        lines.append(f"{rng.choice(ITEMS)} x{rng.randint(1, 4)}{spacer}{symbol if rng.random() < 0.3 else ''}{price:,.2f}")
+        if rng.random() < 0.05:
+            lines.append("")
+    lines.append(rng.choice(["-" * 24, "=" * 24, "*" * 10, ""]))
+    for label in rng.sample(["Subtotal", "CGST 9%", "SGST 9%", "Discount", "Round off", "Total",
+                             "Grand Total", "Amount to be paid", "Balance due", "Net Amount"], 4):
+        lines.append(f"{label}{' ' * rng.randint(1, 20)}{symbol}{total * rng.uniform(0.05, 1.1):,.2f}")
+    lines.extend(rng.sample(FOOTERS, 3))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bills', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'lines/bill':>10} {'legacy':>10} {'tokens':>10} {'speedup':>8}")
+    for items in (10, 50, 200, 1000):
+        bills = [synthetic_bill(rng, items) for _ in range(max(args.bills * 10 // items, 5))]
+
+        start = time.perf_counter()
+        expected = [legacy_find_currency_and_amount(bill) for bill in bills]
+        legacy_time = time.perf_counter() - start
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            actual = [find_currency_and_amount(bill) for bill in bills]
+            token_time = time.perf_counter() - start
+
+        if actual != expected:
+            diffs = sum(a != e for a, e in zip(actual, expected))
+            sys.exit(f"Tokenizer disagrees with the legacy scan on {diffs} of {len(bills)} bills")
+        print(f"{items + 10:>10} {legacy_time / len(bills) * 1000:>8.2f}ms {token_time / len(bills) * 1000:>8.2f}ms "
+              f"{legacy_time / token_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares saving receipts one at a time with save_receipt() (one transaction,
+and so one WAL commit, per row) against save_receipts() (chunked executemany
+in a single transaction), each into a fresh database.
+
+Usage:
+    python benchmarks/bench_bulk_insert.py --rows 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic_data import synthetic_rows
+
+
+def make_receipts(count: int):
+    from models.receipt import ReceiptData
+
+    for vendor, day, amount, currency, category, raw_text, _ in synthetic_rows(count, raw_text_lines=5):
+        yield ReceiptData(vendor=vendor, transaction_date=day, amount=amount, currency=currency,
+                          category=category, raw_text=raw_text, raw_data=b"", raw_data_extension="txt")
+
+
+def fresh_database(database, directory: str, name: str):
+    database.DATABASE_FILE = os.path.join(directory, name)
+    database.initialize_database()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_PATH'] = os.path.join(directory, 'unused.db')
+    from database import database
+
+    receipts = list(make_receipts(args.rows))
+
+    fresh_database(database, directory, 'per_row.db')
+    start = time.perf_counter()
+    for receipt in receipts:
+        database.save_receipt(receipt)
+    per_row = time.perf_counter() - start
+
+    fresh_database(database, directory, 'bulk.db')
+    stats = {}
+    database.save_receipts(receipts, chunk_size=args.chunk_size, stats=stats)
+    bulk = stats['seconds']
+
+    print(f"{'path':>14} {'seconds':>9} {'rows/s':>10}")
+    print(f"{'save_receipt':>14} {per_row:>9.2f} {args.rows / per_row:>10,.0f}")
+    print(f"{'save_receipts':>14} {bulk:>9.2f} {stats['rows_per_second']:>10,.0f}")
+    print(f"speedup: {per_row / bulk:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
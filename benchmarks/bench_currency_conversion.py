@@ -0,0 +1,100 @@
+"""
+Compares per-record and vectorized currency conversion.
+
+Runs offline against a generated rates file, so no network is needed. Three
+paths are timed once rates are cached:
+  loop      - the per-record dict loop convert_to_base_currency used to run
+  dict      - convert_to_base_currency(), now a wrapper over convert_amounts()
+  columnar  - convert_amounts() on arrays, as a caller holding columns would
+
+Usage:
+    python benchmarks/bench_currency_conversion.py --rows 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from synthetic_data import START_DATE, synthetic_rows
+
+
+def write_rates_file(path: str, days: int = 1100):
+    rates = {}
+    for i in range(days):
+        day = START_DATE + timedelta(days=i - 7)
+        if day.weekday() < 5:
+            rates[day.isoformat()] = {"USD": 1.08 + i * 1e-4, "INR": 90.0 + i * 1e-2}
+    with open(path, 'w') as f:
+        json.dump({"base": "EUR", "rates": rates}, f)
+
+
+def loop_convert(records, base_currency, rates_cache):
+    """The original per-record conversion loop, with every rate already cached."""
+    for record in records:
+        original_amount = record.get('amount')
+        original_currency = record.get('currency', 'INR')
+        transaction_date = record.get('transaction_date')
+        if not original_amount or not transaction_date:
+            record['amount_in_base'] = 0
+            continue
+        if original_currency == base_currency:
+            record['amount_in_base'] = original_amount
+            continue
+        rate = rates_cache.get((transaction_date, original_currency, base_currency))
+        if rate is None:
+            record['amount_in_base'] = original_amount
+            continue
+        record['amount_in_base'] = round(original_amount * rate, 2)
+    return records
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--base', default='INR')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    rates_path = os.path.join(tmp_dir, 'rates.json')
+    write_rates_file(rates_path)
+    os.environ['DATABASE_PATH'] = os.path.join(tmp_dir, 'bench_receipts.db')
+    os.environ['EXCHANGE_RATES_OFFLINE'] = '1'
+    os.environ['EXCHANGE_RATES_FILE'] = rates_path
+    from services import currency_converter
+
+    print(f"{'rows':>10} {'loop':>10} {'dict':>10} {'columnar':>10}  speedup (loop/columnar)")
+    for count in args.rows:
+        records = [
+            {'amount': amount, 'currency': currency, 'transaction_date': day}
+            for _, day, amount, currency, _, _, _ in synthetic_rows(count, raw_text_lines=0)
+        ]
+        amounts = [r['amount'] for r in records]
+        currencies = [r['currency'] for r in records]
+        dates = [r['transaction_date'] for r in records]
+
+        # Warm the rate cache so every path measures conversion only
+        currency_converter.convert_amounts(amounts, currencies, dates, args.base)
+
+        loop_time, looped = timed(lambda: loop_convert([dict(r) for r in records], args.base,
+                                                       currency_converter.RATES_CACHE))
+        dict_time, wrapped = timed(lambda: currency_converter.convert_to_base_currency(
+            [dict(r) for r in records], args.base))
+        columnar_time, _ = timed(lambda: currency_converter.convert_amounts(
+            amounts, currencies, dates, args.base))
+
+        mismatches = sum(a['amount_in_base'] != b['amount_in_base'] for a, b in zip(looped, wrapped))
+        print(f"{count:>10} {loop_time * 1000:>8.0f}ms {dict_time * 1000:>8.0f}ms "
+              f"{columnar_time * 1000:>8.0f}ms  {loop_time / columnar_time:.1f}x"
+              f"{f'  ({mismatches} rounding differences)' if mismatches else ''}")
+
+
+if __name__ == '__main__':
+    main()
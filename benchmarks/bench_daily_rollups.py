@@ -0,0 +1,65 @@
+"""
+Times /insights/spending-over-time and /insights/top-vendors answered from
+the daily_rollups table against the per-receipt path (load every receipt,
+convert it, aggregate in pandas).
+
+Passing a limit makes the endpoints fall back to the per-receipt path, so the
+same requests are timed with and without limit=<rows>.
+
+Usage:
+    python benchmarks/bench_daily_rollups.py --rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic_data import populate_receipts
+
+REQUESTS = [
+    '/insights/spending-over-time?mode=total spend&range_feature=transaction_date&start=2024-01-01&end=2024-12-31',
+    '/insights/spending-over-time?mode=by vendor',
+    '/insights/top-vendors?mode=spend',
+    '/insights/top-categories?mode=frequency',
+]
+
+
+def best_ms(client, url: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.json
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_PATH'] = os.path.join(directory, 'receipts.db')
+    os.environ.setdefault('PARSE_CACHE_PATH', os.path.join(directory, 'parse_cache.db'))
+    from app import app
+    from database import database
+
+    conn = database.get_db_connection()
+    start = time.perf_counter()
+    populate_receipts(conn, args.rows, raw_text_lines=1)
+    rollup_rows = conn.execute("SELECT COUNT(*) FROM daily_rollups").fetchone()[0]
+    conn.close()
+    print(f"Inserted {args.rows} rows ({rollup_rows} rollup rows) in {time.perf_counter() - start:.1f}s\n")
+
+    client = app.test_client()
+    print(f"{'':<100} {'receipts':>9} {'rollups':>9}")
+    for url in REQUESTS:
+        per_receipt = best_ms(client, f"{url}&limit={args.rows}", args.repeat)
+        rollups = best_ms(client, url, args.repeat)
+        print(f"{url + ' (ms)':<100} {per_receipt:>9.1f} {rollups:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Compares find_date() as it was, with per-window regex passes and strptime
+format trials, against the date engine (one candidate scan, strptime-free
+parsing, LRU of parsed candidates), on synthetic receipts whose top lines
+carry dates in every supported format, plus decoys.
+
+Both must return the same date for every receipt, and parse_date() must
+agree with the old _parse_date_string() on every candidate; the script
+exits non-zero otherwise.
+
+Usage:
+    python benchmarks/bench_date_engine.py --receipts 2000
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+import synthetic_data  # noqa: F401  (puts app/ on sys.path)
+
+from thefuzz import fuzz
+
+from services.date_engine import parse_cache_info, parse_date
+from services.parsers import find_date
+
+DATE_PATTERNS = [
+    r'\b\d{4}[-/.]\d{1,2}[-/.]\d{1,2}\b',
+    r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{4}\b',
+    r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2}\b',
+]
+MONTH_PATTERN = r'\b\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\s+\d{2,4}\b'
+DATE_KEYWORDS = ['date:', 'date', 'dated', 'bill date', 'invoice date', 'order date', 'transaction date']
+MONTHS = ['Jan', 'feb', 'MAR', 'April', 'May', 'june', 'Jul', 'August', 'Sept', 'oct', 'Nov', 'December']
+
+
+def legacy_parse_date_string(date_str):
+    """_parse_date_string() as it was before the engine."""
+    if not date_str:
+        return None
+    date_str = date_str.strip()
+    if re.match(r'^\d{8}$', date_str):
+        try:
+            return datetime.strptime(date_str, '%Y%m%d')
+        except ValueError:
+            pass
+    normalized_date = re.sub(r'[/.\s]+', '-', date_str)
+    for fmt in ['%Y-%m-%d', '%d-%m-%Y', '%m-%d-%Y', '%d-%m-%y', '%m-%d-%y', '%d-%b-%Y', '%b-%d-%Y', '%B-%d-%Y']:
+        try:
+            parsed = datetime.strptime(normalized_date, fmt)
+            if parsed.year < 1950:
+                parsed = parsed.replace(year=parsed.year + 2000)
+            return parsed
+        except ValueError:
+            continue
+    try:
+        parts = date_str.split()
+        if len(parts) == 3:
+            day, month, year = parts
+            month_names = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+                           'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+            month_num = month_names.get(month.lower()[:3])
+            if month_num:
+                return datetime(int(year), month_num, int(day))
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+def legacy_extract_date_from_text(text):
+    """_extract_date_from_text() as it was before the engine."""
+    found_dates = []
+    for pattern in DATE_PATTERNS + [r'\b\d{8}\b', r'\b\d{1,2}[-/.\s]+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*[-/.\s]+\d{2,4}\b']:
+        for date_str in re.findall(pattern, text, re.IGNORECASE):
+            parsed_date = legacy_parse_date_string(date_str.strip())
+            if parsed_date:
+                found_dates.append(parsed_date)
+    if not found_dates:
+        return None
+    today = datetime.now()
+    valid_dates = [d for d in found_dates if d <= today]
+    return (max(valid_dates) if valid_dates else min(found_dates)).strftime('%Y-%m-%d')
+
+
+def legacy_find_date(text):
+    """find_date() as it was before the engine, without its prints."""
+    lines = text.split('\n')
+    for i, line in enumerate(lines[:15]):
+        line_lower = line.lower().strip()
+        for keyword in DATE_KEYWORDS:
+            if fuzz.partial_ratio(keyword, line_lower) >= 70:
+                date_found = legacy_extract_date_from_text(" ".join(lines[i:i + 3]))
+                if date_found:
+                    return date_found
+    for line in lines[:20]:
+        for pattern in DATE_PATTERNS:
+            for match in re.findall(pattern, line):
+                parsed_date = legacy_parse_date_string(match)
+                if parsed_date:
+                    return parsed_date.strftime('%Y-%m-%d')
+    for line in lines[:20]:
+        for match in re.findall(MONTH_PATTERN, line, re.IGNORECASE):
+            parsed_date = legacy_parse_date_string(match)
+            if parsed_date:
+                return parsed_date.strftime('%Y-%m-%d')
+    return None
+
+
+def random_date(rng: random.Random) -> str:
+    day, month, year = rng.randint(0, 33), rng.randint(0, 14), rng.choice([rng.randint(1990, 2030), rng.randint(0, 99)])
+    sep = rng.choice('-/.')
+    return rng.choice([
+        f"{year:04d}{sep}{month:02d}{sep}{day:02d}",
+        f"{day}{sep}{month}{sep}{year:04d}",
+        f"{day:02d}{sep}{month:02d}{sep}{year % 100:02d}",
+        f"{year:04d}{month:02d}{day:02d}",
+        f"{day} {rng.choice(MONTHS)} {year}",
+        f"{day}{rng.choice(['-', ' - ', '.', ' '])}{rng.choice(MONTHS)}{rng.choice(['-', ' ', '- ', ', '])}{year}",
+        f"{day}.{month}.{year % 100:02d}.{rng.randint(1, 99)}",
+    ])
+
+
+def synthetic_receipt(rng: random.Random) -> str:
+    lines = [rng.choice(["DMART", "BESCOM", "Spice Garden", "Airtel"]), "Some Address, Bengaluru"]
+    for _ in range(rng.randint(3, 18)):
+        roll = rng.random()
+        if roll < 0.25:
+            lines.append(f"{rng.choice(['Date:', 'Bill Date', 'Dated', 'Due Date:', 'Daet', 'Invoice Dt'])} {random_date(rng)}")
+        elif roll < 0.5:
+            lines.append(f"Ref {random_date(rng)} Time 19:40 {random_date(rng)}")
+        elif roll < 0.7:
+            lines.append(random_date(rng))
+        else:
+            lines.append(f"Item {rng.randint(1, 99)} x {rng.randint(1, 9)} {rng.uniform(1, 999):.2f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--receipts', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    receipts = [synthetic_receipt(rng) for _ in range(args.receipts)]
+
+    candidates = {random_date(rng) for _ in range(20000)}
+    mismatches = [c for c in candidates if parse_date(c) != legacy_parse_date_string(c)]
+    if mismatches:
+        sys.exit(f"parse_date disagrees with the old parser on {len(mismatches)} candidates, e.g. {mismatches[:5]}")
+
+    start = time.perf_counter()
+    expected = [legacy_find_date(receipt) for receipt in receipts]
+    legacy_time = time.perf_counter() - start
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        actual = [find_date(receipt) for receipt in receipts]
+        engine_time = time.perf_counter() - start
+
+    if actual != expected:
+        diffs = sum(a != e for a, e in zip(actual, expected))
+        sys.exit(f"Engine disagrees with the old find_date on {diffs} of {len(receipts)} receipts")
+    print(f"{len(candidates)} candidates parsed identically; {len(receipts)} receipts")
+    print(f"legacy find_date: {legacy_time / len(receipts) * 1000:.3f} ms per receipt")
+    print(f"engine find_date: {engine_time / len(receipts) * 1000:.3f} ms per receipt "
+          f"({legacy_time / engine_time:.1f}x)")
+    print(f"parse cache: {parse_cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
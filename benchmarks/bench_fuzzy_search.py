@@ -0,0 +1,71 @@
+"""
+Compares fuzzy vendor search scored record by record (fuzzy_search_records
+over every row, the previous /receipts?search_mode=fuzzy path) with the
+FuzzyIndex over distinct vendors followed by a vendor IN (...) query.
+
+Usage:
+    python benchmarks/bench_fuzzy_search.py --rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic_data import populate_receipts
+
+
+def best_ms(run, repeat: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+    from algorithms.fuzzy_index import FuzzyIndex
+    from algorithms.search import fuzzy_search_records
+    from database import database
+
+    database.initialize_database()
+    conn = database.get_db_connection()
+    start = time.perf_counter()
+    populate_receipts(conn, args.rows, raw_text_lines=1)
+    conn.close()
+    print(f"Inserted {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    values, _ = database.get_distinct_values('vendor')
+    index = FuzzyIndex(values)
+    print(f"Indexed {len(index)} distinct vendors in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    def per_record(keywords):
+        def run():
+            records = database.query_receipts()
+            matched = set()
+            for keyword in keywords:
+                matched.update(r['id'] for r in fuzzy_search_records(keyword, 'vendor', records))
+            return len(matched)
+        return run
+
+    def indexed(keywords):
+        return lambda: len(database.query_receipts(search_feature='vendor',
+                                                   search_values=index.search_any(keywords)))
+
+    print(f"{'':<32} {'per record':>11} {'index + IN':>11} {'rows':>8}")
+    for keywords in (['starbuks'], ['amazn', 'flipkrt'], ['local stor 42']):
+        per_record_ms, expected = best_ms(per_record(keywords), args.repeat)
+        indexed_ms, count = best_ms(indexed(keywords), args.repeat)
+        assert count == expected, (keywords, count, expected)
+        print(f"{', '.join(keywords) + ' (ms)':<32} {per_record_ms:>11.1f} {indexed_ms:>11.1f} {count:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares the ways of running a keyword search over stored receipts:
+
+- pandas: load every record and filter with search_by_keywords_concise()
+  (a regex str.contains), which is what searching raw_text would take
+  without an index, since the text has to be decompressed first
+- LIKE: the substring filter build_receipt_query() uses for vendor and category
+- FTS5: the MATCH query build_receipt_query() generates for raw_text and 'all'
+  (run here on vendor too, for comparison)
+
+Usage:
+    python benchmarks/bench_keyword_search.py --rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic_data import populate_receipts
+
+
+def best_ms(run, repeat: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), 'receipts.db')
+    from algorithms.search import search_by_keywords_concise
+    from database import database
+    from database.text_codec import decompress_text
+
+    database.initialize_database()
+    conn = database.get_db_connection()
+    start = time.perf_counter()
+    populate_receipts(conn, args.rows)
+    print(f"Inserted {args.rows} rows in {time.perf_counter() - start:.1f}s\n")
+
+    def load_records(with_text: bool):
+        sql = "SELECT r.vendor, r.category" + (", t.codec, t.data" if with_text else "") + " FROM receipts r"
+        if with_text:
+            sql += " JOIN receipt_texts t ON t.receipt_id = r.id"
+            return [{'vendor': row[0], 'category': row[1], 'raw_text': decompress_text(row[2], row[3])}
+                    for row in conn.execute(sql)]
+        return [dict(row) for row in conn.execute(sql)]
+
+    def pandas_search(keywords, feature):
+        return lambda: len(search_by_keywords_concise(keywords, feature, load_records(feature == 'raw_text')))
+
+    def fts_search(keywords, feature):
+        sql = "SELECT rowid FROM receipts_fts WHERE receipts_fts MATCH ?"
+        params = [database.build_fts_query(keywords, feature)]
+        return lambda: len(conn.execute(sql, params).fetchall())
+
+    def like_search(keywords, feature):
+        sql = "SELECT id FROM receipts WHERE " + " OR ".join(f"{feature} LIKE ?" for _ in keywords)
+        params = [f"%{k}%" for k in keywords]
+        return lambda: len(conn.execute(sql, params).fetchall())
+
+    cases = [
+        ("vendor 'starbucks'", ['starbucks'], 'vendor'),
+        ("vendor 'jio', 'airtel'", ['jio', 'airtel'], 'vendor'),
+        ("raw_text 'total: 1999'", ['total: 1999'], 'raw_text'),
+    ]
+    print(f"{'':<28} {'pandas':>10} {'LIKE':>10} {'FTS5':>10} {'rows':>8}")
+    for name, keywords, feature in cases:
+        pandas_ms, _ = best_ms(pandas_search(keywords, feature), args.repeat)
+        # raw_text is no longer a column of receipts, so it can't be LIKE-filtered
+        like = f"{best_ms(like_search(keywords, feature), args.repeat)[0]:.1f}" if feature != 'raw_text' else '-'
+        fts_ms, count = best_ms(fts_search(keywords, feature), args.repeat)
+        print(f"{name + ' (ms)':<28} {pandas_ms:>10.1f} {like:>10} {fts_ms:>10.1f} {count:>8}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Builds a synthetic receipts database and prints the query plan and latency of
+the queries the API generates, to confirm they are served by the indexes.
+
+Usage:
+    python benchmarks/bench_query_plans.py --rows 1000000 --db /tmp/bench_receipts.db
+"""
+import argparse
+import os
+import time
+
+from synthetic_data import populate_receipts
+
+QUERIES = {
+    'date range': dict(range_feature='transaction_date', start='2024-01-01', end='2024-01-31'),
+    'amount range': dict(range_feature='amount', start='100', end='150'),
+    'vendor keyword': dict(keywords=['bescom'], search_feature='vendor'),
+    'raw text keyword': dict(keywords=['total 1999'], search_feature='raw_text', limit=100),
+    'ranked keyword': dict(keywords=['supermarket', 'pharmacy'], search_feature='all',
+                           sort_by='relevance', limit=100),
+    'newest 100': dict(limit=100),
+    'top amounts': dict(sort_by='amount', order='desc', limit=100),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--db', default='/tmp/bench_receipts.db')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = args.db
+    from database import database
+
+    conn = database.get_db_connection()
+    existing = conn.execute("SELECT COUNT(*) FROM receipts").fetchone()[0]
+    if existing < args.rows:
+        start = time.perf_counter()
+        populate_receipts(conn, args.rows - existing)
+        print(f"Inserted {args.rows - existing} rows in {time.perf_counter() - start:.1f}s")
+    conn.execute("ANALYZE")
+
+    for name, filters in QUERIES.items():
+        sql, params = database.build_receipt_query(**filters)
+        plan = database.explain_query(conn, sql, params)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            rows = conn.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - start)
+        print(f"\n{name}: {len(rows)} rows, best {min(timings) * 1000:.1f} ms")
+        for step in plan:
+            print(f"    {step}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
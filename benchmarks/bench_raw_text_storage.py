@@ -0,0 +1,118 @@
+"""
+Compares the old layout, with raw_text inline in receipts, against the
+compressed receipt_texts side table: database file size, and the latency of
+the list and aggregate queries that never need the text.
+
+Both databases get the same synthetic rows. The old one is built with the
+schema as it was before migration 5; the new one with initialize_database().
+
+Usage:
+    python benchmarks/bench_raw_text_storage.py --rows 500000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from synthetic_data import populate_receipts, synthetic_rows
+
+LEGACY_SCHEMA = """
+    CREATE TABLE receipts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vendor TEXT NOT NULL,
+        transaction_date TEXT NOT NULL,
+        amount REAL NOT NULL CHECK(amount > 0),
+        currency TEXT NOT NULL DEFAULT 'INR',
+        category TEXT,
+        raw_text TEXT NOT NULL,
+        upload_timestamp TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_receipts_transaction_date ON receipts(transaction_date);
+    CREATE INDEX idx_receipts_vendor_date ON receipts(vendor, transaction_date);
+"""
+
+
+def build_legacy(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("""
+        INSERT INTO receipts (vendor, transaction_date, amount, currency, category, raw_text, upload_timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, synthetic_rows(rows))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def build_current(database, path: str, rows: int):
+    database.DATABASE_FILE = path
+    database.initialize_database()
+    conn = database.get_db_connection()
+    populate_receipts(conn, rows)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def best_ms(conn, sql: str, params=(), repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_PATH'] = os.path.join(directory, 'unused.db')
+    from database import database
+
+    legacy_path = os.path.join(directory, 'legacy.db')
+    current_path = os.path.join(directory, 'current.db')
+    start = time.perf_counter()
+    build_legacy(legacy_path, args.rows)
+    build_current(database, current_path, args.rows)
+    print(f"Built both databases with {args.rows} rows in {time.perf_counter() - start:.1f}s\n")
+
+    legacy = sqlite3.connect(legacy_path)
+    current = database.get_db_connection()
+    list_columns = ', '.join(database.RECEIPT_LIST_COLUMNS)
+    page_sql, page_params = database.build_receipt_query(limit=100)
+    queries = [
+        ("list page (100 newest)",
+         ("SELECT * FROM receipts ORDER BY transaction_date DESC LIMIT 100", ()), (page_sql, page_params)),
+        ("list all rows",
+         ("SELECT * FROM receipts", ()), (f"SELECT {list_columns} FROM receipts", ())),
+        ("spend per vendor",
+         ("SELECT vendor, SUM(amount) FROM receipts GROUP BY vendor", ()),
+         ("SELECT vendor, SUM(amount) FROM receipts GROUP BY vendor", ())),
+    ]
+
+    mib = 1024 * 1024
+    legacy_size, current_size = os.path.getsize(legacy_path), os.path.getsize(current_path)
+    print(f"{'':<30} {'inline':>10} {'side table':>11}")
+    print(f"{'file size (MiB)':<30} {legacy_size / mib:>10.1f} {current_size / mib:>11.1f}")
+    for name, (legacy_sql, legacy_params), (current_sql, current_params) in queries:
+        print(f"{name + ' (ms)':<30} {best_ms(legacy, legacy_sql, legacy_params, args.repeat):>10.1f} "
+              f"{best_ms(current, current_sql, current_params, args.repeat):>11.1f}")
+
+    lookups = min(1000, args.rows)
+    start = time.perf_counter()
+    for receipt_id in range(1, lookups + 1):
+        database.get_receipt_raw_text(receipt_id)
+    elapsed = time.perf_counter() - start
+    print(f"\nget_receipt_raw_text: {elapsed / lookups * 1000:.3f} ms per receipt ({lookups} lookups)")
+    legacy.close()
+    current.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Compares the per-keyword fuzzy loop find_vendor() used to run with the
+Aho-Corasick vendor index, on a synthetic corpus of receipts of increasing
+length (a multi-page PDF is a few thousand words of OCR text).
+
+Both must agree on every document; the script exits non-zero otherwise.
+
+Usage:
+    python benchmarks/bench_vendor_index.py --docs 200
+"""
+import argparse
+import random
+import sys
+import time
+
+import synthetic_data  # noqa: F401  (puts app/ on sys.path)
+
+from thefuzz import fuzz
+
+from services.parsers import CATEGORY_KEYWORDS, KNOWN_VENDORS, VENDOR_INDEX
+
+FILLER = ("invoice total amount qty price item tax gst cgst sgst subtotal thank you visit "
+          "again customer copy bill no date time cashier road street phone").split()
+
+
+def loop_best_vendor(text: str):
+    """Steps 1 and 2 of find_vendor() as they were before the index."""
+    text_lower = text.lower()
+    detected_category = None
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if fuzz.partial_ratio(keyword, text_lower) >= 85:
+                detected_category = category
+                break
+        if detected_category:
+            break
+
+    vendors_to_search = {detected_category: KNOWN_VENDORS[detected_category]} if detected_category else KNOWN_VENDORS
+    best = (None, None, 0)
+    for category, vendors in vendors_to_search.items():
+        for keyword, name in vendors.items():
+            if len(keyword) < 4:
+                continue
+            score = max(fuzz.partial_ratio(keyword.lower(), text_lower),
+                        fuzz.token_sort_ratio(keyword.lower(), text_lower),
+                        fuzz.ratio(keyword.lower(), text_lower))
+            min_threshold = 90 if len(keyword) < 6 else 85
+            if score > best[2] and score >= min_threshold:
+                if keyword.lower() in text_lower or any(word in text_lower for word in keyword.lower().split()):
+                    best = (name, category, score)
+    return detected_category, best
+
+
+def index_best_vendor(text: str):
+    text_lower = text.lower()
+    found = VENDOR_INDEX.find(text_lower)
+    detected_category, _ = VENDOR_INDEX.detect_category(text_lower, found)
+    return detected_category, VENDOR_INDEX.best_vendor(text_lower, detected_category, found)
+
+
+def synthetic_document(rng: random.Random, words: int) -> str:
+    vendors = [(k, n) for c in KNOWN_VENDORS.values() for k, n in c.items()]
+    keyword, name = rng.choice(vendors)
+    lines = [name.upper(), f"{keyword} customer copy"]
+    line = []
+    for _ in range(words):
+        line.append(rng.choice(FILLER) if rng.random() < 0.97 else f"{rng.uniform(1, 999):.2f}")
+        if len(line) >= 8:
+            lines.append(" ".join(line))
+            line = []
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'words/doc':>10} {'loop':>10} {'index':>10} {'speedup':>8}")
+    for words in (50, 500, 2000, 8000):
+        docs = [synthetic_document(rng, words) for _ in range(max(args.docs * 50 // words, 5))]
+
+        start = time.perf_counter()
+        expected = [loop_best_vendor(doc) for doc in docs]
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = [index_best_vendor(doc) for doc in docs]
+        index_time = time.perf_counter() - start
+
+        if actual != expected:
+            diffs = sum(a != e for a, e in zip(actual, expected))
+            sys.exit(f"Index disagrees with the loop on {diffs} of {len(docs)} documents")
+        print(f"{words:>10} {loop_time / len(docs) * 1000:>8.2f}ms {index_time / len(docs) * 1000:>8.2f}ms "
+              f"{loop_time / index_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
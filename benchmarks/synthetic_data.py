@@ -0,0 +1,69 @@
+"""
+Synthetic receipt data shared by the benchmark scripts.
+
+Rows are written straight into the receipts, receipt_texts and receipts_fts
+tables with executemany so that building a 1M-row database takes seconds
+rather than going through the validated save path one receipt at a time.
+"""
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Make the app packages importable the same way app.py sees them
+APP_DIR = Path(__file__).resolve().parent.parent / 'app'
+sys.path.insert(0, str(APP_DIR))
+
+VENDORS = [
+    ('BESCOM', 'Electricity'), ('Tata Power', 'Electricity'), ('Airtel', 'Internet & Telecom'),
+    ('Jio', 'Internet & Telecom'), ('DMart', 'Groceries'), ('More Supermarket', 'Groceries'),
+    ('Starbucks', 'Restaurant'), ('Domino\'s', 'Restaurant'), ('Uber', 'Transportation'),
+    ('Indian Oil', 'Transportation'), ('Apollo Pharmacy', 'Healthcare'), ('Amazon', 'Shopping'),
+    ('Flipkart', 'Shopping'), ('HDFC Bank', 'Banking'), (None, None),
+]
+CURRENCIES = ['INR'] * 8 + ['USD', 'EUR']
+START_DATE = date(2023, 1, 1)
+
+
+def synthetic_rows(count: int, seed: int = 42, raw_text_lines: int = 40):
+    """Yields tuples matching the receipts insert column order."""
+    rng = random.Random(seed)
+    upload = datetime.now().isoformat()
+    for i in range(count):
+        vendor, category = rng.choice(VENDORS)
+        if vendor is None:
+            vendor, category = f"Local Store {rng.randint(1, 5000)}", None
+        amount = round(rng.uniform(10, 20000), 2)
+        day = START_DATE + timedelta(days=rng.randint(0, 1000))
+        raw_text = "\n".join(
+            f"{vendor} item {j} qty {rng.randint(1, 9)} price {rng.uniform(1, 500):.2f}"
+            for j in range(raw_text_lines)
+        ) + f"\nTotal: {amount:.2f}"
+        yield (vendor, day.isoformat(), amount, rng.choice(CURRENCIES), category, raw_text, upload)
+
+
+def populate_receipts(conn, count: int, batch_size: int = 10000, **kwargs):
+    """Inserts count synthetic receipts using the given connection."""
+    batch = []
+    for row in synthetic_rows(count, **kwargs):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _insert_batch(conn, batch)
+            batch = []
+    if batch:
+        _insert_batch(conn, batch)
+    conn.commit()
+
+
+def _insert_batch(conn, batch):
+    from database.database import INDEX_TEXT_SQL, INSERT_TEXT_SQL, _text_row
+
+    conn.executemany("""
+        INSERT INTO receipts (vendor, transaction_date, amount, currency, category, upload_timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [row[:5] + row[6:] for row in batch])
+    # Single connection, no explicit ids: the batch got consecutive ids
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(batch) + 1
+    conn.executemany(INSERT_TEXT_SQL, [_text_row(first_id + i, row[5]) for i, row in enumerate(batch)])
+    conn.executemany(INDEX_TEXT_SQL, [(row[5], first_id + i) for i, row in enumerate(batch)])